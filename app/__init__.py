@@ -0,0 +1,4 @@
+import time
+
+# начало импорта приложения: от него считается время импорта при запуске
+IMPORT_STARTED = time.perf_counter()
@@ -1,2 +1,2 @@
-from app.bot.bot import bot, dp
+from app.bot.bot import create_bot, dp
 from app.bot.handlers import router
@@ -3,7 +3,11 @@ from aiogram import Bot, Dispatcher
 from app.bot.handlers import router
 from app.config import settings
 
-bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
 dp = Dispatcher()
 
 dp.include_router(router)
+
+
+def create_bot() -> Bot:
+    """Бот создаётся при запуске, когда настройки уже прочитаны"""
+    return Bot(token=settings.TELEGRAM_BOT_TOKEN)
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# обработчик склеенного запроса: (user_id, текст, последнее сообщение)
+Handler = Callable[[int, str, Any], Awaitable[None]]
+
+
+@dataclass
+class DispatchStats:
+    """Счётчики диспетчера: сколько сообщений пришло, сколько из них
+    склеено с соседними, сколько генераций отменено и сколько запусков."""
+
+    received: int = 0
+    coalesced: int = 0
+    cancelled: int = 0
+    processed: int = 0
+
+
+@dataclass
+class _UserQueue:
+    texts: list[str] = field(default_factory=list)
+    context: Any = None
+    task: asyncio.Task | None = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class UserDispatcher:
+    """Последовательная обработка сообщений каждого пользователя.
+
+    Сообщения, пришедшие подряд в пределах окна `window` секунд, склеиваются
+    в один запрос. Новое сообщение отменяет ещё не завершённую генерацию —
+    её текст войдёт в следующий, склеенный запрос. Для одного пользователя
+    обработчик никогда не выполняется параллельно.
+    """
+
+    def __init__(self, handler: Handler, window: float, separator: str = "\n") -> None:
+        self.handler = handler
+        self.window = window
+        self.separator = separator
+        self.stats = DispatchStats()
+        self._queues: dict[int, _UserQueue] = {}
+
+    def submit(self, user_id: int, text: str, context: Any = None) -> asyncio.Task:
+        """Ставит сообщение в очередь пользователя и сразу возвращает управление"""
+        self.stats.received += 1
+        queue = self._queues.setdefault(user_id, _UserQueue())
+        if queue.texts:
+            self.stats.coalesced += 1
+        queue.texts.append(text)
+        queue.context = context
+
+        if queue.task is not None and not queue.task.done():
+            if queue.lock.locked():
+                self.stats.cancelled += 1
+                logger.info("User %s: генерация отменена новым сообщением", user_id)
+            queue.task.cancel()
+        queue.task = asyncio.create_task(self._run(user_id, queue))
+        return queue.task
+
+    async def _run(self, user_id: int, queue: _UserQueue) -> None:
+        await asyncio.sleep(self.window)
+        # отменённая генерация может ещё завершаться — ждём её
+        async with queue.lock:
+            texts = list(queue.texts)
+            if len(texts) > 1:
+                logger.info("User %s: склеено %d сообщений", user_id, len(texts))
+            self.stats.processed += 1
+            try:
+                await self.handler(user_id, self.separator.join(texts), queue.context)
+            except Exception as e:
+                logger.exception("Ошибка при обработке сообщений: %s", e)
+
+            del queue.texts[: len(texts)]
+            if not queue.texts and queue.task is asyncio.current_task():
+                del self._queues[user_id]
+
+    def __len__(self) -> int:
+        return len(self._queues)
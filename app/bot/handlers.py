@@ -1,19 +1,22 @@
+import asyncio
+import functools
 import logging
+import time
+from typing import AsyncIterator
 
 from aiogram import Router, types
 from aiogram.filters import CommandStart
 
+from app.bot.dispatch import UserDispatcher
+from app.bot.outbox import MESSAGE_LIMIT, Priority, get_outbox, split_text
 from app.config import settings
-from app.services.answer_service import LLMService
-from app.services.answer_service_mock import LLMServiceMock
+from app.metrics import ERRORS, StatsCollector, new_trace_id, registry, span
+from app.services import get_llm_service
+from app.services.answer_service import ERROR_ANSWER
 
 logger = logging.getLogger(__name__)
 
 router = Router()
-if settings.USE_MOCK_LLM:
-    llm_service = LLMServiceMock()
-else:
-    llm_service = LLMService()
 
 
 # ------------------- Обработчик /start -------------------
@@ -25,39 +28,128 @@ async def start_handler(message: types.Message) -> None:
     """
     user_id = message.from_user.id
 
-    # Инициализация state пользователя
-    if user_id not in llm_service.user_states:
-        llm_service.user_states[user_id] = {
-            "state": "NEED_CLUB",
-            "club": None,
-            "time_preference": None,
-        }
+    # Инициализация сессии пользователя
+    await get_llm_service().sessions.get(user_id)
 
-    await message.answer(
+    await get_outbox().answer(
+        message,
         "Привет! 👋 Я Малика, ваш помощник по фитнес-клубам Chekhov Sport Club.\n"
-        "Напишите район, город или название конкретного клуба, и я помогу подобрать абонемент."
+        "Напишите район, город или название конкретного клуба, и я помогу подобрать абонемент.",
     )
 
 
-# ------------------- Обработчик текста -------------------
-@router.message()
-async def text_handler(message: types.Message) -> None:
+# ------------------- Потоковая отправка ответа -------------------
+async def answer_streaming(message: types.Message, chunks: AsyncIterator[str]) -> str:
     """
-    Обрабатывает текстовые сообщения пользователя и возвращает ответ
-    через LLMService, учитывая state и intent.
+    Отправляет ответ по мере генерации: первое сообщение уходит с первыми
+    токенами, дальше оно редактируется не чаще раза в STREAM_EDIT_INTERVAL
+    секунд, чтобы не упираться в лимиты Telegram на редактирование.
+    Промежуточные правки идут с низким приоритетом и при перегрузке
+    пропускаются; текст длиннее лимита Telegram дописывается новыми
+    сообщениями. Возвращает итоговый текст.
     """
-    user_id = message.from_user.id
-    user_text = message.text.strip()
+    outbox = get_outbox()
+    chat_id = message.chat.id
+    text = ""
+    shown = ""
+    sent: types.Message | None = None
+    last_edit = 0.0
 
-    logger.info("User %s query: %s", user_id, user_text)
+    async for chunk in chunks:
+        text += chunk
+        if not text.strip():
+            continue
+
+        now = time.monotonic()
+        if sent is None:
+            shown = split_text(text, MESSAGE_LIMIT)[0]
+            with span("telegram_send"):
+                sent = await outbox.send(
+                    chat_id, functools.partial(message.answer, shown)
+                )
+            last_edit = now
+        elif now - last_edit >= settings.STREAM_EDIT_INTERVAL:
+            head = split_text(text, MESSAGE_LIMIT)[0]
+            if head != shown:
+                with span("telegram_edit"):
+                    edited = await outbox.send(
+                        chat_id,
+                        functools.partial(sent.edit_text, head),
+                        Priority.PROGRESS,
+                    )
+                if edited is not None:
+                    shown = head
+            last_edit = now
 
+    final = text.strip()
+    if sent is None:
+        with span("telegram_send"):
+            await outbox.answer(message, final or ERROR_ANSWER)
+        return final
+
+    head, *rest = split_text(final, MESSAGE_LIMIT)
+    if head != shown:
+        with span("telegram_edit"):
+            await outbox.send(chat_id, functools.partial(sent.edit_text, head))
+    if rest:
+        with span("telegram_send"):
+            await outbox.answer(message, "\n\n".join(rest))
+    return final
+
+
+# ------------------- Обработчик текста -------------------
+async def reply(user_id: int, user_text: str, message: types.Message) -> None:
+    """
+    Отвечает на (возможно склеенный) запрос пользователя
+    через LLMService, учитывая state и intent.
+    """
+    new_trace_id(user_id=user_id)
+    llm_service = get_llm_service()
     try:
         # Генерация ответа с учетом состояния пользователя
-        response = await llm_service.generate_response(user_id, user_text)
-        await message.answer(response)
+        with span("reply"):
+            if settings.STREAM_RESPONSES:
+                await answer_streaming(
+                    message, llm_service.generate_response_stream(user_id, user_text)
+                )
+            else:
+                response = await llm_service.generate_response(user_id, user_text)
+                with span("telegram_send"):
+                    await get_outbox().answer(message, response)
+        # в JSON-логе запись несёт длительности всех этапов запроса
+        logger.info("Ответ пользователю %s отправлен", user_id)
 
     except Exception as e:
         logger.exception("Ошибка при обработке сообщения пользователя: %s", e)
-        await message.answer(
-            "Извините, произошла ошибка при обработке вашего запроса. Попробуйте позже."
+        ERRORS.inc(component="handler")
+        await get_outbox().answer(
+            message,
+            "Извините, произошла ошибка при обработке вашего запроса. Попробуйте позже.",
         )
+
+
+@functools.cache
+def get_dispatcher() -> UserDispatcher:
+    """Сообщения одного пользователя обрабатываются по очереди, серии склеиваются"""
+    dispatcher = UserDispatcher(reply, window=settings.COALESCE_WINDOW)
+    registry.register(
+        StatsCollector(
+            "chekhov_dispatch", "Диспетчер сообщений", lambda: dispatcher.stats
+        )
+    )
+    return dispatcher
+
+
+@router.message()
+async def text_handler(message: types.Message) -> None:
+    """
+    Принимает текстовое сообщение пользователя и передаёт его диспетчеру.
+    """
+    user_id = message.from_user.id
+    user_text = message.text.strip()
+
+    logger.info("User %s query: %s", user_id, user_text)
+
+    # ждём ответа, чтобы очередь вебхука учитывала реальную нагрузку;
+    # отмена склеенной генерации здесь не пробрасывается
+    await asyncio.wait([get_dispatcher().submit(user_id, user_text, message)])
@@ -0,0 +1,307 @@
+import asyncio
+import functools
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable
+
+from aiogram import types
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.config import settings
+from app.metrics import OUTBOX_SECONDS, StatsCollector, registry
+
+logger = logging.getLogger(__name__)
+
+# предел длины текста сообщения в Bot API
+MESSAGE_LIMIT = 4096
+
+
+class Priority(IntEnum):
+    """Меньшее значение отправляется раньше."""
+
+    REPLY = 0
+    # промежуточные правки потокового ответа: при перегрузке отбрасываются
+    PROGRESS = 1
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Делит текст на части не длиннее limit: по абзацам, строкам, пробелам"""
+    chunks = []
+    text = text.strip()
+    while len(text) > limit:
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = text.rfind(separator, 0, limit + 1)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class TokenBucket:
+    """Ограничение частоты: rate токенов в секунду, не больше capacity подряд."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до следующего токена"""
+        now = self.clock()
+        self._refill(now)
+        wait = max(0.0, (1 - self._tokens) / self.rate)
+        return max(wait, self._blocked_until - now)
+
+    def take(self) -> None:
+        self._refill(self.clock())
+        self._tokens -= 1
+
+    async def acquire(self) -> None:
+        """Ждёт и забирает токен"""
+        self.take()
+        wait = max(-self._tokens / self.rate, self._blocked_until - self.clock())
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def block(self, seconds: float) -> None:
+        """Запрещает отправку на seconds секунд (ответ 429 с retry_after)"""
+        self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        """Бакет полон и не заблокирован: его можно забыть без потери лимита"""
+        now = self.clock()
+        self._refill(now)
+        return self._tokens >= self.capacity and self._blocked_until <= now
+
+
+@dataclass
+class OutboxStats:
+    enqueued: int = 0
+    sent: int = 0
+    queued: int = 0
+    retried: int = 0
+    dropped: int = 0
+    failed: int = 0
+    chunks: int = 0
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    chat_id: int = field(compare=False)
+    call: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False, default_factory=time.perf_counter)
+    attempts: int = field(compare=False, default=0)
+
+
+class Outbox:
+    """Очередь исходящих запросов к Bot API.
+
+    Соблюдает общий лимит бота и лимит на чат (token bucket), при 429
+    ждёт retry_after и повторяет запрос, ответы пропускает вперёд
+    промежуточных правок, а правки при переполнении очереди отбрасывает.
+    Вызывающий код ждёт результата запроса, как при прямом вызове.
+    """
+
+    # сколько чатов помнить, прежде чем забывать бакеты простаивающих
+    CHATS_PRUNE_AT = 1024
+
+    def __init__(
+        self,
+        workers: int = 8,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 3,
+        max_pending: int = 500,
+    ) -> None:
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self.stats = OutboxStats()
+        self._global = TokenBucket(global_rate)
+        self._chats: dict[int, TokenBucket] = {}
+        self._seq = itertools.count()
+        self._queue: asyncio.PriorityQueue[_Job] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _start(self) -> asyncio.PriorityQueue[_Job]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # воркеры привязаны к циклу событий, в котором их запустили
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._tasks = [
+                loop.create_task(self._worker()) for _ in range(self.workers)
+            ]
+        return self._queue
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.CHATS_PRUNE_AT:
+                self._chats = {c: b for c, b in self._chats.items() if not b.idle}
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _put(self, job: _Job) -> None:
+        if not job.future.done():
+            self._queue.put_nowait(job)
+            self.stats.queued += 1
+
+    async def send(
+        self,
+        chat_id: int,
+        call: Callable[[], Awaitable[Any]],
+        priority: Priority = Priority.REPLY,
+    ) -> Any:
+        """Выполняет запрос call в очереди; None — запрос отброшен"""
+        queue = self._start()
+        if priority > Priority.REPLY and queue.qsize() >= self.max_pending:
+            self.stats.dropped += 1
+            return None
+
+        job = _Job(
+            priority,
+            next(self._seq),
+            chat_id,
+            call,
+            asyncio.get_running_loop().create_future(),
+        )
+        self.stats.enqueued += 1
+        self._put(job)
+        return await job.future
+
+    async def answer(
+        self,
+        message: types.Message,
+        text: str,
+        priority: Priority = Priority.REPLY,
+    ) -> types.Message | None:
+        """Отвечает на сообщение; длинный текст уходит несколькими сообщениями.
+        Возвращает первое отправленное сообщение."""
+        first = None
+        chunks = split_text(text)
+        self.stats.chunks += len(chunks)
+        for chunk in chunks:
+            sent = await self.send(
+                message.chat.id, functools.partial(message.answer, chunk), priority
+            )
+            first = first or sent
+        return first
+
+    async def _worker(self) -> None:
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            self.stats.queued -= 1
+            try:
+                await self._process(job)
+            finally:
+                queue.task_done()
+
+    async def _process(self, job: _Job) -> None:
+        if job.future.done():
+            # вызывающий больше не ждёт (генерация отменена)
+            return
+
+        chat = self._bucket(job.chat_id)
+        wait = chat.delay()
+        if wait > 0:
+            # чат исчерпал лимит: вернём запрос в очередь, когда появится токен,
+            # а воркер пока займётся другими чатами
+            self._loop.call_later(wait, self._put, job)
+            return
+        chat.take()
+        await self._global.acquire()
+
+        try:
+            result = await job.call()
+        except TelegramRetryAfter as e:
+            job.attempts += 1
+            if job.attempts > self.max_retries:
+                self.stats.failed += 1
+                job.future.set_exception(e)
+                return
+            logger.warning(
+                "Telegram просит подождать %s c (чат %s)", e.retry_after, job.chat_id
+            )
+            self.stats.retried += 1
+            # лимит флуда считается на весь бот: остальные чаты тоже ждут
+            chat.block(e.retry_after)
+            self._global.block(e.retry_after)
+            self._put(job)
+        except Exception as e:
+            self.stats.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.stats.sent += 1
+            OUTBOX_SECONDS.observe(
+                time.perf_counter() - job.enqueued_at,
+                priority=Priority(job.priority).name.lower(),
+            )
+            if not job.future.done():
+                job.future.set_result(result)
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Дожидается отправки очереди (не дольше timeout) и останавливает воркеры"""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Не все исходящие сообщения отправлены при остановке")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+
+@functools.cache
+def get_outbox() -> Outbox:
+    """Общая очередь отправки; лимит бота делится между рабочими процессами"""
+    outbox = Outbox(
+        workers=settings.OUTBOX_WORKERS,
+        global_rate=settings.OUTBOX_GLOBAL_RATE / max(settings.BOT_WORKERS, 1),
+        chat_rate=settings.OUTBOX_CHAT_RATE,
+        chat_burst=settings.OUTBOX_CHAT_BURST,
+        max_retries=settings.OUTBOX_MAX_RETRIES,
+        max_pending=settings.OUTBOX_MAX_PENDING,
+    )
+    registry.register(
+        StatsCollector(
+            "chekhov_outbox", "Очередь отправки в Telegram", lambda: outbox.stats
+        )
+    )
+    return outbox
@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import Update
+
+from app.bot.outbox import get_outbox
+from app.bot.webhook import BUSY_ANSWER, run_webhook
+from app.config import settings
+from app.logs import configure_logging
+from app.metrics import start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+# сигнал рабочему процессу завершиться
+_STOP = None
+
+
+def shard_for(user_id: int | None, shards: int) -> int:
+    """Номер рабочего процесса для пользователя.
+    user_id в Telegram — целое число, поэтому остаток от деления стабилен
+    между запусками (в отличие от hash() строк); обновления без
+    пользователя идут в нулевой процесс."""
+    if user_id is None:
+        return 0
+    return user_id % shards
+
+
+def update_user_id(update: Update) -> int | None:
+    try:
+        user = getattr(update.event, "from_user", None)
+    except Exception:
+        return None
+    return user.id if user else None
+
+
+@dataclass
+class ShardStats:
+    routed: Counter = field(default_factory=Counter)
+    # отклонено из-за переполненной очереди процесса
+    rejected: Counter = field(default_factory=Counter)
+
+
+class ShardRouter:
+    """Раскладывает обновления по очередям рабочих процессов.
+
+    Все обновления пользователя попадают в одну FIFO-очередь, поэтому
+    их порядок сохраняется, а состояние диалога живёт в одном процессе.
+    Очереди ограничены: если процесс не успевает, route бросает queue.Full.
+    """
+
+    def __init__(self, queues: list) -> None:
+        self.queues = queues
+        self.stats = ShardStats()
+
+    async def route(self, update: Update) -> None:
+        shard = shard_for(update_user_id(update), len(self.queues))
+        try:
+            self.queues[shard].put_nowait(update.model_dump_json(exclude_unset=True))
+        except queue.Full:
+            self.stats.rejected[shard] += 1
+            raise
+        self.stats.routed[shard] += 1
+
+
+class ShardingMiddleware(BaseMiddleware):
+    """Внешний middleware приёмника: вместо обработки отправляет
+    обновление в рабочий процесс."""
+
+    def __init__(self, router: ShardRouter) -> None:
+        self.router = router
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> None:
+        try:
+            await self.router.route(event)
+        except queue.Full:
+            logger.warning(
+                "Рабочий процесс перегружен, update %s отклонён", event.update_id
+            )
+            if event.message is not None:
+                # под нагрузкой лимиты Telegram важнее всего: через общую очередь
+                await get_outbox().answer(event.message, BUSY_ANSWER)
+
+
+async def consume(
+    queue: Any, feed: Callable[[str], Awaitable[object]], limit: int
+) -> None:
+    """Читает обновления из очереди процесса, пока не придёт сигнал остановки.
+
+    Задачи запускаются в порядке поступления, а дальше сообщения одного
+    пользователя упорядочивает UserDispatcher. В обработке не больше limit
+    обновлений: занятый процесс перестаёт читать, его очередь заполняется,
+    и приёмник отвечает «занято».
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(limit)
+    tasks: set[asyncio.Task] = set()
+
+    def _done(task: asyncio.Task) -> None:
+        tasks.discard(task)
+        slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Ошибка при обработке update", exc_info=task.exception())
+
+    while True:
+        await slots.acquire()
+        data = await loop.run_in_executor(None, queue.get)
+        if data is _STOP:
+            break
+        task = asyncio.create_task(feed(data))
+        tasks.add(task)
+        task.add_done_callback(_done)
+
+    if tasks:
+        await asyncio.wait(tasks)
+
+
+async def _serve(index: int, queue: Any) -> None:
+    # свои бот, LLMService и клиенты у каждого процесса
+    from app.bot.bot import dp
+    from app.lifecycle import Lifecycle
+
+    if settings.METRICS_PORT:
+        await start_metrics_server(
+            settings.METRICS_HOST, settings.METRICS_PORT + 1 + index
+        )
+
+    # набор готовых ответов собирает один процесс, остальные читают его файл
+    settings.ANSWER_PACK_BUILD = settings.ANSWER_PACK_BUILD and index == 0
+
+    lifecycle = Lifecycle()
+    bot = await lifecycle.start()
+
+    async def feed(data: str) -> None:
+        update = Update.model_validate_json(data, context={"bot": bot})
+        await dp.feed_update(bot, update)
+
+    try:
+        await consume(queue, feed, settings.BOT_WORKER_CONCURRENCY)
+    finally:
+        await lifecycle.stop()
+
+
+def stop_workers(queues: list, processes: list, timeout: float) -> None:
+    """Просит рабочие процессы завершиться и ждёт их не дольше timeout
+    секунд на всех; не успевшие останавливает terminate().
+    Блокирующая, вызывается из потока."""
+    deadline = time.monotonic() + timeout
+    for worker_queue in queues:
+        try:
+            worker_queue.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Full:
+            # процесс не разбирает очередь — его остановит terminate()
+            pass
+    for process in processes:
+        process.join(timeout=max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            logger.warning("Рабочий процесс %s не завершился, terminate", process.name)
+            process.terminate()
+
+
+def _worker_main(index: int, queue: Any) -> None:
+    configure_logging(f"worker-{index}")
+    logger.info("Рабочий процесс %d запущен (pid %d)", index, os.getpid())
+    asyncio.run(_serve(index, queue))
+
+
+async def run_sharded(bot: Bot, dp: Dispatcher) -> None:
+    """Один приёмник (polling или webhook) и BOT_WORKERS рабочих процессов.
+
+    Процессы делят снимок справочника и сессии через SQLite-файлы,
+    поэтому хранилище сессий принудительно переключается на sqlite.
+    """
+    if settings.SESSION_BACKEND != "sqlite":
+        logger.info("Несколько процессов: сессии переключены на SQLite")
+        os.environ["SESSION_BACKEND"] = "sqlite"
+
+    context = multiprocessing.get_context("spawn")
+    queues = [
+        context.Queue(maxsize=settings.BOT_WORKER_QUEUE_SIZE)
+        for _ in range(settings.BOT_WORKERS)
+    ]
+    processes = [
+        context.Process(
+            target=_worker_main, args=(i, queue), name=f"bot-worker-{i}", daemon=True
+        )
+        for i, queue in enumerate(queues)
+    ]
+    for process in processes:
+        process.start()
+
+    router = ShardRouter(queues)
+    try:
+        if settings.RUN_MODE == "webhook":
+            # своя очередь вебхуку не нужна: при переполнении очереди процесса
+            # «занято» уходит прямо в ответе на вебхук
+            await run_webhook(bot, dp, sink=router.route, workers=0)
+        else:
+            ingress = Dispatcher()
+            ingress.update.outer_middleware(ShardingMiddleware(router))
+            await ingress.start_polling(
+                bot, allowed_updates=dp.resolve_used_update_types()
+            )
+    finally:
+        # ожидание процессов — в потоке, чтобы не останавливать цикл событий,
+        # пока приёмник ещё закрывается
+        await asyncio.to_thread(
+            stop_workers, queues, processes, settings.BOT_WORKER_SHUTDOWN_TIMEOUT
+        )
+        if get_outbox.cache_info().currsize:
+            await get_outbox().close()
+        logger.info("Распределение обновлений по процессам: %s", router.stats.routed)
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import queue
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+from app.config import settings
+from app.metrics import StatsCollector, registry
+
+logger = logging.getLogger(__name__)
+
+BUSY_ANSWER = (
+    "Сейчас очень много обращений 🙏 Пожалуйста, повторите вопрос через минуту."
+)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+UpdateSink = Callable[[Update], Awaitable[object]]
+
+
+@dataclass
+class WebhookStats:
+    """Счётчики вебхука: принятые, отклонённые из-за перегрузки,
+    обработанные обновления и ошибки обработки."""
+
+    accepted: int = 0
+    rejected: int = 0
+    processed: int = 0
+    errors: int = 0
+    max_queue: int = 0
+
+
+class WebhookServer:
+    """HTTP-приёмник обновлений Telegram с ограниченной очередью.
+
+    Обновление подтверждается сразу и кладётся в очередь, которую разбирают
+    `workers` обработчиков. Если очередь заполнена, обновление не ставится
+    в очередь: на сообщение сразу отвечаем «занято» прямо в ответе на
+    вебхук (Telegram выполнит метод из тела ответа), не увеличивая задержку
+    для остальных.
+
+    При workers=0 своей очереди нет: sink вызывается сразу и сам кладёт
+    обновление в ограниченную очередь (рабочих процессов), а переполнение
+    сообщает исключением queue.Full.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        sink: UpdateSink,
+        workers: int,
+        queue_size: int,
+        path: str = "/webhook",
+        secret_token: str | None = None,
+    ) -> None:
+        self.bot = bot
+        self.sink = sink
+        self.workers = workers
+        self.path = path
+        self.secret_token = secret_token
+        self.stats = WebhookStats()
+        self.queue: asyncio.Queue[Update] = asyncio.Queue(maxsize=queue_size)
+        self._tasks: list[asyncio.Task] = []
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        app.on_startup.append(self._start_workers)
+        app.on_cleanup.append(self._stop_workers)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if (
+            self.secret_token
+            and request.headers.get(SECRET_HEADER) != self.secret_token
+        ):
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(
+                await request.json(), context={"bot": self.bot}
+            )
+        except (ValueError, ValidationError):
+            return web.Response(status=400)
+
+        try:
+            if self.workers:
+                self.queue.put_nowait(update)
+            else:
+                await self.sink(update)
+        except (asyncio.QueueFull, queue.Full):
+            self.stats.rejected += 1
+            logger.warning(
+                "Очередь обновлений заполнена, update %s отклонён", update.update_id
+            )
+            return self._busy_response(update)
+
+        self.stats.accepted += 1
+        self.stats.max_queue = max(self.stats.max_queue, self.queue.qsize())
+        return web.json_response({})
+
+    @staticmethod
+    def _busy_response(update: Update) -> web.Response:
+        if update.message is None:
+            return web.json_response({})
+        return web.json_response(
+            {
+                "method": "sendMessage",
+                "chat_id": update.message.chat.id,
+                "text": BUSY_ANSWER,
+            }
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.sink(update)
+                self.stats.processed += 1
+            except Exception as e:
+                self.stats.errors += 1
+                logger.exception("Ошибка при обработке update: %s", e)
+            finally:
+                self.queue.task_done()
+
+    async def _start_workers(self, app: web.Application | None = None) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(
+            "Вебхук %s: %d обработчиков, очередь %d",
+            self.path,
+            self.workers,
+            self.queue.maxsize,
+        )
+
+    async def _stop_workers(self, app: web.Application | None = None) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+async def run_webhook(
+    bot: Bot,
+    dp: Dispatcher,
+    sink: UpdateSink | None = None,
+    workers: int | None = None,
+) -> None:
+    """Запускает приём обновлений через вебхук вместо long polling.
+    По умолчанию обновления обрабатывает dp в этом же процессе."""
+    server = WebhookServer(
+        bot,
+        sink=sink or (lambda update: dp.feed_update(bot, update)),
+        workers=settings.WEBHOOK_WORKERS if workers is None else workers,
+        queue_size=settings.WEBHOOK_QUEUE_SIZE,
+        path=settings.WEBHOOK_PATH,
+        secret_token=settings.WEBHOOK_SECRET,
+    )
+    registry.register(
+        StatsCollector("chekhov_webhook", "Приём обновлений", lambda: server.stats)
+    )
+    runner = web.AppRunner(server.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT).start()
+
+    if settings.WEBHOOK_URL:
+        await bot.set_webhook(
+            settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET,
+            max_connections=settings.WEBHOOK_WORKERS,
+        )
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
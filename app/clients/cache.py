@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class CacheStats:
+    """Счётчики обращений к кэшу."""
+
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    errors: int = 0
+
+
+@dataclass
+class _Entry(Generic[T]):
+    value: T
+    fetched_at: float
+
+
+class AsyncTTLCache(Generic[T]):
+    """Асинхронный кэш с TTL и stale-while-revalidate.
+
+    - свежее значение (моложе `ttl`) отдаётся сразу;
+    - устаревшее, но моложе `ttl + stale_ttl`, тоже отдаётся сразу,
+      а обновление запускается одной фоновой задачей;
+    - одновременные промахи по одному ключу схлопываются в одну загрузку.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: dict[Hashable, _Entry[T]] = {}
+        self._inflight: dict[Hashable, asyncio.Future[T]] = {}
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[T]]) -> T:
+        """Возвращает значение по ключу, при необходимости загружая его через loader."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self._clock() - entry.fetched_at
+            if age < self.ttl:
+                self.stats.hits += 1
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stats.stale_hits += 1
+                self._refresh_in_background(key, loader)
+                return entry.value
+
+        self.stats.misses += 1
+        return await asyncio.shield(self._start_fetch(key, loader))
+
+    def peek(self, key: Hashable) -> T | None:
+        """Возвращает последнее загруженное значение независимо от его возраста"""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def prime(self, key: Hashable, value: T, age: float = 0.0) -> None:
+        """Кладёт в кэш значение, полученное в обход loader (например, из снимка)"""
+        self._entries[key] = _Entry(value=value, fetched_at=self._clock() - age)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Сбрасывает одну запись или весь кэш."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _start_fetch(
+        self, key: Hashable, loader: Callable[[], Awaitable[T]]
+    ) -> asyncio.Future[T]:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(key, loader))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return future
+
+    async def _fetch(self, key: Hashable, loader: Callable[[], Awaitable[T]]) -> T:
+        try:
+            value = await loader()
+        except Exception:
+            self.stats.errors += 1
+            raise
+        self._entries[key] = _Entry(value=value, fetched_at=self._clock())
+        self.stats.refreshes += 1
+        return value
+
+    def _refresh_in_background(
+        self, key: Hashable, loader: Callable[[], Awaitable[T]]
+    ) -> None:
+        if key in self._inflight:
+            return
+        future = self._start_fetch(key, loader)
+        future.add_done_callback(self._log_background_error)
+
+    @staticmethod
+    def _log_background_error(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(
+                "Фоновое обновление кэша не удалось, отдаём устаревшие данные: %s",
+                future.exception(),
+            )
@@ -0,0 +1,195 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping
+
+from app.clients.models import RowChanges, SheetRows
+
+DEPARTMENTS_SHEET = "all_departments"
+GROUP_CLASSES_SHEET = "group_classes"
+CATALOG_SHEETS = (DEPARTMENTS_SHEET, GROUP_CLASSES_SHEET)
+
+# служебные колонки листа group_classes; остальные колонки — клубы
+CLASS_INFO_COLUMNS = {"Name", "description", "Time", "paid"}
+
+NO_DATA = "Нет данных"
+
+
+def _empty() -> Mapping:
+    return MappingProxyType({})
+
+
+def _clean(value: str) -> str:
+    """Убирает кавычки, переносы строк и лишние пробелы"""
+    return value.replace('"', "").replace("\n", " ").strip()
+
+
+def _parse_districts(cell: str) -> tuple[str, ...]:
+    """Ячейка district: районы через «+», с пояснениями в скобках"""
+    parts = (p.strip().split("(")[0].strip() for p in cell.split("+"))
+    return tuple(p for p in parts if p)
+
+
+def _parse_city(address: str) -> str | None:
+    """Город из адреса — часть вида «г. Самарканд»; None, если города нет"""
+    for part in address.split(","):
+        part = part.strip()
+        if part.lower().startswith("г."):
+            return part
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class Club:
+    """Клуб из листа all_departments (address None — клуба нет в листе)."""
+
+    name: str
+    address: str | None = None
+    phone: str | None = None
+    districts: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class GroupClass:
+    """Групповое занятие: строка листа group_classes."""
+
+    name: str
+    description: str = ""
+    time: str = ""
+    paid: str = ""
+    clubs: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogChanges:
+    """Что поменялось между двумя версиями справочника."""
+
+    clubs: RowChanges = RowChanges()
+    classes: RowChanges = RowChanges()
+    # изменились перечни названий, районов или городов
+    lists_changed: bool = False
+    # названия (casefold) клубов и занятий, ответы о которых устарели
+    entities: frozenset[str] = frozenset()
+
+    def __bool__(self) -> bool:
+        return bool(self.clubs or self.classes or self.lists_changed)
+
+    def affects(self, entity: str | None) -> bool:
+        """Устарел ли ответ о сущности; None — ответ по общим перечням"""
+        if entity is None:
+            return self.lists_changed
+        return entity.casefold() in self.entities
+
+
+@dataclass(frozen=True, slots=True)
+class Catalog:
+    """Нормализованный справочник: клубы, занятия и индексы по ним.
+
+    Собирается один раз на версию листов и дальше только читается,
+    поэтому один объект можно раздавать всем обработчикам без копирования.
+    """
+
+    clubs: Mapping[str, Club] = field(default_factory=_empty)
+    classes: tuple[GroupClass, ...] = ()
+    club_names: tuple[str, ...] = ()
+    class_names: tuple[str, ...] = ()
+    districts: tuple[str, ...] = ()
+    cities: tuple[str, ...] = ()
+    classes_by_club: Mapping[str, tuple[str, ...]] = field(default_factory=_empty)
+    # ключ — название занятия в casefold
+    clubs_by_class: Mapping[str, tuple[Club, ...]] = field(default_factory=_empty)
+    # листы, из которых собран справочник
+    source: Mapping[str, SheetRows] = field(default_factory=_empty, compare=False)
+
+    @classmethod
+    def build(cls, sheets: Mapping[str, SheetRows]) -> "Catalog":
+        departments = sheets.get(DEPARTMENTS_SHEET, SheetRows(DEPARTMENTS_SHEET))
+        group_classes = sheets.get(GROUP_CLASSES_SHEET, SheetRows(GROUP_CLASSES_SHEET))
+
+        clubs: dict[str, Club] = {}
+        cities = set()
+        for dep in departments.rows:
+            name = _clean(dep.get("Name") or "")
+            if not name:
+                continue
+            address = _clean(dep.get("address") or "")
+            clubs[name] = Club(
+                name=name,
+                address=address or NO_DATA,
+                phone=_clean(dep.get("phone") or "") or NO_DATA,
+                districts=_parse_districts(dep.get("district") or ""),
+            )
+            city = _parse_city(address)
+            if city and city[2:].strip().lower() != "ташкент":
+                cities.add(city)
+
+        classes = []
+        classes_by_club: dict[str, list[str]] = {}
+        clubs_by_class: dict[str, tuple[Club, ...]] = {}
+        for row in group_classes.rows:
+            class_name = (row.get("Name") or "").strip()
+            if not class_name:
+                continue
+            class_clubs = tuple(
+                _clean(k)
+                for k, v in row.items()
+                if k not in CLASS_INFO_COLUMNS and v == "Да"
+            )
+            classes.append(
+                GroupClass(
+                    name=class_name,
+                    description=(row.get("description") or "").strip(),
+                    time=(row.get("Time") or "").strip(),
+                    paid=(row.get("paid") or "").strip(),
+                    clubs=class_clubs,
+                )
+            )
+            for club in class_clubs:
+                classes_by_club.setdefault(club, []).append(class_name)
+            clubs_by_class[class_name.casefold()] = tuple(
+                clubs.get(club, Club(name=club)) for club in class_clubs
+            )
+
+        return cls(
+            clubs=MappingProxyType(clubs),
+            classes=tuple(classes),
+            club_names=tuple(clubs),
+            class_names=tuple(c.name for c in classes),
+            districts=tuple(
+                sorted({d for club in clubs.values() for d in club.districts})
+            ),
+            cities=tuple(sorted(cities)),
+            classes_by_club=MappingProxyType(
+                {k: tuple(v) for k, v in classes_by_club.items()}
+            ),
+            clubs_by_class=MappingProxyType(clubs_by_class),
+            source=MappingProxyType(dict(sheets)),
+        )
+
+    def diff(self, previous: "Catalog") -> CatalogChanges:
+        """Разница с предыдущей версией справочника"""
+        old_classes = {c.name: c for c in previous.classes}
+        new_classes = {c.name: c for c in self.classes}
+        clubs = RowChanges.between(previous.clubs, self.clubs)
+        classes = RowChanges.between(old_classes, new_classes)
+
+        entities = {*clubs.keys, *classes.keys}
+        # контакты клуба входят в ответы о занятиях, которые в нём проходят
+        for name in clubs.keys:
+            entities.update(previous.classes_by_club.get(name, ()))
+            entities.update(self.classes_by_club.get(name, ()))
+        # а расписание занятия — в ответы о клубах, где оно проходит
+        for name in classes.keys:
+            for version in (old_classes.get(name), new_classes.get(name)):
+                if version is not None:
+                    entities.update(version.clubs)
+        return CatalogChanges(
+            clubs=clubs,
+            classes=classes,
+            lists_changed=(
+                self.club_names != previous.club_names
+                or self.class_names != previous.class_names
+                or self.districts != previous.districts
+                or self.cities != previous.cities
+            ),
+            entities=frozenset(e.casefold() for e in entities),
+        )
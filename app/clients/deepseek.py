@@ -0,0 +1,161 @@
+import asyncio
+import functools
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from app.config import settings
+from app.metrics import StatsCollector, registry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompletionStats:
+    """Счётчики обращений к LLM (время — суммарное, в секундах)."""
+
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    queue_wait: float = 0.0
+    latency: float = 0.0
+
+
+class DeepSeekClient:
+    """Асинхронный клиент DeepSeek (OpenAI-совместимый API).
+
+    Один на процесс: использует общий пул HTTP-соединений и ограничивает
+    число одновременных запросов семафором, чтобы пики трафика не
+    упирались в лимиты API, а ждали своей очереди.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str = "deepseek-chat",
+        max_concurrency: int = 16,
+        max_connections: int = 32,
+        timeout: float = 30.0,
+    ) -> None:
+        self.model = model
+        self.timeout = timeout
+        self.stats = CompletionStats()
+
+        self._client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=60,
+                ),
+                timeout=httpx.Timeout(timeout, connect=5.0),
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        registry.register(
+            StatsCollector("chekhov_llm", "Запросы к DeepSeek", lambda: self.stats)
+        )
+
+    async def complete(self, messages: list[dict[str, str]]) -> str:
+        """Возвращает текст ответа модели.
+        Логирует время ожидания в очереди и время самого запроса."""
+        queued = time.perf_counter()
+        async with self._semaphore:
+            started = time.perf_counter()
+            self.stats.in_flight += 1
+            try:
+                response = await self._client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=False,
+                    timeout=self.timeout,
+                )
+            except Exception:
+                self.stats.errors += 1
+                raise
+            finally:
+                self.stats.in_flight -= 1
+                finished = time.perf_counter()
+                self.stats.requests += 1
+                self.stats.queue_wait += started - queued
+                self.stats.latency += finished - started
+
+        logger.info(
+            "Запрос к DeepSeek: ожидание %.1f мс, выполнение %.1f мс",
+            (started - queued) * 1000,
+            (finished - started) * 1000,
+        )
+        return response.choices[0].message.content.strip()
+
+    async def stream(self, messages: list[dict[str, str]]) -> AsyncIterator[str]:
+        """Отдаёт ответ модели частями (stream=True) по мере генерации.
+        Слот семафора занят до конца потока."""
+        queued = time.perf_counter()
+        async with self._semaphore:
+            started = time.perf_counter()
+            first_token = None
+            self.stats.in_flight += 1
+            try:
+                response = await self._client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=True,
+                    timeout=self.timeout,
+                )
+                # соединение закрывается, даже если потребитель прервал чтение
+                async with response:
+                    async for chunk in response:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                            yield delta
+            except Exception:
+                self.stats.errors += 1
+                raise
+            finally:
+                self.stats.in_flight -= 1
+                finished = time.perf_counter()
+                self.stats.requests += 1
+                self.stats.queue_wait += started - queued
+                self.stats.latency += finished - started
+
+        logger.info(
+            "Потоковый запрос к DeepSeek: ожидание %.1f мс, первый токен %.1f мс, "
+            "выполнение %.1f мс",
+            (started - queued) * 1000,
+            ((first_token or finished) - started) * 1000,
+            (finished - started) * 1000,
+        )
+
+    async def warmup(self) -> None:
+        """Открывает соединение с API до первого запроса пользователя,
+        чтобы TCP и TLS не входили в задержку первого ответа."""
+        await self._client.models.list()
+
+    async def aclose(self) -> None:
+        await self._client.close()
+
+
+@functools.cache
+def get_deepseek_client() -> DeepSeekClient:
+    """Общий клиент для всех пользователей; создаётся при первом обращении"""
+    return DeepSeekClient(
+        api_key=settings.DEEPSEEK_API_KEY,
+        base_url=settings.DEEPSEEK_BASE_URL,
+        model=settings.DEEPSEEK_MODEL,
+        max_concurrency=settings.DEEPSEEK_MAX_CONCURRENCY,
+        max_connections=settings.DEEPSEEK_MAX_CONNECTIONS,
+        timeout=settings.DEEPSEEK_TIMEOUT,
+    )
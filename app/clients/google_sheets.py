@@ -1,53 +1,357 @@
+import asyncio
+import functools
 import logging
-from typing import Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
 
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2.service_account import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
 
+from app.clients.cache import AsyncTTLCache
+from app.clients.catalog import CATALOG_SHEETS, DEPARTMENTS_SHEET, Catalog
+from app.clients.models import SheetRows
+from app.clients.snapshot import CatalogSnapshot
 from app.config import settings
+from app.metrics import ERRORS, StatsCollector, registry, span
 
 logger = logging.getLogger(__name__)
 
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+# версия файла из Drive API — дешёвый признак изменения таблицы
+PROBE_SCOPES = ["https://www.googleapis.com/auth/drive.metadata.readonly"]
+
 
 class GoogleSheetsClient:
-    def __init__(self, spreadsheet_id: str) -> None:
+    def __init__(
+        self,
+        spreadsheet_id: str,
+        max_workers: int | None = None,
+        api_endpoint: str | None = None,
+    ) -> None:
         self.spreadsheet_id = spreadsheet_id
+        max_workers = max_workers or settings.SHEETS_MAX_WORKERS
+        api_endpoint = api_endpoint or settings.SHEETS_API_ENDPOINT
+        self._api_endpoint = api_endpoint
 
-        credentials = Credentials.from_service_account_file(
-            settings.GOOGLE_SERVICE_ACCOUNT_JSON,
-            scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"],
-        )
+        if api_endpoint:
+            # локальный стенд (бенчмарк, тесты): запросы без авторизации
+            self._credentials = AnonymousCredentials()
+        else:
+            self._credentials = Credentials.from_service_account_file(
+                settings.GOOGLE_SERVICE_ACCOUNT_JSON,
+                scopes=SCOPES + (PROBE_SCOPES if settings.SHEETS_CHANGE_PROBE else []),
+            )
 
-        service = build("sheets", "v4", credentials=credentials)
+        # описание API берётся из копии, встроенной в googleapiclient,
+        # без сетевого запроса к discovery-сервису
+        service = build(
+            "sheets",
+            "v4",
+            credentials=self._credentials,
+            static_discovery=True,
+            client_options={"api_endpoint": api_endpoint} if api_endpoint else None,
+        )
         self.sheet = service.spreadsheets()
+        # Drive API нужен только для проверки версии; собирается при первой проверке
+        self._drive = None
+        self._probe_enabled = settings.SHEETS_CHANGE_PROBE
+        # версия таблицы, из которой загружен каждый набор листов в кэше
+        self._versions: dict[tuple[str, ...], str] = {}
+        # когда набор листов последний раз сверялся с таблицей (unix time):
+        # неизменившиеся листы отдаются прежним объектом со старым fetched_at
+        self._checked_at: dict[tuple[str, ...], float] = {}
 
-    async def _load_departments(
-        self, sheet_name: str = "all_departments"
-    ) -> list[dict]:
-        """Загружает все отделения из Google Sheets"""
+        # Синхронный googleapiclient выполняется в ограниченном пуле потоков,
+        # чтобы HTTP-запрос не блокировал event loop бота
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sheets"
+        )
+        self._local = threading.local()
+
+        # Общий кэш листов: все потребители клиента читают данные через него
+        self.cache: AsyncTTLCache[dict[str, SheetRows]] = AsyncTTLCache(
+            ttl=settings.SHEETS_CACHE_TTL,
+            stale_ttl=settings.SHEETS_CACHE_STALE_TTL,
+        )
+
+        # Последняя удачная копия справочника на диске: отдаём её сразу после
+        # рестарта и в случае недоступности Google Sheets
+        self.snapshot = (
+            CatalogSnapshot(settings.SHEETS_SNAPSHOT_PATH)
+            if settings.SHEETS_SNAPSHOT_PATH
+            else None
+        )
+        # нормализованный справочник пересобирается только при обновлении листов
+        self._catalog = Catalog()
+        self._restore_snapshot()
+
+        registry.register(
+            StatsCollector(
+                "chekhov_sheets_cache",
+                "Кэш листов Google Sheets",
+                lambda: self.cache.stats,
+            )
+        )
+
+    def _restore_snapshot(self) -> None:
+        """Загружает снимок справочника в кэш до первого обращения к сети"""
+        if self.snapshot is None:
+            return
+        try:
+            saved = self.snapshot.load()
+        except Exception:
+            logger.exception("Не удалось прочитать снимок справочника")
+            return
+
+        if not all(name in saved for name in CATALOG_SHEETS):
+            logger.info("Снимок справочника не найден, ждём загрузки из Google Sheets")
+            return
+
+        sheets = {name: saved[name] for name in CATALOG_SHEETS}
+        # снимок, записанный соседним процессом меньше ttl назад, используется
+        # как свежий; более старый считается устаревшим, но не просроченным:
+        # первый запрос получит его без ожидания и запустит фоновое обновление
+        age = max(s.age for s in sheets.values())
+        self.cache.prime(CATALOG_SHEETS, sheets, age=min(age, self.cache.ttl))
+        logger.info(
+            "Справочник восстановлен из снимка %s, возраст %.0f c",
+            self.snapshot.path,
+            age,
+        )
+
+    async def _save_snapshot(self, sheets: dict[str, SheetRows]) -> None:
+        if self.snapshot is None:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.snapshot.save, sheets
+            )
+        except Exception:
+            logger.exception("Не удалось сохранить снимок справочника")
+
+    async def _touch_snapshot(self, sheet_names: tuple[str, ...]) -> None:
+        """Продлевает снимок, когда таблица или строки листов не менялись:
+        иначе после рестарта он выглядел бы старым"""
+        if self.snapshot is None:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.snapshot.touch, sheet_names
+            )
+        except Exception:
+            logger.exception("Не удалось обновить снимок справочника")
+
+    def _http(self) -> AuthorizedHttp:
+        """Возвращает HTTP-транспорт текущего потока.
+        httplib2 не потокобезопасен, поэтому у каждого потока пула свой."""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self._credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    async def _execute(self, request: HttpRequest) -> dict:
+        """Выполняет запрос к Google Sheets в пуле потоков.
+        Логирует время ожидания свободного потока и время выполнения запроса."""
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def run() -> tuple[dict, float, float]:
+            started = time.perf_counter()
+            result = request.execute(http=self._http())
+            return result, started, time.perf_counter()
+
+        result, started, finished = await loop.run_in_executor(self._executor, run)
+        logger.info(
+            "Запрос к Google Sheets: ожидание %.1f мс, выполнение %.1f мс",
+            (started - submitted) * 1000,
+            (finished - started) * 1000,
+        )
+        return result
+
+    async def _fetch_sheets(self, sheet_names: tuple[str, ...]) -> dict[str, SheetRows]:
+        """Скачивает несколько листов одним запросом values.batchGet"""
+        with span("sheets_fetch"):
+            result = await self._execute(
+                self.sheet.values().batchGet(
+                    spreadsheetId=self.spreadsheet_id, ranges=list(sheet_names)
+                )
+            )
+
+        # valueRanges возвращаются в том же порядке, что и запрошенные ranges
+        value_ranges = result.get("valueRanges", [])
+        sheets = {
+            name: SheetRows.from_values(name, value_range.get("values", []))
+            for name, value_range in zip(sheet_names, value_ranges)
+        }
+        return sheets
+
+    async def _probe_version(self) -> str | None:
+        """Версия файла таблицы (растёт при любой правке); None — неизвестна"""
+        if not self._probe_enabled:
+            return None
+        if self._drive is None:
+            self._drive = build(
+                "drive",
+                "v3",
+                credentials=self._credentials,
+                static_discovery=True,
+                client_options=(
+                    {"api_endpoint": self._api_endpoint} if self._api_endpoint else None
+                ),
+            ).files()
         try:
-            result = (
-                self.sheet.values()
-                .get(spreadsheetId=self.spreadsheet_id, range=sheet_name)
-                .execute()
+            with span("sheets_probe"):
+                result = await self._execute(
+                    self._drive.get(fileId=self.spreadsheet_id, fields="version")
+                )
+        except HttpError as e:
+            if e.resp.status in (401, 403, 404):
+                # нет доступа к Drive API: дальше всегда загружаем листы целиком
+                logger.warning("Версия таблицы недоступна (%s), проверка отключена", e)
+                self._probe_enabled = False
+            return None
+        except Exception as e:
+            logger.warning("Не удалось проверить версию таблицы: %s", e)
+            return None
+        return result.get("version")
+
+    async def _refresh_sheets(
+        self, sheet_names: tuple[str, ...]
+    ) -> dict[str, SheetRows]:
+        """Обновляет листы в кэше: сначала сверяет версию таблицы и скачивает
+        листы, только если она изменилась. Если строки не изменились,
+        возвращает прежний объект, чтобы производные структуры не пересобирались."""
+        started = time.perf_counter()
+        previous = self.cache.peek(sheet_names)
+        version = await self._probe_version()
+        if (
+            previous is not None
+            and version is not None
+            and version == self._versions.get(sheet_names)
+        ):
+            logger.info(
+                "Таблица не изменилась (версия %s), проверка %.0f мс",
+                version,
+                (time.perf_counter() - started) * 1000,
             )
+            self._checked_at[sheet_names] = time.time()
+            await self._touch_snapshot(sheet_names)
+            return previous
 
-            values = result.get("values", [])
-            if not values:
-                logger.warning("Google Sheets вернул пустые данные")
-                return []
+        sheets = await self._fetch_sheets(sheet_names)
+        if version is not None:
+            self._versions[sheet_names] = version
+        if previous is None:
+            await self._save_snapshot(sheets)
+            return sheets
 
-            headers = values[0]
-            rows = values[1:]
+        elapsed = (time.perf_counter() - started) * 1000
+        # сравниваем строки целиком: построчная разница по Name склеивает
+        # строки с одинаковым или пустым именем и нужна только для журнала
+        unchanged = all(
+            name in previous
+            and rows.rows == previous[name].rows
+            and rows.headers == previous[name].headers
+            for name, rows in sheets.items()
+        )
+        if unchanged:
+            logger.info("Строки листов не изменились, обновление %.0f мс", elapsed)
+            self._checked_at[sheet_names] = time.time()
+            await self._touch_snapshot(sheet_names)
+            return previous
+        await self._save_snapshot(sheets)
+        changes = {
+            name: rows.diff(previous.get(name, SheetRows(name)))
+            for name, rows in sheets.items()
+        }
+        logger.info(
+            "Листы обновлены за %.0f мс: %s",
+            elapsed,
+            ", ".join(f"{name} {diff}" for name, diff in changes.items()),
+        )
+        return sheets
 
-            return [dict(zip(headers, row)) for row in rows]
+    async def load_sheets(self, sheet_names: Iterable[str]) -> dict[str, SheetRows]:
+        """Загружает набор листов за один round trip (через кэш).
+        При ошибке возвращает последнюю удачную копию, а если её нет —
+        пустые наборы строк."""
+        names = tuple(sheet_names)
+        try:
+            return await self.cache.get(names, lambda: self._refresh_sheets(names))
 
         except Exception:
             logger.exception("Ошибка чтения Google Sheets")
-            return []
+            ERRORS.inc(component="sheets")
+
+        # отдаём последнюю удачную копию (из памяти или восстановленную из снимка)
+        fallback = self.cache.peek(names)
+        if fallback is not None:
+            checked_at = self._checked_at.get(names)
+            age = (
+                time.time() - checked_at
+                if checked_at is not None
+                else max((s.age for s in fallback.values()), default=0.0)
+            )
+            logger.warning(
+                "Google Sheets недоступен, отдаём сохранённые данные (возраст %.0f c)",
+                age,
+            )
+            return fallback
+        return {name: SheetRows(name=name) for name in names}
+
+    async def load_catalog(self) -> dict[str, SheetRows]:
+        """Загружает все листы справочника (клубы и групповые занятия)"""
+        return await self.load_sheets(CATALOG_SHEETS)
+
+    async def get_catalog(self) -> Catalog:
+        """Справочник для текущей версии листов; один объект на версию"""
+        return self._catalog_for(await self.load_catalog())
+
+    def cached_catalog(self) -> Catalog:
+        """Справочник из последних загруженных листов (или снимка) без
+        обращения к сети; пустой, если листов ещё нет"""
+        sheets = self.cache.peek(CATALOG_SHEETS)
+        return self._catalog if sheets is None else self._catalog_for(sheets)
+
+    def _catalog_for(self, sheets: dict[str, SheetRows]) -> Catalog:
+        previous = self._catalog
+        if all(sheets.get(name) is previous.source.get(name) for name in sheets):
+            return previous
+
+        with span("catalog_build"):
+            catalog = Catalog.build(sheets)
+        if previous.source:
+            changes = catalog.diff(previous)
+            logger.info(
+                "Справочник пересобран: клубы %s, занятия %s%s",
+                changes.clubs,
+                changes.classes,
+                ", изменились перечни" if changes.lists_changed else "",
+            )
+        self._catalog = catalog
+        return catalog
+
+    async def _load_departments(
+        self, sheet_name: str = DEPARTMENTS_SHEET
+    ) -> list[dict]:
+        """Загружает все отделения из Google Sheets"""
+        with span("sheets_load"):
+            if sheet_name in CATALOG_SHEETS:
+                sheets = await self.load_catalog()
+            else:
+                sheets = await self.load_sheets((sheet_name,))
+        return list(sheets[sheet_name].rows)
 
     async def get_all_departments(
-        self, sheet_name: str = "all_departments"
+        self, sheet_name: str = DEPARTMENTS_SHEET
     ) -> list[dict]:
         """Возвращает все клубы"""
         return await self._load_departments(sheet_name)
@@ -55,7 +359,7 @@ class GoogleSheetsClient:
     async def find_department(
         self,
         query: str,
-        sheet_name: str = "all_departments",
+        sheet_name: str = DEPARTMENTS_SHEET,
     ) -> Optional[dict]:
         """Ищет клуб по вхождению Name в query"""
         departments = await self._load_departments(sheet_name)
@@ -71,43 +375,16 @@ class GoogleSheetsClient:
         logger.info("Клуб не найден по запросу: %s", query)
         return None
 
-    async def list_available_districts(
-        self, sheet_name: str = "all_departments"
-    ) -> list[str]:
+    async def list_available_districts(self) -> list[str]:
         """Возвращает уникальные районы Ташкента"""
-        departments = await self._load_departments(sheet_name)
-
-        districts = set()
+        return list((await self.get_catalog()).districts)
 
-        for dep in departments:
-            cell = dep.get("district")
-            if not cell:
-                continue
-
-            parts = [p.strip().split("(")[0].strip() for p in cell.split("+")]
-            districts.update(parts)
-
-        return sorted(districts)
-
-    async def list_available_cities(
-        self, sheet_name: str = "all_departments"
-    ) -> list[str]:
+    async def list_available_cities(self) -> list[str]:
         """Возвращает уникальные города (кроме Ташкента)"""
-        departments = await self._load_departments(sheet_name)
-
-        cities = set()
-
-        for dep in departments:
-            address = dep.get("address")
-            if not address:
-                continue
-
-            city = address.split(",")[-1].strip()
-            if city.lower() != "ташкент":
-                cities.add(city)
-
-        return sorted(cities)
+        return list((await self.get_catalog()).cities)
 
 
-# Инициализация клиента
-sheets_client = GoogleSheetsClient(spreadsheet_id=settings.GOOGLE_SHEETS_SPREADSHEET_ID)
+@functools.cache
+def get_sheets_client() -> GoogleSheetsClient:
+    """Общий клиент; создаётся при первом обращении, а не при импорте"""
+    return GoogleSheetsClient(spreadsheet_id=settings.GOOGLE_SHEETS_SPREADSHEET_ID)
@@ -0,0 +1,71 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Hashable, Mapping
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class RowChanges:
+    """Ключи строк, которые появились, пропали или изменились."""
+
+    added: frozenset = frozenset()
+    removed: frozenset = frozenset()
+    changed: frozenset = frozenset()
+
+    @classmethod
+    def between(
+        cls, old: Mapping[Hashable, object], new: Mapping[Hashable, object]
+    ) -> "RowChanges":
+        return cls(
+            added=frozenset(new.keys() - old.keys()),
+            removed=frozenset(old.keys() - new.keys()),
+            changed=frozenset(k for k in new.keys() & old.keys() if new[k] != old[k]),
+        )
+
+    @property
+    def keys(self) -> frozenset:
+        return self.added | self.removed | self.changed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self) -> str:
+        return f"+{len(self.added)} −{len(self.removed)} ~{len(self.changed)}"
+
+
+@dataclass(frozen=True)
+class SheetRows:
+    """Строки одного листа, приведённые к словарям по заголовкам.
+    `fetched_at` — момент загрузки из Google Sheets (unix time)."""
+
+    name: str
+    headers: tuple[str, ...] = ()
+    rows: tuple[dict[str, str], ...] = ()
+    fetched_at: float = field(default_factory=time.time)
+
+    @property
+    def age(self) -> float:
+        """Возраст данных в секундах"""
+        return time.time() - self.fetched_at
+
+    @classmethod
+    def from_values(cls, name: str, values: list[list[str]]) -> "SheetRows":
+        if not values:
+            logger.warning("Google Sheets вернул пустые данные для листа %s", name)
+            return cls(name=name)
+
+        headers = tuple(values[0])
+        return cls(
+            name=name,
+            headers=headers,
+            rows=tuple(dict(zip(headers, row)) for row in values[1:]),
+        )
+
+    def diff(self, previous: "SheetRows", key: str = "Name") -> RowChanges:
+        """Построчная разница с предыдущей версией листа (строки по колонке key)"""
+        return RowChanges.between(
+            {row.get(key, i): row for i, row in enumerate(previous.rows)},
+            {row.get(key, i): row for i, row in enumerate(self.rows)},
+        )
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class CircuitOpenError(Exception):
+    """Предохранитель разомкнут: запрос к сервису не отправлялся."""
+
+
+class BreakerState(IntEnum):
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+@dataclass
+class BreakerStats:
+    """state — текущее состояние (0 замкнут, 1 пробный запрос, 2 разомкнут)."""
+
+    state: int = BreakerState.CLOSED
+    opened: int = 0
+    rejected: int = 0
+
+
+class CircuitBreaker:
+    """Предохранитель: после failure_threshold ошибок подряд запросы
+    не отправляются reset_timeout секунд, затем пропускается один пробный.
+    Удачный пробный запрос замыкает цепь, неудачный — размыкает снова.
+    Пробный запрос, отменённый без результата (release) или не вернувшийся
+    за trial_timeout секунд, уступает место следующему."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        trial_timeout: float | None = None,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = reset_timeout if trial_timeout is None else trial_timeout
+        self.stats = BreakerStats()
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._trial_at = 0.0
+
+    @property
+    def state(self) -> BreakerState:
+        return BreakerState(self.stats.state)
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос сейчас"""
+        now = self._clock()
+        if self.state == BreakerState.OPEN:
+            if now - self._opened_at >= self.reset_timeout:
+                self.stats.state = BreakerState.HALF_OPEN
+                self._trial = False
+        if self.state == BreakerState.HALF_OPEN and (
+            not self._trial or now - self._trial_at >= self.trial_timeout
+        ):
+            self._trial = True
+            self._trial_at = now
+            return True
+        if self.state == BreakerState.CLOSED:
+            return True
+        self.stats.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != BreakerState.CLOSED:
+            logger.info("Предохранитель LLM замкнут: сервис снова отвечает")
+        self._failures = 0
+        self._trial = False
+        self.stats.state = BreakerState.CLOSED
+
+    def release(self) -> None:
+        """Запрос отменён, не дав результата: состояние не меняется,
+        но пробный слот освобождается"""
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == BreakerState.HALF_OPEN or (
+            self.state == BreakerState.CLOSED
+            and self._failures >= self.failure_threshold
+        ):
+            logger.warning(
+                "Предохранитель LLM разомкнут на %.0f с после %d ошибок подряд",
+                self.reset_timeout,
+                self._failures,
+            )
+            self.stats.state = BreakerState.OPEN
+            self.stats.opened += 1
+            self._opened_at = self._clock()
+            self._trial = False
+
+
+class LatencyWindow:
+    """Длительности последних запросов для выбора задержки хеджирования."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        """q-й перцентиль (0..100); None — пока мало замеров"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+@dataclass
+class HedgeStats:
+    """Сколько запросов продублировано и как часто дубль отвечал первым."""
+
+    requests: int = 0
+    hedged: int = 0
+    wins: int = 0
+    win_rate: float = 0.0
+
+    def record(self, hedged: bool, won: bool) -> None:
+        self.requests += 1
+        self.hedged += hedged
+        self.wins += won
+        self.win_rate = self.wins / self.hedged if self.hedged else 0.0
+
+
+async def _cancel(tasks) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]], delay: float | None, stats: HedgeStats
+) -> T:
+    """Выполняет call; если ответа нет через delay секунд, отправляет
+    такой же запрос ещё раз и возвращает тот ответ, что придёт первым."""
+    primary = asyncio.ensure_future(call())
+    tasks = {primary}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.add(asyncio.ensure_future(call()))
+
+        error: BaseException | None = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    stats.record(len(tasks) > 1, task is not primary)
+                    return task.result()
+                error = task.exception()
+        stats.record(len(tasks) > 1, False)
+        raise error
+    finally:
+        await _cancel([t for t in tasks if not t.done()])
+
+
+async def hedged_stream(
+    factory: Callable[[], AsyncIterator[T]], delay: float | None, stats: HedgeStats
+) -> AsyncIterator[T]:
+    """Потоковый вариант hedged: дублирующий поток запускается, если первый
+    фрагмент не пришёл за delay секунд; дальше читается поток, ответивший
+    первым, а второй закрывается."""
+    streams: dict[asyncio.Future, AsyncIterator[T]] = {}
+
+    def start() -> None:
+        stream = aiter(factory())
+        streams[asyncio.ensure_future(anext(stream, _END))] = stream
+
+    start()
+    primary = next(iter(streams))
+    winner: AsyncIterator[T] | None = None
+    first: object = _END
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(streams.keys(), timeout=delay)
+            if not done:
+                start()
+
+        error: BaseException | None = None
+        pending = set(streams)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    winner, first = streams[task], task.result()
+                    stats.record(len(streams) > 1, task is not primary)
+                    break
+                error = task.exception()
+        if winner is None:
+            stats.record(len(streams) > 1, False)
+            raise error
+    finally:
+        await _cancel([t for t in streams if not t.done()])
+        for stream in streams.values():
+            if stream is not winner and hasattr(stream, "aclose"):
+                await stream.aclose()
+
+    try:
+        if first is _END:
+            return
+        yield first
+        async for chunk in winner:
+            yield chunk
+    finally:
+        if hasattr(winner, "aclose"):
+            await winner.aclose()
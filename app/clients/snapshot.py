@@ -0,0 +1,100 @@
+import dataclasses
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Iterable, Mapping
+
+from app.clients.models import SheetRows
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """Последняя удачная копия листов Google Sheets в локальном SQLite-файле.
+
+    Файл перезаписывается атомарно: снимок пишется во временный файл
+    в том же каталоге и подменяет старый через os.replace, поэтому
+    читатель никогда не увидит наполовину записанные данные.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def save(self, sheets: Mapping[str, SheetRows]) -> None:
+        """Сохраняет листы в снимок, дополняя уже сохранённые.
+        Испорченный снимок не дополняется, а заменяется новым"""
+        try:
+            saved = self.load()
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning("Снимок %s не читается, создаём заново: %s", self.path, e)
+            saved = {}
+        self._write({**saved, **sheets})
+
+    def touch(self, names: Iterable[str], fetched_at: float | None = None) -> None:
+        """Отмечает листы снимка как проверенные: таблица не менялась,
+        поэтому строки остаются прежними, меняется только время загрузки"""
+        saved = self.load()
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        touched = {
+            name: dataclasses.replace(saved[name], fetched_at=fetched_at)
+            for name in names
+            if name in saved
+        }
+        if touched:
+            self._write({**saved, **touched})
+
+    def _write(self, sheets: Mapping[str, SheetRows]) -> None:
+        """Записывает листы во временный файл и подменяет им снимок"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            with sqlite3.connect(tmp_path) as conn:
+                conn.execute(
+                    "CREATE TABLE sheets ("
+                    "name TEXT PRIMARY KEY, headers TEXT, rows TEXT, fetched_at REAL)"
+                )
+                conn.executemany(
+                    "INSERT INTO sheets VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            s.name,
+                            json.dumps(s.headers, ensure_ascii=False),
+                            json.dumps(s.rows, ensure_ascii=False),
+                            s.fetched_at,
+                        )
+                        for s in sheets.values()
+                    ],
+                )
+            conn.close()
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self) -> dict[str, SheetRows]:
+        """Читает все листы из снимка. Если снимка нет — пустой словарь"""
+        if not os.path.exists(self.path):
+            return {}
+
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            records = conn.execute(
+                "SELECT name, headers, rows, fetched_at FROM sheets"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return {
+            name: SheetRows(
+                name=name,
+                headers=tuple(json.loads(headers)),
+                rows=tuple(json.loads(rows)),
+                fetched_at=fetched_at,
+            )
+            for name, headers, rows, fetched_at in records
+        }
@@ -1,3 +1,4 @@
+import functools
 import os
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -14,6 +15,97 @@ class Settings(BaseSettings):
     GOOGLE_SHEETS_SPREADSHEET_ID: str
     DEEPSEEK_API_KEY: str
     DEEPSEEK_BASE_URL: str = "https://api.deepseek.com"
+    DEEPSEEK_MODEL: str = "deepseek-chat"
+    DEEPSEEK_MAX_CONCURRENCY: int = 16
+    DEEPSEEK_MAX_CONNECTIONS: int = 32
+    DEEPSEEK_TIMEOUT: float = 30.0
+    # срок ответа на сообщение; не успели — ответ только из данных справочника
+    REPLY_DEADLINE: float = 20.0
+    # перцентиль задержки, после которого LLM-запрос дублируется; 0 — не дублировать
+    LLM_HEDGE_PERCENTILE: float = 0.0
+    # ошибок подряд до размыкания предохранителя и пауза до пробного запроса
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_RESET: float = 30.0
+
+    SHEETS_MAX_WORKERS: int = 4
+    SHEETS_CACHE_TTL: float = 60.0
+    SHEETS_CACHE_STALE_TTL: float = 600.0
+    SHEETS_SNAPSHOT_PATH: str = "data/catalog_snapshot.sqlite3"
+    # адрес API вместо sheets.googleapis.com (локальный стенд, без авторизации)
+    SHEETS_API_ENDPOINT: str | None = None
+    # перед загрузкой листов сверять версию файла через Drive API
+    SHEETS_CHANGE_PROBE: bool = True
+
+    ENTITY_MATCH_THRESHOLD: float = 0.5
+    ANSWER_CACHE_SIZE: int = 1024
+    ANSWER_CACHE_TTL: float = 3600.0
+    # готовые ответы LLM на вопросы «тренировки клуба» и «где проходит тренировка»;
+    # None — не использовать. При BOT_WORKERS > 1 набор собирает только первый процесс
+    ANSWER_PACK_PATH: str | None = "data/answer_pack.sqlite3"
+    ANSWER_PACK_BUILD: bool = True
+    ANSWER_PACK_CONCURRENCY: int = 2
+    # порог уверенности для ответа по шаблону без LLM; интенты не из словаря — всегда LLM
+    TEMPLATE_MIN_CONFIDENCE: dict[str, float] = {
+        "LIST_ALL_CLASSES": 1.0,
+        "CLASSES_BY_CLUB": 0.9,
+        "CLUBS_BY_CLASS": 0.9,
+    }
+
+    PROMPT_TOKEN_BUDGET: int = 1200
+    PROMPT_HISTORY_FULL_MESSAGES: int = 2
+    PROMPT_HISTORY_TRIM_CHARS: int = 160
+
+    SESSION_BACKEND: str = "memory"  # memory | sqlite
+    SESSION_MAX_USERS: int = 10000
+    SESSION_TTL: float = 7 * 24 * 3600
+    SESSION_DB_PATH: str = "data/sessions.sqlite3"
+
+    STREAM_RESPONSES: bool = True
+    STREAM_EDIT_INTERVAL: float = 1.5
+    # окно (сек), в котором сообщения пользователя склеиваются в один запрос
+    COALESCE_WINDOW: float = 0.8
+
+    # исходящие запросы к Bot API: лимиты бота (на все процессы) и одного чата
+    OUTBOX_WORKERS: int = 8
+    OUTBOX_GLOBAL_RATE: float = 25.0
+    OUTBOX_CHAT_RATE: float = 1.0
+    OUTBOX_CHAT_BURST: float = 3.0
+    OUTBOX_MAX_RETRIES: int = 3
+    # глубина очереди, после которой промежуточные правки отбрасываются
+    OUTBOX_MAX_PENDING: int = 500
+
+    # способ получения обновлений: polling | webhook
+    RUN_MODE: str = "polling"
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_PATH: str = "/telegram/webhook"
+    # публичный адрес; если задан, вебхук регистрируется в Telegram при старте
+    WEBHOOK_URL: str | None = None
+    WEBHOOK_SECRET: str | None = None
+    WEBHOOK_WORKERS: int = 32
+    WEBHOOK_QUEUE_SIZE: int = 256
+    # число рабочих процессов; больше 1 — обновления шардируются по user_id
+    BOT_WORKERS: int = 1
+    # сколько обновлений ждёт в очереди одного процесса; сверх — ответ «занято»
+    BOT_WORKER_QUEUE_SIZE: int = 256
+    # сколько обновлений один процесс обрабатывает одновременно
+    BOT_WORKER_CONCURRENCY: int = 32
+    # сколько секунд на остановке ждать все рабочие процессы, затем terminate()
+    BOT_WORKER_SHUTDOWN_TIMEOUT: float = 30.0
+
+    # адрес /metrics; 0 — не поднимать. Рабочие процессы слушают METRICS_PORT + 1 + i
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9102
+    # добавлять в логи trace_id запроса
+    LOG_TRACE_IDS: bool = False
+    LOG_FORMAT: str = "text"  # text | json (с полями запроса и этапами)
+    # запись логов в stderr из отдельного потока, а не из цикла событий
+    LOG_QUEUE: bool = True
+    # доля запросов, чьи записи INFO и DEBUG попадают в лог
+    LOG_SAMPLE_RATE: float = 1.0
+    # одинаковые предупреждения и ошибки — не чаще раза за столько секунд; 0 — все
+    LOG_REPEAT_INTERVAL: float = 60.0
+
     USE_MOCK_LLM: bool = os.getenv("USE_MOCK_LLM", "True").lower() in (
         "1",
         "true",
@@ -26,4 +118,23 @@ class Settings(BaseSettings):
     )
 
 
-settings = Settings()
+@functools.cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class _LazySettings:
+    """Доступ к настройкам, которые читаются и проверяются при первом
+    обращении, а не при импорте модуля."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(get_settings(), name)
+
+
+settings = _LazySettings()
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable
+
+from aiogram import Bot
+
+import app
+from app.bot import create_bot
+from app.bot.outbox import get_outbox
+from app.clients.deepseek import get_deepseek_client
+from app.config import get_settings, settings
+from app.services import get_llm_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StartupReport:
+    """Время запуска, в секундах: импорт модулей, весь запуск и этапы прогрева."""
+
+    import_time: float = 0.0
+    startup_time: float = 0.0
+    warmup: dict[str, float] = field(default_factory=dict)
+
+
+class Lifecycle:
+    """Запуск и остановка приложения.
+
+    При импорте ничего не создаётся и не читается из сети: настройки,
+    клиенты и сервис собираются в start(), после чего справочник
+    и соединение с LLM прогреваются параллельно, до приёма обновлений.
+    """
+
+    def __init__(self) -> None:
+        self.report = StartupReport(
+            import_time=time.perf_counter() - app.IMPORT_STARTED
+        )
+        self.bot: Bot | None = None
+
+    async def start(self, warmup: bool = True) -> Bot:
+        started = time.perf_counter()
+        get_settings()
+        self.bot = create_bot()
+
+        if warmup:
+            tasks = {"catalog": get_llm_service().warmup()}
+            if not settings.USE_MOCK_LLM:
+                tasks["llm"] = get_deepseek_client().warmup()
+            await asyncio.gather(
+                *(self._timed(name, task) for name, task in tasks.items())
+            )
+
+        self.report.startup_time = time.perf_counter() - started
+        logger.info(
+            "Импорт модулей %.0f мс, запуск %.0f мс (прогрев: %s)",
+            self.report.import_time * 1000,
+            self.report.startup_time * 1000,
+            ", ".join(
+                f"{name} {seconds * 1000:.0f} мс"
+                for name, seconds in self.report.warmup.items()
+            )
+            or "нет",
+        )
+        return self.bot
+
+    async def _timed(self, name: str, task: Awaitable[object]) -> None:
+        started = time.perf_counter()
+        try:
+            await task
+        except Exception as e:
+            # без прогрева бот работает, просто первый запрос будет медленнее
+            logger.warning("Прогрев %s не удался: %s", name, e)
+        self.report.warmup[name] = time.perf_counter() - started
+
+    async def stop(self) -> None:
+        if get_outbox.cache_info().currsize:
+            await get_outbox().close()
+        if self.bot is not None:
+            await self.bot.session.close()
+        if get_deepseek_client.cache_info().currsize:
+            await get_deepseek_client().aclose()
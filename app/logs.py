@@ -0,0 +1,172 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable
+
+from app.config import settings
+from app.metrics import LOG_DROPPED, TraceIdFilter, trace_id_var
+
+# поток записи логов текущего процесса
+_listener: QueueListener | None = None
+
+
+class SamplingFilter(logging.Filter):
+    """Оставляет записи INFO и DEBUG только у доли rate запросов.
+
+    Решение принимается по trace_id, поэтому выбранный запрос попадает
+    в лог целиком. Предупреждения, ошибки и записи вне запросов
+    (запуск, обновление справочника) не отбрасываются.
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.threshold = int(rate * 16**8)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = trace_id_var.get()
+        if record.levelno >= logging.WARNING or trace_id == "-":
+            return True
+        if int(trace_id[:8], 16) < self.threshold:
+            return True
+        LOG_DROPPED.inc(reason="sampled")
+        return False
+
+
+class RepeatFilter(logging.Filter):
+    """Одинаковые предупреждения и ошибки (логгер, шаблон сообщения,
+    тип исключения) пишутся не чаще раза в interval секунд; следующая
+    записанная сообщает, сколько повторов пропущено."""
+
+    # сколько разных сообщений помнить, прежде чем забывать давние
+    PRUNE_AT = 1024
+
+    def __init__(
+        self, interval: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        super().__init__()
+        self.interval = interval
+        self._clock = clock
+        # ключ -> (когда записано, сколько пропущено с тех пор)
+        self._seen: dict[tuple, tuple[float, int]] = {}
+        # записи приходят и из потоков пула (клиент Google Sheets)
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        exc_type = record.exc_info[0] if record.exc_info else None
+        key = (record.name, str(record.msg), exc_type)
+        now = self._clock()
+        with self._lock:
+            written_at, skipped = self._seen.get(key, (None, 0))
+            if written_at is not None and now - written_at < self.interval:
+                self._seen[key] = (written_at, skipped + 1)
+                LOG_DROPPED.inc(reason="repeated")
+                return False
+            if len(self._seen) >= self.PRUNE_AT:
+                self._seen = {
+                    k: v for k, v in self._seen.items() if now - v[0] < self.interval
+                }
+            self._seen[key] = (now, 0)
+        if skipped:
+            record.msg = f"{record.msg} (повторов пропущено: {skipped})"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога — одна строка JSON: время, уровень, логгер, сообщение,
+    trace_id и поля запроса (user_id, intent, entity, stages в мс)."""
+
+    def __init__(self, process: str | None = None) -> None:
+        super().__init__()
+        self.process = process
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if self.process:
+            data["process"] = self.process
+        trace_id = getattr(record, "trace_id", "-")
+        if trace_id != "-":
+            data["trace_id"] = trace_id
+        data.update(getattr(record, "trace_fields", {}))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class PreparedQueueHandler(QueueHandler):
+    """Кладёт запись в очередь потока записи. Аргументы сообщения
+    и traceback подставляются сразу, пока объекты ещё актуальны,
+    а форматирование строки и вывод остаются потоку."""
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(process: str | None = None) -> None:
+    """Настраивает корневой логгер. process — имя рабочего процесса в строке лога;
+    при LOG_TRACE_IDS в каждую запись добавляется trace_id запроса.
+
+    При LOG_QUEUE записи уходят в очередь, а в stderr их пишет отдельный
+    поток, так что обработчики запросов не ждут ввода-вывода."""
+    global _listener
+
+    root = logging.getLogger()
+    if root.handlers:
+        # уже настроен
+        return
+
+    output = logging.StreamHandler()
+    if settings.LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter(process))
+    else:
+        parts = ["%(asctime)s", "%(levelname)s"]
+        if process:
+            parts.append(process)
+        if settings.LOG_TRACE_IDS:
+            parts.append("%(trace_id)s")
+        parts += ["%(name)s", "%(message)s"]
+        output.setFormatter(logging.Formatter(" | ".join(parts)))
+
+    handler: logging.Handler = output
+    if settings.LOG_QUEUE:
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        handler = PreparedQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, output)
+        _listener.start()
+        # дописывает очередь при выходе из процесса
+        atexit.register(_listener.stop)
+
+    # фильтры работают в вызывающем потоке: контекст запроса виден только там
+    if settings.LOG_SAMPLE_RATE < 1:
+        handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+    if settings.LOG_REPEAT_INTERVAL > 0:
+        handler.addFilter(RepeatFilter(settings.LOG_REPEAT_INTERVAL))
+    if settings.LOG_TRACE_IDS or settings.LOG_FORMAT == "json":
+        handler.addFilter(TraceIdFilter())
+
+    root.setLevel(logging.INFO)
+    root.addHandler(handler)
@@ -1,19 +1,35 @@
 import asyncio
-import logging
 
-from app.bot import bot, dp
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-)
+from app.bot import dp
+from app.bot.sharding import run_sharded
+from app.bot.webhook import run_webhook
+from app.config import settings
+from app.lifecycle import Lifecycle
+from app.logs import configure_logging
+from app.metrics import start_metrics_server
 
 
 async def main() -> None:
     """Точка входа приложения.
-    Запускает long polling Telegram-бота и начинает
-    обработку входящих обновлений."""
-    await dp.start_polling(bot)
+    Запускает long polling или вебхук Telegram-бота (RUN_MODE)
+    и начинает обработку входящих обновлений — в этом процессе
+    или в BOT_WORKERS рабочих процессах."""
+    lifecycle = Lifecycle()
+    configure_logging()
+    if settings.METRICS_PORT:
+        await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    # приёмнику с рабочими процессами справочник и LLM не нужны
+    bot = await lifecycle.start(warmup=settings.BOT_WORKERS <= 1)
+    try:
+        if settings.BOT_WORKERS > 1:
+            await run_sharded(bot, dp)
+        elif settings.RUN_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await lifecycle.stop()
 
 
 if __name__ == "__main__":
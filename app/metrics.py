@@ -0,0 +1,294 @@
+import bisect
+import contextvars
+import dataclasses
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# границы корзин гистограмм длительностей, в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = labels
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, LabelValues, tuple[str, ...], float]]:
+        """Строки метрики: суффикс имени, значения меток, доп. метки, значение"""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra_names, value in self.samples():
+            names = self.label_names + extra_names
+            lines.append(f"{self.name}{suffix}{_labels(names, values)} {value:g}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield "", key, (), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        """Увеличивает значение на время выполнения блока"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # по ключу меток: счётчики корзин (+Inf последней), сумма
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts, total = self._values.setdefault(
+            key, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield "_bucket", (*key, le), ("le",), cumulative
+            yield "_sum", key, (), total[0]
+            yield "_count", key, (), cumulative
+
+
+class StatsCollector(_Metric):
+    """Экспортирует числовые поля dataclass-счётчиков (CacheStats,
+    CompletionStats и т. п.) как метрики `<name>_<поле>`."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, stats: Callable[[], object]) -> None:
+        super().__init__(name, help)
+        self.stats = stats
+
+    def samples(self):
+        stats = self.stats()
+        if stats is None:
+            return
+        for f in dataclasses.fields(stats):
+            value = getattr(stats, f.name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f"_{f.name}", (), (), value
+
+    def render(self) -> list[str]:
+        # у каждого поля своя метрика со своими HELP и TYPE
+        lines = []
+        for suffix, _, _, value in self.samples():
+            metric = f"{self.name}{suffix}"
+            lines += [
+                f"# HELP {metric} {self.help}: {suffix[1:]}",
+                f"# TYPE {metric} gauge",
+                f"{metric} {value:g}",
+            ]
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS: Histogram = registry.register(
+    Histogram(
+        "chekhov_stage_seconds", "Длительность этапов обработки запроса", ("stage",)
+    )
+)
+INTENTS: Counter = registry.register(
+    Counter("chekhov_intents_total", "Распознанные интенты", ("intent",))
+)
+ANSWERS: Counter = registry.register(
+    Counter("chekhov_answers_total", "Ответы по источнику", ("source",))
+)
+ERRORS: Counter = registry.register(
+    Counter("chekhov_errors_total", "Ошибки по компонентам", ("component",))
+)
+OUTBOX_SECONDS: Histogram = registry.register(
+    Histogram(
+        "chekhov_outbox_send_seconds",
+        "Время от постановки в очередь до отправки в Telegram",
+        ("priority",),
+    )
+)
+IN_FLIGHT: Gauge = registry.register(
+    Gauge("chekhov_requests_in_flight", "Запросы в обработке", ("stage",))
+)
+LOG_DROPPED: Counter = registry.register(
+    Counter(
+        "chekhov_log_records_dropped_total",
+        "Записи лога, отброшенные выборкой или ограничением повторов",
+        ("reason",),
+    )
+)
+
+
+# ------------------- Трассировка -------------------
+trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "trace_id", default="-"
+)
+
+
+# поля запроса для структурированных логов: user_id, intent, entity
+# и длительности этапов stages (мс); None — вне обработки запроса
+trace_fields_var: contextvars.ContextVar[dict[str, Any] | None] = (
+    contextvars.ContextVar("trace_fields", default=None)
+)
+
+
+def new_trace_id(**fields: Any) -> str:
+    """Назначает текущему контексту (задаче) новый идентификатор запроса
+    и начинает набор его полей"""
+    trace_id = uuid.uuid4().hex[:12]
+    trace_id_var.set(trace_id)
+    trace_fields_var.set({**fields, "stages": {}})
+    return trace_id
+
+
+def trace_fields(**fields: Any) -> None:
+    """Дополняет поля текущего запроса (вне запроса ничего не делает)"""
+    current = trace_fields_var.get()
+    if current is not None:
+        current.update(fields)
+
+
+class TraceIdFilter(logging.Filter):
+    """Добавляет в записи лога поле trace_id текущего запроса
+    и снимок его полей trace_fields."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        current = trace_fields_var.get()
+        # копия: запись может форматироваться в другом потоке,
+        # пока запрос продолжает дописывать этапы
+        record.trace_fields = (
+            {**current, "stages": dict(current["stages"])} if current else {}
+        )
+        return True
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Замеряет этап обработки: гистограмма chekhov_stage_seconds
+    и запись уровня DEBUG с trace_id; длительность попадает в поля запроса."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        current = trace_fields_var.get()
+        if current is not None:
+            stages = current["stages"]
+            stages[stage] = round(stages.get(stage, 0.0) + elapsed * 1000, 1)
+        logger.debug("Этап %s: %.1f мс", stage, elapsed * 1000)
+
+
+# ------------------- HTTP-эндпоинт -------------------
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        text=registry.render(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Поднимает отдельный HTTP-сервер с /metrics"""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Метрики доступны на http://%s:%d/metrics", host, port)
+    return runner
@@ -1,6 +1,14 @@
+import functools
+
 from app.config import settings
+from app.services.answer_service import LLMService
+from app.services.answer_service_mock import LLMServiceMock
+
 
-if settings.USE_MOCK_LLM:
-    from app.services.answer_service_mock import LLMServiceMock as LLMService
-else:
-    from app.services.answer_service import LLMService
+@functools.cache
+def get_llm_service() -> LLMService | LLMServiceMock:
+    """LLM-сервис процесса: мок или реальный, согласно USE_MOCK_LLM.
+    Создаётся при первом обращении вместе с клиентами и хранилищем сессий."""
+    if settings.USE_MOCK_LLM:
+        return LLMServiceMock()
+    return LLMService()
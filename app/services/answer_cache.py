@@ -0,0 +1,100 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable
+
+from app.services.intent_detector import TrainingIntent, normalize_text
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+@dataclass
+class AnswerCacheStats:
+    """Счётчики кэша ответов. saved_latency — сэкономленное время LLM, в секундах."""
+
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    evictions: int = 0
+    saved_latency: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class _CachedAnswer:
+    answer: str
+    latency: float
+    stored_at: float
+
+
+class AnswerCache:
+    """LRU-кэш ответов LLM с ограничением по времени жизни.
+
+    Ключ включает интент, сущность, отпечаток блока фактов и нормализованный
+    запрос: если данные в таблице изменились, меняется и ключ, поэтому
+    устаревший ответ не будет выдан.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = AnswerCacheStats()
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, _CachedAnswer] = OrderedDict()
+
+    @staticmethod
+    def make_key(
+        intent: TrainingIntent,
+        entity: str | None,
+        facts_block: str,
+        query: str,
+    ) -> tuple:
+        facts_hash = hashlib.blake2b(facts_block.encode(), digest_size=16).digest()
+        normalized_query = " ".join(
+            _PUNCTUATION.sub(" ", normalize_text(query)).split()
+        )
+        return intent, entity, facts_hash, normalized_query
+
+    def get(self, key: Hashable) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None or self._clock() - entry.stored_at >= self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        self.stats.saved_latency += entry.latency
+        return entry.answer
+
+    def put(self, key: Hashable, answer: str, latency: float) -> None:
+        self._entries[key] = _CachedAnswer(answer, latency, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def discard(self, predicate: Callable[[tuple], bool]) -> int:
+        """Удаляет ответы, ключи которых подходят под predicate; возвращает их число"""
+        stale = [key for key in self._entries if predicate(key)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
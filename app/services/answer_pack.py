@@ -0,0 +1,169 @@
+import asyncio
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from app.clients.catalog import Catalog
+from app.services.answer_templates import AnswerFacts
+from app.services.intent_detector import TrainingIntent
+
+logger = logging.getLogger(__name__)
+
+# (интент, сущность) -> (отпечаток фактов, ответ)
+PackEntries = dict[tuple[str, str], tuple[str, str]]
+
+
+def facts_digest(facts: AnswerFacts) -> str:
+    """Отпечаток фактов ответа; уверенность распознавания в него не входит"""
+    data = repr(dataclasses.replace(facts, confidence=1.0))
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def pack_version(
+    catalog: Catalog, model: str, templates: dict[str, float] | None = None
+) -> str:
+    """Версия набора: строки листов справочника, модель, которая писала ответы,
+    и пороги шаблонов — от них зависит, какие вопросы попали в набор"""
+    source = {name: rows.rows for name, rows in sorted(catalog.source.items())}
+    data = json.dumps(
+        [model, source, templates or {}], ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def pack_questions(catalog: Catalog) -> list[tuple[TrainingIntent, str, str]]:
+    """Типовые вопросы: тренировки каждого клуба и клубы каждой тренировки"""
+    return [
+        (TrainingIntent.CLASSES_BY_CLUB, club, f"Какие тренировки есть в клубе {club}?")
+        for club in catalog.club_names
+    ] + [
+        (TrainingIntent.CLUBS_BY_CLASS, name, f"Где проходит тренировка «{name}»?")
+        for name in catalog.class_names
+    ]
+
+
+@dataclass
+class AnswerPackStats:
+    hits: int = 0
+    misses: int = 0
+    entries: int = 0
+    builds: int = 0
+    build_errors: int = 0
+
+
+class AnswerPack:
+    """Заранее сгенерированные ответы на типовые вопросы в SQLite-файле.
+
+    Файл версионируется по содержимому справочника и перезаписывается
+    атомарно, как снимок справочника. Ответ отдаётся, только если факты
+    запроса совпадают с теми, по которым он написан. Файл, обновлённый
+    другим процессом, перечитывается в refresh() в пуле потоков не чаще
+    раза в reload_interval секунд.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        reload_interval: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.path = path
+        self.reload_interval = reload_interval
+        self.version: str | None = None
+        self.stats = AnswerPackStats()
+        self._clock = clock
+        self._entries: PackEntries = {}
+        self._mtime: float | None = None
+        self._checked_at: float | None = None
+
+    def get(self, facts: AnswerFacts) -> str | None:
+        entry = self._entries.get((facts.intent.value, facts.entity or ""))
+        if entry is None or entry[0] != facts_digest(facts):
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return entry[1]
+
+    async def refresh(self) -> None:
+        """Перечитывает файл, если его обновил другой процесс; stat и чтение
+        SQLite идут в потоке, чтобы не задерживать цикл событий"""
+        now = self._clock()
+        if (
+            self._checked_at is not None
+            and now - self._checked_at < self.reload_interval
+        ):
+            return
+        self._checked_at = now
+        await asyncio.to_thread(self._reload_if_changed)
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            try:
+                self.load()
+            except Exception:
+                logger.exception("Не удалось прочитать набор ответов %s", self.path)
+
+    def load(self) -> None:
+        """Читает набор с диска; если файла нет — набор пуст"""
+        if not os.path.exists(self.path):
+            return
+        mtime = os.stat(self.path).st_mtime
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            version = conn.execute("SELECT version FROM meta").fetchone()[0]
+            records = conn.execute(
+                "SELECT intent, entity, facts_digest, answer FROM answers"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        self.version = version
+        self._entries = {(i, e): (d, a) for i, e, d, a in records}
+        self._mtime = mtime
+        self.stats.entries = len(self._entries)
+        logger.info(
+            "Загружен набор ответов: %d, версия %s", len(self._entries), version
+        )
+
+    def save(self, version: str, entries: PackEntries) -> None:
+        """Записывает новую версию набора и сразу начинает отдавать её"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            with sqlite3.connect(tmp_path) as conn:
+                conn.execute("CREATE TABLE meta (version TEXT)")
+                conn.execute("INSERT INTO meta VALUES (?)", (version,))
+                conn.execute(
+                    "CREATE TABLE answers (intent TEXT, entity TEXT, "
+                    "facts_digest TEXT, answer TEXT, PRIMARY KEY (intent, entity))"
+                )
+                conn.executemany(
+                    "INSERT INTO answers VALUES (?, ?, ?, ?)",
+                    [(i, e, d, a) for (i, e), (d, a) in entries.items()],
+                )
+            conn.close()
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+        self.version = version
+        self._entries = dict(entries)
+        self._mtime = os.stat(self.path).st_mtime
+        self.stats.entries = len(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
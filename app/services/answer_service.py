@@ -1,20 +1,63 @@
+import asyncio
 import logging
+import time
+from dataclasses import dataclass
 from enum import Enum
-from typing import List
-
-from openai import OpenAI
-
-from app.clients.google_sheets import sheets_client
-from app.clients.group_classes import group_classes_client
+from typing import AsyncIterator
+
+from app.clients.catalog import Catalog
+from app.clients.deepseek import get_deepseek_client
+from app.clients.google_sheets import get_sheets_client
+from app.clients.resilience import (
+    CircuitBreaker,
+    HedgeStats,
+    LatencyWindow,
+    hedged,
+    hedged_stream,
+)
 from app.config import settings
+from app.metrics import (
+    ANSWERS,
+    ERRORS,
+    IN_FLIGHT,
+    INTENTS,
+    STAGE_SECONDS,
+    StatsCollector,
+    registry,
+    span,
+    trace_fields,
+)
+from app.services.answer_cache import AnswerCache
+from app.services.answer_pack import (
+    AnswerPack,
+    PackEntries,
+    facts_digest,
+    pack_questions,
+    pack_version,
+)
+from app.services.answer_templates import (
+    AnswerFacts,
+    TemplateRenderer,
+    collect_facts,
+    format_fallback,
+)
+from app.services.entity_index import get_entity_index
 from app.services.intent_detector import (
     TrainingIntent,
-    TrainingIntentDetector,
     TrainingIntentResult,
+    get_intent_detector,
 )
+from app.services.prompt_builder import FactGroup, PromptBuilder
+from app.services.session_store import create_session_store
 
 logger = logging.getLogger(__name__)
 
+ERROR_ANSWER = "Извините, произошла ошибка. Попробуйте позже."
+
+# какая доля REPLY_DEADLINE должна достаться LLM, чтобы истёкший срок
+# считался её сбоем
+LLM_MIN_BUDGET_SHARE = 0.5
+
 
 # ------------------- Состояния диалога -------------------
 class DialogState(str, Enum):
@@ -28,6 +71,18 @@ class DialogState(str, Enum):
     CLOSING = "CLOSING"
 
 
+@dataclass
+class PreparedRequest:
+    """Подготовленный запрос к LLM и то, из чего он собран."""
+
+    query: str
+    facts: AnswerFacts
+    facts_block: str
+    messages: list[dict]
+    # ключ кэша ответов; None — уточнение, зависящее от истории, не кэшируется
+    cache_key: tuple | None = None
+
+
 # ------------------- Сервис LLM -------------------
 class LLMService:
     """
@@ -37,179 +92,580 @@ class LLMService:
     """
 
     def __init__(self) -> None:
-        self.client = OpenAI(
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL,
+        self.client = get_deepseek_client()
+        self.sessions = create_session_store()
+        self.answer_cache = AnswerCache(
+            max_size=settings.ANSWER_CACHE_SIZE, ttl=settings.ANSWER_CACHE_TTL
         )
-        self.user_states = {}
-
-    # ------------------- История -------------------
-    def add_to_history(self, user_id: int, role: str, content: str) -> None:
-        """
-        Добавляет сообщение в историю диалога пользователя.
-        Ограничивает историю последними 6 сообщениями."""
-
-        history: List[dict] = self.user_states.setdefault(user_id, {}).setdefault(
-            "history", []
+        self.templates = TemplateRenderer(settings.TEMPLATE_MIN_CONFIDENCE)
+        self.prompt_builder = PromptBuilder(
+            budget=settings.PROMPT_TOKEN_BUDGET,
+            history_full_messages=settings.PROMPT_HISTORY_FULL_MESSAGES,
+            history_trim_chars=settings.PROMPT_HISTORY_TRIM_CHARS,
         )
-        history.append({"role": role, "content": content})
-        if len(history) > 6:
-            history.pop(0)
-
-    # ------------------- Генерация ответа -------------------
-    async def generate_response(self, user_id: int, user_text: str) -> str:
-        """Генерирует ответ пользователю на основе LLM с учетом состояния диалога,
-        интента и фактов о клубах и тренировках."""
+        self._catalog: Catalog | None = None
 
-        state_data = self.user_states.setdefault(
-            user_id,
-            {
-                "state": DialogState.NEED_CLUB,
-                "club": None,
-                "time_preference": None,
-                "greeted": False,
-                "history": [],
-            },
+        # защита от деградации LLM: предохранитель и дублирование медленных
+        # запросов; задержки полного ответа и первого токена учитываются отдельно
+        self.breaker = CircuitBreaker(
+            settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET
+        )
+        self.hedge_stats = HedgeStats()
+        self.latencies = LatencyWindow()
+        self.first_token_latencies = LatencyWindow()
+
+        # готовые ответы на типовые вопросы; пересобираются в фоне после
+        # обновления справочника, если сервис прогрет (см. warmup)
+        self.answer_pack = (
+            AnswerPack(settings.ANSWER_PACK_PATH) if settings.ANSWER_PACK_PATH else None
+        )
+        self._pack_builds = False
+        self._pack_task: asyncio.Task | None = None
+
+        registry.register(
+            StatsCollector(
+                "chekhov_answer_cache",
+                "Кэш ответов LLM",
+                lambda: self.answer_cache.stats,
+            )
+        )
+        registry.register(
+            StatsCollector(
+                "chekhov_templates", "Ответы по шаблону", lambda: self.templates.stats
+            )
+        )
+        registry.register(
+            StatsCollector(
+                "chekhov_sessions", "Хранилище сессий", lambda: self.sessions.stats
+            )
+        )
+        if self.answer_pack is not None:
+            registry.register(
+                StatsCollector(
+                    "chekhov_answer_pack",
+                    "Набор готовых ответов",
+                    lambda: self.answer_pack.stats,
+                )
+            )
+        registry.register(
+            StatsCollector(
+                "chekhov_llm_breaker", "Предохранитель LLM", lambda: self.breaker.stats
+            )
+        )
+        registry.register(
+            StatsCollector(
+                "chekhov_llm_hedge",
+                "Дублирование запросов к LLM",
+                lambda: self.hedge_stats,
+            )
         )
 
-        # сохраняем сообщение пользователя
-        self.add_to_history(user_id, "user", user_text)
-
-        # получаем справочники
-        departments = await sheets_client.get_all_departments()
-        # очищаем данные (убираем кавычки, лишние пробелы и переносы строк)
-        for d in departments:
-            for key in ["Name", "address", "phone"]:
-                if d.get(key):
-                    d[key] = d[key].replace('"', "").replace("\n", " ").strip()
-
-        club_names = [d.get("Name") for d in departments if d.get("Name")]
-
-        # Получаем все тренировки из group_classes
-        all_classes_data = await group_classes_client.get_all()
-        class_names = [row["Name"].strip() for row in all_classes_data]
-
-        # детектим интент
-        detector = TrainingIntentDetector(club_names, class_names)
+    # ------------------- История -------------------
+    async def _remember(self, user_id: int, user_text: str, answer: str) -> None:
+        """Записывает в историю вопрос вместе с ответом.
+        Прерванная генерация историю не меняет."""
+        session = await self.sessions.get(user_id)
+        session.add_message("user", user_text)
+        session.add_message("assistant", answer)
+        await self.sessions.save(session)
+
+    def _invalidate_answers_on_change(self, catalog: Catalog) -> None:
+        """Удаляет из кэша ответы о клубах и занятиях, которые изменились"""
+        previous = self._catalog
+        if catalog is previous:
+            return
+        if previous is not None:
+            changes = catalog.diff(previous)
+            if changes:
+                # ключ кэша: (интент, сущность, отпечаток фактов, запрос)
+                dropped = self.answer_cache.discard(lambda key: changes.affects(key[1]))
+                logger.info(
+                    "Справочник изменился, из кэша удалено ответов: %d", dropped
+                )
+        self._catalog = catalog
+
+    # ------------------- Справочник -------------------
+    async def _load_catalog(self, deadline: float | None = None) -> Catalog:
+        """Текущий справочник; общий объект, пересобирается при обновлении листов.
+        Если листы не загрузились к deadline, берётся последний загруженный
+        справочник (в том числе из снимка)."""
+        sheets = get_sheets_client()
+        try:
+            async with asyncio.timeout_at(deadline):
+                catalog = await sheets.get_catalog()
+        except TimeoutError:
+            ERRORS.inc(component="deadline")
+            logger.warning("Справочник не загружен к сроку ответа, берём последний")
+            catalog = sheets.cached_catalog()
+        if catalog is not self._catalog and self._pack_builds:
+            self._schedule_answer_pack(catalog)
+        self._invalidate_answers_on_change(catalog)
+        return catalog
+
+    async def warmup(self) -> None:
+        """Загружает справочник и собирает индексы до первого запроса.
+        Включает фоновую сборку набора готовых ответов."""
+        self._pack_builds = settings.ANSWER_PACK_BUILD and self.answer_pack is not None
+        catalog = await self._load_catalog()
+        get_intent_detector(catalog.club_names, catalog.class_names)
+        get_entity_index(catalog.club_names, catalog.class_names)
+
+    # ------------------- Набор готовых ответов -------------------
+    def _schedule_answer_pack(self, catalog: Catalog) -> None:
+        """Запускает сборку набора для новой версии справочника,
+        отменяя сборку для предыдущей. Если на все типовые вопросы отвечают
+        шаблоны, набор не собирается."""
+        if not self._pack_intents():
+            return
+        if self._pack_task is not None:
+            self._pack_task.cancel()
+        self._pack_task = asyncio.create_task(self._build_answer_pack(catalog))
+
+    def _pack_intents(self) -> set[TrainingIntent]:
+        """Интенты типовых вопросов, на которые не отвечает шаблон:
+        только для них готовый ответ экономит запрос к LLM"""
+        return {
+            intent
+            for intent in (
+                TrainingIntent.CLASSES_BY_CLUB,
+                TrainingIntent.CLUBS_BY_CLASS,
+            )
+            if not self.templates.confident(AnswerFacts(intent, confidence=1.0))
+        }
+
+    async def _build_answer_pack(self, catalog: Catalog) -> None:
+        """Генерирует ответы на типовые вопросы (не больше
+        ANSWER_PACK_CONCURRENCY запросов к LLM одновременно) и сохраняет набор.
+        Вопросы, на которые и так отвечает шаблон, пропускаются. Запросы идут
+        через предохранитель LLM; если он разомкнут, набор не сохраняется
+        и собирается заново при следующем обновлении справочника."""
+        pack = self.answer_pack
+        intents = self._pack_intents()
+        if not intents:
+            return
+        version = pack_version(
+            catalog, settings.DEEPSEEK_MODEL, self.templates.min_confidence
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            if pack.version is None:
+                await loop.run_in_executor(None, pack.load)
+            if pack.version == version or not catalog.source:
+                return
+
+            started = time.perf_counter()
+            semaphore = asyncio.Semaphore(settings.ANSWER_PACK_CONCURRENCY)
+            rejected = False
+
+            async def render(
+                intent: TrainingIntent, entity: str, question: str
+            ) -> PackEntries:
+                nonlocal rejected
+                facts = collect_facts(catalog, intent, entity, 1.0)
+                if not (facts.clubs or facts.classes):
+                    return {}
+                prepared = self._compose(
+                    catalog,
+                    facts,
+                    question,
+                    DialogState.NEED_CLUB.value,
+                    [("user", question)],
+                )
+                async with semaphore:
+                    if rejected or not self.breaker.allow():
+                        rejected = True
+                        return {}
+                    try:
+                        async with asyncio.timeout(settings.REPLY_DEADLINE):
+                            answer = await self.client.complete(prepared.messages)
+                    except Exception as e:
+                        logger.warning("Готовый ответ для %s не получен: %s", entity, e)
+                        pack.stats.build_errors += 1
+                        self.breaker.record_failure()
+                        return {}
+                    except BaseException:
+                        self.breaker.release()
+                        raise
+                self.breaker.record_success()
+                return {(intent.value, entity): (facts_digest(facts), answer)}
+
+            entries: PackEntries = {}
+            for result in await asyncio.gather(
+                *(
+                    render(intent, entity, question)
+                    for intent, entity, question in pack_questions(catalog)
+                    if intent in intents
+                )
+            ):
+                entries.update(result)
+            if rejected:
+                logger.warning(
+                    "Предохранитель LLM разомкнут, набор готовых ответов не собран"
+                )
+                return
+            await loop.run_in_executor(None, pack.save, version, entries)
+            pack.stats.builds += 1
+            logger.info(
+                "Набор готовых ответов собран: %d ответов за %.1f с",
+                len(entries),
+                time.perf_counter() - started,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Не удалось собрать набор готовых ответов")
+
+    # ------------------- Интент -------------------
+    @staticmethod
+    def _detect(
+        user_text: str, catalog: Catalog
+    ) -> tuple[TrainingIntent, str | None, float]:
+        """Определяет интент и сущность: точное совпадение по справочнику,
+        затем нечёткое сопоставление. Детектор и индекс собираются
+        один раз на версию справочника."""
+        detector = get_intent_detector(catalog.club_names, catalog.class_names)
         result: TrainingIntentResult = detector.detect(user_text)
         intent = result.intent
         entity = result.entity
+        # совпадение с названием из справочника — 1.0, ключевое слово —
+        # по тому, сколько ещё содержательного в запросе
+        confidence = result.confidence
 
         logger.info("Detected intent: %s, entity: %s", intent, entity)
 
-        # поиск клуба по неполному совпадению (fallback)
-        matched_club_info = None
-        if entity and intent in [
-            TrainingIntent.CLASSES_BY_CLUB,
-            TrainingIntent.CLUBS_BY_CLASS,
-        ]:
-            # ищем точное совпадение
-            matched_club_info = next(
-                (d for d in departments if d.get("Name").lower() == entity.lower()),
-                None,
+        # нечёткое сопоставление: опечатки и кириллица/латиница ("Чехов Спорт")
+        if intent in (TrainingIntent.UNKNOWN, TrainingIntent.LIST_ALL_CLASSES):
+            entity_index = get_entity_index(catalog.club_names, catalog.class_names)
+            candidate = entity_index.best(
+                user_text, threshold=settings.ENTITY_MATCH_THRESHOLD
             )
-            # если точного нет, ищем частичное совпадение
-            if not matched_club_info:
-                matched_club_info = next(
-                    (
-                        d
-                        for d in departments
-                        if entity.lower() in d.get("Name", "").lower()
-                    ),
-                    None,
+            if candidate:
+                intent, entity = candidate.intent, candidate.entity
+                confidence = candidate.score
+                logger.info(
+                    "Fuzzy match: %s, entity: %s, score: %.2f",
+                    intent,
+                    entity,
+                    candidate.score,
                 )
-            if matched_club_info:
-                entity = matched_club_info.get("Name")  # обновляем entity на точное имя
-
-        #  формируем факты для LLM
-        facts_block = ""
-
-        if intent == TrainingIntent.CLUBS_BY_CLASS and entity:
-            clubs = await group_classes_client.get_clubs_by_class(entity)
-            clubs_info = []
-            for c in clubs:
-                club_info = next((d for d in departments if d.get("Name") == c), None)
-                if club_info:
-                    address = club_info.get("address", "Нет данных")
-                    phone = club_info.get("phone", "Нет данных")
-                    clubs_info.append(f"{c} (Адрес: {address}, Телефон: {phone})")
-            facts_block = f"Тренировка: {entity}\nПроводится в клубах: {', '.join(clubs_info) if clubs_info else 'Нет данных'}"
-
-        elif intent == TrainingIntent.CLASSES_BY_CLUB and entity:
-            classes = await group_classes_client.get_classes_by_club(entity)
-            address = (
-                matched_club_info.get("address", "Нет данных")
-                if matched_club_info
-                else "Нет данных"
-            )
-            phone = (
-                matched_club_info.get("phone", "Нет данных")
-                if matched_club_info
-                else "Нет данных"
-            )
-            facts_block = (
-                f"Клуб: {entity}\nАдрес: {address}\nТелефон: {phone}\n"
-                f"Доступные тренировки: {', '.join(classes) if classes else 'Нет данных'}"
-            )
 
-        elif intent == TrainingIntent.LIST_ALL_CLASSES:
-            all_classes = [row["Name"] for row in all_classes_data]
-            facts_block = f"Все доступные тренировки: {', '.join(all_classes)}"
+        return intent, entity, confidence
+
+    # ------------------- Подготовка запроса -------------------
+    async def _prepare(
+        self, user_id: int, user_text: str, deadline: float | None = None
+    ) -> PreparedRequest:
+        """Формирует сообщения для LLM с учетом состояния диалога,
+        интента и фактов о клубах и тренировках. Загрузка справочника
+        ограничена сроком ответа deadline (время цикла событий)."""
+
+        session = await self.sessions.get(user_id)
+
+        with span("sheets"):
+            catalog = await self._load_catalog(deadline)
+
+        with span("intent"):
+            intent, entity, confidence = self._detect(user_text, catalog)
+        INTENTS.inc(intent=intent.value)
+        trace_fields(intent=intent.value, entity=entity)
+
+        with span("facts"):
+            facts = collect_facts(catalog, intent, entity, confidence)
+
+        # уточнение без своей сущности («а что ещё есть?») понятно только
+        # из предыдущих сообщений — такой ответ не кэшируем и не берём
+        # из набора. Самостоятельный вопрос о найденной сущности отправляется
+        # без истории: ключ кэша не учитывает историю, и ответ, написанный
+        # по чужому диалогу, не должен достаться другому пользователю
+        follow_up = bool(session.history) and (
+            intent == TrainingIntent.UNKNOWN or entity is None
+        )
+        # сообщение пользователя попадёт в историю вместе с ответом
+        history = [("user", user_text)]
+        if follow_up:
+            history = [*session.history, *history]
+
+        with span("prompt"):
+            prepared = self._compose(catalog, facts, user_text, session.state, history)
+        if follow_up:
+            self.answer_cache.stats.bypassed += 1
+            prepared.cache_key = None
+        return prepared
+
+    def _compose(
+        self,
+        catalog: Catalog,
+        facts: AnswerFacts,
+        query: str,
+        state: str,
+        history: list[tuple[str, str]],
+    ) -> PreparedRequest:
+        """Собирает промпт по фактам: для запроса пользователя
+        и для типовых вопросов набора готовых ответов"""
+        entity = facts.entity
+
+        #  формируем факты для LLM; длинные перечни ранжируются по запросу
+        #  и урезаются под бюджет токенов
+        if facts.intent == TrainingIntent.CLUBS_BY_CLASS:
+            # адреса и телефоны уже присоединены при сборке справочника
+            fact_groups = [
+                FactGroup("Тренировка", [entity]),
+                FactGroup(
+                    "Проводится в клубах",
+                    [
+                        f"{c.name} (Адрес: {c.address}, Телефон: {c.phone})"
+                        for c in facts.clubs
+                        if c.address is not None
+                    ],
+                    ranked=True,
+                ),
+            ]
+
+        elif facts.intent == TrainingIntent.CLASSES_BY_CLUB:
+            fact_groups = [
+                FactGroup("Клуб", [entity]),
+                FactGroup("Адрес", [facts.address]),
+                FactGroup("Телефон", [facts.phone]),
+                FactGroup("Доступные тренировки", list(facts.classes), ranked=True),
+            ]
+
+        elif facts.intent == TrainingIntent.LIST_ALL_CLASSES:
+            fact_groups = [
+                FactGroup("Все доступные тренировки", list(facts.classes), ranked=True)
+            ]
 
         else:
-            districts = await sheets_client.list_available_districts() or []
-            cities = ["г. Самарканд", "г. Бухара"]
-            facts_block = (
-                f"Районы Ташкента: {', '.join(districts)}\n"
-                f"Города: {', '.join(cities)}\n"
-                f"Все клубы: {', '.join(club_names)}\n"
-                f"Все тренировки: {', '.join(class_names)}"
+            fact_groups = [
+                FactGroup("Районы Ташкента", list(catalog.districts), ranked=True),
+                FactGroup("Города", list(catalog.cities)),
+                FactGroup("Все клубы", list(catalog.club_names), ranked=True),
+                FactGroup("Все тренировки", list(catalog.class_names), ranked=True),
+            ]
+
+        #  формируем prompt в пределах бюджета токенов
+        prompt = self.prompt_builder.build(
+            query=query,
+            state=state,
+            intent=facts.intent,
+            history=history,
+            fact_groups=fact_groups,
+        )
+        facts_block = prompt.facts_block
+
+        messages = [
+            {
+                "role": "system",
+                "content": "Вы информационный ассистент Chekhov Sport Club.",
+            },
+            {"role": "user", "content": prompt.text},
+        ]
+        cache_key = AnswerCache.make_key(facts.intent, facts.entity, facts_block, query)
+        return PreparedRequest(query, facts, facts_block, messages, cache_key)
+
+    async def _ready_answer(
+        self, user_id: int, prepared: PreparedRequest
+    ) -> str | None:
+        """Ответ без обращения к LLM: из набора готовых ответов,
+        по шаблону или из кэша"""
+        # набор и кэш — только для ответов, не зависящих от истории. Набор
+        # нужен там, где шаблон не отвечает, и только при точном совпадении
+        # сущности: ответ в нём написан про конкретную сущность и не должен
+        # достаться похожей
+        if (
+            prepared.cache_key is not None
+            and self.answer_pack is not None
+            and prepared.facts.confidence >= 1.0
+            and not self.templates.confident(prepared.facts)
+        ):
+            await self.answer_pack.refresh()
+            answer = self.answer_pack.get(prepared.facts)
+            if answer is not None:
+                ANSWERS.inc(source="pack")
+                await self._remember(user_id, prepared.query, answer)
+                return answer
+
+        answer = self.templates.render(prepared.facts)
+        if answer is not None:
+            ANSWERS.inc(source="template")
+            await self._remember(user_id, prepared.query, answer)
+            return answer
+
+        if prepared.cache_key is None:
+            return None
+        answer = self.answer_cache.get(prepared.cache_key)
+        if answer is not None:
+            logger.info(
+                "Ответ из кэша (hit rate %.0f%%)",
+                self.answer_cache.stats.hit_rate * 100,
             )
+            ANSWERS.inc(source="cache")
+            await self._remember(user_id, prepared.query, answer)
+        return answer
+
+    # ------------------- Ответ без LLM -------------------
+    def _hedge_delay(self, latencies: LatencyWindow) -> float | None:
+        """Через сколько секунд дублировать запрос; None — не дублировать"""
+        if not settings.LLM_HEDGE_PERCENTILE:
+            return None
+        return latencies.percentile(settings.LLM_HEDGE_PERCENTILE)
+
+    async def _fallback(
+        self, user_id: int, prepared: PreparedRequest, reason: str
+    ) -> str:
+        """Ответ из данных справочника, когда LLM недоступна или не успевает"""
+        logger.warning("Ответ без LLM: %s", reason)
+        ANSWERS.inc(source="fallback")
+        answer = format_fallback(prepared.facts, prepared.facts_block)
+        await self._remember(user_id, prepared.query, answer)
+        return answer
+
+    def _record_timeout(self, llm_started: float, deadline: float) -> None:
+        """Срок ответа истёк во время запроса к LLM. Сбой предохранителю
+        засчитывается, только если у LLM была заметная доля срока; если
+        срок ушёл на справочник, попытка просто освобождается."""
+        ERRORS.inc(component="deadline")
+        budget = deadline - llm_started
+        if budget >= settings.REPLY_DEADLINE * LLM_MIN_BUDGET_SHARE:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
 
-        #  формируем prompt
-        prompt = f"""
-    Вы — менеджер по продажам фитнес-клубов Chekhov Sport Club, женщина по имени Малика.
-
-    Контекст пользователя:
-    - Состояние диалога: {state_data['state']}
-    - Обнаруженный интент: {intent}
-    - История последних сообщений:
-    {''.join([f"{m['role'].capitalize()}: {m['content']}\n" for m in state_data['history']])}
-
-    Факты:
-    {facts_block}
-
-    Правила:
-    - Повторно не нужно здороваться
-    - Используй только переданные факты
-    - Не делай предположений
-    - Используй только переданные точные данные о клубах, адресах и телефонах. Не придумывай ничего
-    - Если данных не хватает — попроси уточнение
-
-    Задача:
-    - Корректно ответь пользователю согласно интенту
-    - Предложи следующий логичный шаг
-    - Ответ 5–6 предложений
-    """
+    # ------------------- Генерация ответа -------------------
+    async def generate_response(self, user_id: int, user_text: str) -> str:
+        """Генерирует ответ пользователю на основе LLM.
+        Укладывается в REPLY_DEADLINE вместе с загрузкой справочника; если
+        срок вышел, LLM недоступна или предохранитель разомкнут — отвечает
+        данными из справочника."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.REPLY_DEADLINE
+        prepared = await self._prepare(user_id, user_text, deadline)
+        ready = await self._ready_answer(user_id, prepared)
+        if ready is not None:
+            return ready
+
+        if loop.time() >= deadline:
+            # срок ушёл на справочник; LLM тут ни при чём
+            return await self._fallback(user_id, prepared, "истёк срок ответа")
+        if not self.breaker.allow():
+            return await self._fallback(user_id, prepared, "предохранитель разомкнут")
 
         # вызов LLM
+        llm_started = loop.time()
         try:
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Вы информационный ассистент Chekhov Sport Club.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                stream=False,
-            )
-
-            answer = response.choices[0].message.content.strip()
-            self.add_to_history(user_id, "assistant", answer)
-            return answer
+            started = time.perf_counter()
+            with span("llm"), IN_FLIGHT.track(stage="llm"):
+                async with asyncio.timeout_at(deadline):
+                    answer = await hedged(
+                        lambda: self.client.complete(prepared.messages),
+                        self._hedge_delay(self.latencies),
+                        self.hedge_stats,
+                    )
+            latency = time.perf_counter() - started
+
+        except TimeoutError:
+            self._record_timeout(llm_started, deadline)
+            return await self._fallback(user_id, prepared, "истёк срок ответа")
 
         except Exception as e:
             logger.exception("Ошибка при обращении к DeepSeek API: %s", e)
-            return "Извините, произошла ошибка. Попробуйте позже."
+            ERRORS.inc(component="deepseek")
+            self.breaker.record_failure()
+            return await self._fallback(user_id, prepared, "ошибка DeepSeek")
+
+        except BaseException:
+            # генерацию отменили (пришло новое сообщение): исход неизвестен
+            self.breaker.release()
+            raise
+
+        self.breaker.record_success()
+        self.latencies.add(latency)
+        ANSWERS.inc(source="llm")
+        if prepared.cache_key is not None:
+            self.answer_cache.put(prepared.cache_key, answer, latency)
+        await self._remember(user_id, user_text, answer)
+        return answer
+
+    async def generate_response_stream(
+        self, user_id: int, user_text: str
+    ) -> AsyncIterator[str]:
+        """Генерирует ответ частями по мере поступления токенов.
+        В историю попадает итоговый текст ответа. Срок ответа и запасной
+        ответ из данных — как в generate_response; если срок истёк
+        посреди генерации, ответ обрывается на уже отправленном."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.REPLY_DEADLINE
+        prepared = await self._prepare(user_id, user_text, deadline)
+        ready = await self._ready_answer(user_id, prepared)
+        if ready is not None:
+            yield ready
+            return
+
+        if loop.time() >= deadline:
+            yield await self._fallback(user_id, prepared, "истёк срок ответа")
+            return
+        if not self.breaker.allow():
+            yield await self._fallback(user_id, prepared, "предохранитель разомкнут")
+            return
+
+        parts: list[str] = []
+        started = time.perf_counter()
+        llm_started = loop.time()
+        # между фрагментами идёт отправка в Telegram, поэтому span здесь
+        # не подходит: замеряем только ожидание самой модели
+        waited = 0.0
+        IN_FLIGHT.inc(stage="llm")
+        chunks = hedged_stream(
+            lambda: self.client.stream(prepared.messages),
+            self._hedge_delay(self.first_token_latencies),
+            self.hedge_stats,
+        )
+        try:
+            while True:
+                requested = time.perf_counter()
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        delta = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+                waited += time.perf_counter() - requested
+                if not parts:
+                    STAGE_SECONDS.observe(waited, stage="llm_first_token")
+                    self.first_token_latencies.add(waited)
+                parts.append(delta)
+                yield delta
+
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                self._record_timeout(llm_started, deadline)
+            else:
+                logger.exception("Ошибка при обращении к DeepSeek API: %s", e)
+                ERRORS.inc(component="deepseek")
+                self.breaker.record_failure()
+            if not parts:
+                yield await self._fallback(user_id, prepared, "LLM не ответила")
+                return
+            # оборванный ответ не кэшируем
+            prepared.cache_key = None
+
+        except BaseException:
+            # генерацию отменили или перестали читать поток: исход неизвестен
+            self.breaker.release()
+            raise
+
+        else:
+            self.breaker.record_success()
+
+        finally:
+            await chunks.aclose()
+            IN_FLIGHT.dec(stage="llm")
+            STAGE_SECONDS.observe(waited, stage="llm")
+
+        ANSWERS.inc(source="llm")
+
+        answer = "".join(parts).strip()
+        if answer:
+            if prepared.cache_key is not None:
+                self.answer_cache.put(
+                    prepared.cache_key, answer, time.perf_counter() - started
+                )
+            await self._remember(user_id, user_text, answer)
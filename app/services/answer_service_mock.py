@@ -1,9 +1,14 @@
 import logging
-from typing import List
+from typing import AsyncIterator
 
-from app.clients.google_sheets import sheets_client
-from app.clients.group_classes import group_classes_client
-from app.services.intent_detector import TrainingIntent, TrainingIntentDetector
+from app.clients.catalog import NO_DATA
+from app.clients.google_sheets import get_sheets_client
+from app.config import settings
+from app.metrics import trace_fields
+from app.services.answer_templates import collect_facts, format_answer
+from app.services.entity_index import get_entity_index
+from app.services.intent_detector import TrainingIntent, get_intent_detector
+from app.services.session_store import create_session_store
 
 logger = logging.getLogger(__name__)
 
@@ -12,84 +17,62 @@ class LLMServiceMock:
     """Мок LLM-сервиса для тестирования без реального API, совместим с новой логикой интентов"""
 
     def __init__(self):
-        self.user_states = {}
+        self.sessions = create_session_store()
 
-    def add_to_history(self, user_id: int, role: str, content: str):
-        history: List[dict] = self.user_states.setdefault(user_id, {}).setdefault(
-            "history", []
-        )
-        history.append({"role": role, "content": content})
-        if len(history) > 6:
-            history.pop(0)
+    async def warmup(self) -> None:
+        await get_sheets_client().get_catalog()
 
-    async def generate_response(self, user_id: int, user_text: str) -> str:
-        # инициализация состояния пользователя
-        state_data = self.user_states.setdefault(
-            user_id,
-            {
-                "state": "NEED_CLUB",
-                "club": None,
-                "time_preference": None,
-                "greeted": False,
-                "history": [],
-            },
-        )
-
-        self.add_to_history(user_id, "user", user_text)
+    async def add_to_history(self, user_id: int, role: str, content: str):
+        session = await self.sessions.get(user_id)
+        session.add_message(role, content)
+        await self.sessions.save(session)
 
+    async def generate_response(self, user_id: int, user_text: str) -> str:
         # Получаем справочники
-        departments = await sheets_client.get_all_departments()
-        club_names = [d.get("Name", "") for d in departments if d.get("Name")]
-
-        all_classes_data = await group_classes_client.get_all()
-        class_names = [row["Name"] for row in all_classes_data]
+        catalog = await get_sheets_client().get_catalog()
+        club_names, class_names = catalog.club_names, catalog.class_names
 
         # Детектим интент
-        detector = TrainingIntentDetector(club_names, class_names)
-        intent = detector.detect(user_text)
-        entity = getattr(detector, "last_entity", None)
-
-        logger.info(f"[MOCK] Detected intent: {intent}, entity: {entity}")
-
-        # Формируем мок-ответ
-        if intent == TrainingIntent.CLUBS_BY_CLASS and entity:
-            clubs = await group_classes_client.get_clubs_by_class(entity)
-            if clubs:
-                info = []
-                for c in clubs:
-                    club_info = next((d for d in departments if d.get("Name") == c), {})
-                    address = club_info.get("address", "Нет данных")
-                    phone = club_info.get("phone", "Нет данных")
-                    info.append(f"{c} (Адрес: {address}, Телефон: {phone})")
-                response = (
-                    f"[MOCK] Тренировка '{entity}' доступна в клубах: {', '.join(info)}"
-                )
-            else:
-                response = f"[MOCK] Нет клубов с тренировкой '{entity}'"
-
-        elif intent == TrainingIntent.CLASSES_BY_CLUB and entity:
-            classes = await group_classes_client.get_classes_by_club(entity)
-            club_info = next((d for d in departments if d.get("Name") == entity), {})
-            address = club_info.get("address", "Нет данных")
-            phone = club_info.get("phone", "Нет данных")
-            response = (
-                f"[MOCK] Клуб '{entity}'\nАдрес: {address}\nТелефон: {phone}\n"
-                f"Доступные тренировки: {', '.join(classes) if classes else 'Нет данных'}"
+        detector = get_intent_detector(club_names, class_names)
+        result = detector.detect(user_text)
+        intent = result.intent
+        entity = result.entity
+
+        if intent in (TrainingIntent.UNKNOWN, TrainingIntent.LIST_ALL_CLASSES):
+            entity_index = get_entity_index(club_names, class_names)
+            candidate = entity_index.best(
+                user_text, threshold=settings.ENTITY_MATCH_THRESHOLD
             )
+            if candidate:
+                intent, entity = candidate.intent, candidate.entity
 
-        elif intent == TrainingIntent.LIST_ALL_CLASSES:
-            response = f"[MOCK] Все доступные тренировки: {', '.join(class_names)}"
+        logger.info("[MOCK] Detected intent: %s, entity: %s", intent, entity)
+        trace_fields(intent=intent.value, entity=entity)
+
+        # Формируем мок-ответ по тем же шаблонам, что и быстрый путь LLMService
+        facts = collect_facts(catalog, intent, entity, confidence=1.0)
+        if facts.intent == TrainingIntent.CLUBS_BY_CLASS and not facts.clubs:
+            response = f"[MOCK] Нет клубов с тренировкой '{entity}'"
+
+        elif facts.intent != TrainingIntent.UNKNOWN:
+            response = f"[MOCK] {format_answer(facts)}"
 
         else:
             # общий блок фактов
-            districts = await sheets_client.list_available_districts() or []
-            cities = ["г. Самарканд", "г. Бухара"]
+            districts = catalog.districts
             response = (
                 f"[MOCK] Районы Ташкента: {', '.join(districts)}\n"
-                f"Города: {', '.join(cities)}\n"
+                f"Города: {', '.join(catalog.cities) or NO_DATA}\n"
                 f"Все клубы: {', '.join(club_names)}\n"
                 f"Все тренировки: {', '.join(class_names)}"
             )
 
-        self.add_to_history(user_id, "assistant", response)
+        await self.add_to_history(user_id, "user", user_text)
+        await self.add_to_history(user_id, "assistant", response)
         return response
+
+    async def generate_response_stream(
+        self, user_id: int, user_text: str
+    ) -> AsyncIterator[str]:
+        """Мок потоковой генерации: весь ответ одним фрагментом"""
+        yield await self.generate_response(user_id, user_text)
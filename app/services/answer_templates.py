@@ -0,0 +1,136 @@
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+
+from app.clients.catalog import NO_DATA, Catalog, Club
+from app.services.intent_detector import TrainingIntent
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AnswerFacts:
+    """Факты для ответа по интенту. confidence — уверенность в сущности (0..1)."""
+
+    intent: TrainingIntent
+    entity: str | None = None
+    confidence: float = 1.0
+    clubs: tuple[Club, ...] = ()
+    classes: tuple[str, ...] = ()
+    address: str = NO_DATA
+    phone: str = NO_DATA
+
+
+def collect_facts(
+    catalog: Catalog,
+    intent: TrainingIntent,
+    entity: str | None,
+    confidence: float,
+) -> AnswerFacts:
+    """Собирает факты из индексов справочника для найденного интента"""
+    if intent == TrainingIntent.CLUBS_BY_CLASS and entity:
+        clubs = catalog.clubs_by_class.get(entity.strip().casefold(), ())
+        return AnswerFacts(intent, entity, confidence, clubs=clubs)
+
+    if intent == TrainingIntent.CLASSES_BY_CLUB and entity:
+        club = catalog.clubs.get(entity) or Club(entity)
+        return AnswerFacts(
+            intent,
+            entity,
+            confidence,
+            classes=catalog.classes_by_club.get(entity, ()),
+            address=club.address or NO_DATA,
+            phone=club.phone or NO_DATA,
+        )
+
+    if intent == TrainingIntent.LIST_ALL_CLASSES:
+        return AnswerFacts(intent, confidence=confidence, classes=catalog.class_names)
+
+    return AnswerFacts(TrainingIntent.UNKNOWN, confidence=confidence)
+
+
+def format_answer(facts: AnswerFacts) -> str | None:
+    """Ответ по шаблону; None — для интента шаблона нет"""
+    if facts.intent == TrainingIntent.CLUBS_BY_CLASS:
+        lines = [
+            f"• {c.name} — {c.address or NO_DATA}, тел. {c.phone or NO_DATA}"
+            for c in facts.clubs
+        ]
+        return (
+            f"Тренировка «{facts.entity}» проходит в клубах:\n"
+            + "\n".join(lines)
+            + "\n\nПодскажите, какой клуб вам удобнее, и я расскажу об абонементах."
+        )
+
+    if facts.intent == TrainingIntent.CLASSES_BY_CLUB:
+        return (
+            f"Клуб {facts.entity}\nАдрес: {facts.address}\nТелефон: {facts.phone}\n"
+            f"Доступные тренировки: {', '.join(facts.classes) or NO_DATA}\n\n"
+            "Какое направление вам интересно?"
+        )
+
+    if facts.intent == TrainingIntent.LIST_ALL_CLASSES:
+        return (
+            f"Все доступные тренировки: {', '.join(facts.classes)}\n\n"
+            "Напишите, какая тренировка вас интересует, и я подскажу, где она проходит."
+        )
+
+    return None
+
+
+def format_fallback(facts: AnswerFacts, facts_block: str) -> str:
+    """Ответ только из данных, когда LLM недоступна: по шаблону интента,
+    а если шаблона нет — блок фактов как есть"""
+    answer = format_answer(facts) if facts.clubs or facts.classes else None
+    return answer or (
+        "Сейчас не получается подготовить подробный ответ. "
+        f"Вот что есть в справочнике:\n{facts_block}"
+    )
+
+
+@dataclass
+class TemplateStats:
+    """Сколько ответов собрано по шаблону (по интентам) и сколько ушло в LLM."""
+
+    rendered: Counter = field(default_factory=Counter)
+    fallthrough: int = 0
+
+    @property
+    def skip_share(self) -> float:
+        total = sum(self.rendered.values()) + self.fallthrough
+        return sum(self.rendered.values()) / total if total else 0.0
+
+
+class TemplateRenderer:
+    """Детерминированные ответы без LLM для интентов, где ответ — это сами данные.
+
+    `min_confidence` задаёт порог уверенности для каждого интента;
+    интенты, которых нет в словаре, всегда уходят в LLM.
+    """
+
+    def __init__(self, min_confidence: dict[str, float]) -> None:
+        self.min_confidence = min_confidence
+        self.stats = TemplateStats()
+
+    def confident(self, facts: AnswerFacts) -> bool:
+        """Достаточно ли уверенности в интенте и сущности для ответа без LLM"""
+        threshold = self.min_confidence.get(facts.intent.value)
+        return threshold is not None and facts.confidence >= threshold
+
+    def render(self, facts: AnswerFacts) -> str | None:
+        if not self.confident(facts) or not (facts.clubs or facts.classes):
+            self.stats.fallthrough += 1
+            return None
+
+        answer = format_answer(facts)
+        if answer is None:
+            self.stats.fallthrough += 1
+            return None
+
+        self.stats.rendered[facts.intent.value] += 1
+        logger.info(
+            "Ответ по шаблону для %s (без LLM: %.0f%% запросов)",
+            facts.intent.value,
+            self.stats.skip_share * 100,
+        )
+        return answer
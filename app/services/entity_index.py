@@ -0,0 +1,162 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+
+from app.services.intent_detector import TrainingIntent, normalize_text
+
+_TRANSLIT = str.maketrans(
+    {
+        "а": "a",
+        "б": "b",
+        "в": "v",
+        "г": "g",
+        "д": "d",
+        "е": "e",
+        "ж": "zh",
+        "з": "z",
+        "и": "i",
+        "й": "y",
+        "к": "k",
+        "л": "l",
+        "м": "m",
+        "н": "n",
+        "о": "o",
+        "п": "p",
+        "р": "r",
+        "с": "s",
+        "т": "t",
+        "у": "u",
+        "ф": "f",
+        "х": "kh",
+        "ц": "ts",
+        "ч": "ch",
+        "ш": "sh",
+        "щ": "shch",
+        "ъ": "",
+        "ы": "y",
+        "ь": "",
+        "э": "e",
+        "ю": "yu",
+        "я": "ya",
+    }
+)
+_NON_WORD = re.compile(r"[^\w]+")
+
+# сколько кандидатов с наибольшим числом общих триграмм пересчитывать точно
+_CANDIDATES_TO_SCORE = 20
+
+
+def make_key(text: str) -> str:
+    """Ключ для нечёткого сравнения: нормализация, транслитерация в латиницу,
+    без знаков препинания. "Чехов Спорт" и "Chekhov Sport" дают один ключ."""
+    latin = normalize_text(text).translate(_TRANSLIT)
+    return " ".join(_NON_WORD.sub(" ", latin).split())
+
+
+def trigrams(key: str) -> frozenset[str]:
+    padded = f" {key} "
+    return frozenset(map("".join, zip(padded, padded[1:], padded[2:])))
+
+
+def _dice(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+@dataclass(frozen=True)
+class EntityCandidate:
+    """Кандидат нечёткого поиска: точное название из справочника и оценка 0..1."""
+
+    entity: str
+    intent: TrainingIntent
+    score: float
+
+
+class EntityIndex:
+    """Триграммный индекс названий клубов и тренировок.
+
+    Кандидаты отбираются по инвертированному индексу триграмм, затем
+    каждый оценивается коэффициентом Дайса против лучшего «окна» запроса
+    из того же числа слов, что и название. Так находятся названия внутри
+    длинных сообщений, с опечатками и в другой раскладке.
+    """
+
+    def __init__(self, club_names: list[str], class_names: list[str]) -> None:
+        self._entries: list[tuple[str, TrainingIntent, str, frozenset[str]]] = []
+        self._postings: dict[str, list[int]] = {}
+
+        for names, intent in (
+            (class_names, TrainingIntent.CLUBS_BY_CLASS),
+            (club_names, TrainingIntent.CLASSES_BY_CLUB),
+        ):
+            for name in names:
+                key = make_key(name)
+                if not key:
+                    continue
+                grams = trigrams(key)
+                entry_id = len(self._entries)
+                self._entries.append((name, intent, key, grams))
+                for gram in grams:
+                    self._postings.setdefault(gram, []).append(entry_id)
+
+    def search(
+        self, query: str, limit: int = 5, intent: TrainingIntent | None = None
+    ) -> list[EntityCandidate]:
+        """Возвращает кандидатов, отсортированных по убыванию оценки"""
+        query_key = make_key(query)
+        if not query_key:
+            return []
+
+        shared: Counter[int] = Counter()
+        for gram in trigrams(query_key):
+            shared.update(self._postings.get(gram, ()))
+        # фильтр по интенту — до отбора лучших, иначе названия другого вида
+        # могут вытеснить все подходящие
+        if intent is not None:
+            shared = Counter(
+                {i: n for i, n in shared.items() if self._entries[i][1] == intent}
+            )
+
+        words = query_key.split()
+        window_grams: dict[int, list[frozenset[str]]] = {}
+        candidates = []
+        for entry_id, _ in shared.most_common(_CANDIDATES_TO_SCORE):
+            name, entry_intent, key, grams = self._entries[entry_id]
+
+            if f" {key} " in f" {query_key} ":
+                score = 1.0
+            else:
+                size = min(len(key.split()), len(words))
+                if size not in window_grams:
+                    window_grams[size] = [
+                        trigrams(" ".join(window))
+                        for window in zip(*(words[i:] for i in range(size)))
+                    ]
+                score = max(_dice(grams, window) for window in window_grams[size])
+            candidates.append(EntityCandidate(name, entry_intent, score))
+
+        # при равной оценке выигрывает более длинное (более конкретное) название
+        candidates.sort(key=lambda c: (c.score, len(c.entity)), reverse=True)
+        return candidates[:limit]
+
+    def best(
+        self,
+        query: str,
+        threshold: float,
+        intent: TrainingIntent | None = None,
+    ) -> EntityCandidate | None:
+        """Лучший кандидат, если его оценка не ниже порога"""
+        candidates = self.search(query, limit=1, intent=intent)
+        if candidates and candidates[0].score >= threshold:
+            return candidates[0]
+        return None
+
+
+@lru_cache(maxsize=4)
+def get_entity_index(
+    club_names: tuple[str, ...], class_names: tuple[str, ...]
+) -> EntityIndex:
+    """Возвращает индекс для текущего набора названий (пересобирается при изменении справочника)"""
+    return EntityIndex(list(club_names), list(class_names))
@@ -1,5 +1,8 @@
+import re
+from collections import deque
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
 
 
 class TrainingIntent(Enum):
@@ -13,6 +16,121 @@ class TrainingIntent(Enum):
 class TrainingIntentResult:
     intent: TrainingIntent
     entity: str | None = None
+    # уверенность в интенте (0..1)
+    confidence: float = 1.0
+
+
+# слова, которые не меняют смысла вопроса «какие есть тренировки»
+_LIST_FILLER_WORDS = frozenset(
+    {
+        "какие",
+        "какая",
+        "каких",
+        "есть",
+        "все",
+        "всех",
+        "вас",
+        "список",
+        "перечень",
+        "групповые",
+        "групповых",
+        "бывают",
+        "проводятся",
+        "доступны",
+        "доступные",
+        "покажи",
+        "покажите",
+        "подскажи",
+        "подскажите",
+        "расскажи",
+        "расскажите",
+        "пожалуйста",
+        "можно",
+        "хочу",
+        "узнать",
+    }
+)
+_WORD = re.compile(r"\w+")
+
+
+def _is_list_keyword(word: str) -> bool:
+    return "тренировк" in word or "занятия" in word
+
+
+@dataclass(frozen=True)
+class EntityMention:
+    """Упоминание клуба или тренировки в тексте (позиции в нормализованном тексте)."""
+
+    start: int
+    end: int
+    intent: TrainingIntent
+    entity: str
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст к виду для сравнения: casefold, ё → е, без кавычек и лишних пробелов"""
+    return " ".join(text.casefold().replace("ё", "е").replace('"', " ").split())
+
+
+class _Automaton:
+    """Автомат Ахо–Корасик: находит все вхождения всех шаблонов за один проход."""
+
+    def __init__(self, patterns: dict[str, tuple[TrainingIntent, str]]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # шаблон, заканчивающийся в узле, и ссылка на ближайший суффикс с шаблоном
+        self._output: list[tuple[int, TrainingIntent, str] | None] = [None]
+        self._dict_link: list[int] = [0]
+
+        for pattern, (intent, entity) in patterns.items():
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                    self._dict_link.append(0)
+                    self._goto[node][char] = next_node
+                node = next_node
+            self._output[node] = (len(pattern), intent, entity)
+
+        self._build_links()
+
+    def _build_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._dict_link[child] = (
+                    target
+                    if self._output[target] is not None
+                    else self._dict_link[target]
+                )
+
+    def find_all(self, text: str) -> list[EntityMention]:
+        mentions = []
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            match = node if self._output[node] is not None else self._dict_link[node]
+            while match:
+                length, intent, entity = self._output[match]
+                mentions.append(
+                    EntityMention(position + 1 - length, position + 1, intent, entity)
+                )
+                match = self._dict_link[match]
+        return mentions
 
 
 class TrainingIntentDetector:
@@ -20,19 +138,61 @@ class TrainingIntentDetector:
         self.club_names = club_names
         self.class_names = class_names
 
+        # тренировки добавляются первыми: при совпадении названий они приоритетнее
+        patterns: dict[str, tuple[TrainingIntent, str]] = {}
+        for names, intent in (
+            (class_names, TrainingIntent.CLUBS_BY_CLASS),
+            (club_names, TrainingIntent.CLASSES_BY_CLUB),
+        ):
+            for name in names:
+                key = normalize_text(name)
+                if key and key not in patterns:
+                    patterns[key] = (intent, name)
+        self._automaton = _Automaton(patterns)
+
+    def find_mentions(self, text: str) -> list[EntityMention]:
+        """Находит упоминания клубов и тренировок.
+        Пересекающиеся совпадения разрешаются в пользу самого длинного."""
+        selected: list[EntityMention] = []
+        candidates = self._automaton.find_all(normalize_text(text))
+        for mention in sorted(candidates, key=lambda m: (m.start - m.end, m.start)):
+            if all(mention.end <= m.start or mention.start >= m.end for m in selected):
+                selected.append(mention)
+        return sorted(selected, key=lambda m: m.start)
+
     def detect(self, text: str) -> TrainingIntentResult:
-        # простая логика, например
+        mentions = self.find_mentions(text)
+        for intent in (TrainingIntent.CLUBS_BY_CLASS, TrainingIntent.CLASSES_BY_CLUB):
+            for mention in mentions:
+                if mention.intent == intent:
+                    return TrainingIntentResult(intent=intent, entity=mention.entity)
+
         text_lower = text.lower()
-        for cls in self.class_names:
-            if cls.lower() in text_lower:
-                return TrainingIntentResult(
-                    intent=TrainingIntent.CLUBS_BY_CLASS, entity=cls
-                )
-        for club in self.club_names:
-            if club.lower() in text_lower:
-                return TrainingIntentResult(
-                    intent=TrainingIntent.CLASSES_BY_CLUB, entity=club
-                )
         if "тренировк" in text_lower or "занятия" in text_lower:
-            return TrainingIntentResult(intent=TrainingIntent.LIST_ALL_CLASSES)
+            return TrainingIntentResult(
+                intent=TrainingIntent.LIST_ALL_CLASSES,
+                confidence=self._list_confidence(text),
+            )
         return TrainingIntentResult(intent=TrainingIntent.UNKNOWN)
+
+    @staticmethod
+    def _list_confidence(text: str) -> float:
+        """Доля значимых слов запроса, которые объясняет ключевое слово.
+        «Какие есть тренировки?» — 1.0; «какие тренировки проходят утром?»
+        спрашивает о большем, чем весь перечень, и получает меньше."""
+        words = [
+            word
+            for word in _WORD.findall(normalize_text(text))
+            if len(word) > 2 and word not in _LIST_FILLER_WORDS
+        ]
+        keywords = sum(_is_list_keyword(word) for word in words)
+        return keywords / len(words) if words else 1.0
+
+
+@lru_cache(maxsize=4)
+def get_intent_detector(
+    club_names: tuple[str, ...], class_names: tuple[str, ...]
+) -> TrainingIntentDetector:
+    """Возвращает детектор для текущего набора названий.
+    Автомат пересобирается только когда справочник изменился."""
+    return TrainingIntentDetector(list(club_names), list(class_names))
@@ -0,0 +1,203 @@
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterable
+
+from app.services.entity_index import make_key, trigrams
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TEMPLATE = """
+    Вы — менеджер по продажам фитнес-клубов Chekhov Sport Club, женщина по имени Малика.
+
+    Контекст пользователя:
+    - Состояние диалога: {state}
+    - Обнаруженный интент: {intent}
+    - История последних сообщений:
+    {history}
+
+    Факты:
+    {facts}
+
+    Правила:
+    - Повторно не нужно здороваться
+    - Используй только переданные факты
+    - Не делай предположений
+    - Используй только переданные точные данные о клубах, адресах и телефонах. Не придумывай ничего
+    - Если данных не хватает — попроси уточнение
+
+    Задача:
+    - Корректно ответь пользователю согласно интенту
+    - Предложи следующий логичный шаг
+    - Ответ 5–6 предложений
+    """
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_CYRILLIC = re.compile(r"[а-яё]", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов BPE-токенизатора без самого токенизатора:
+    латиница ~4 символа на токен, кириллица ~2.5, знак препинания — токен."""
+    tokens = 0
+    for token in _TOKEN.findall(text):
+        chars_per_token = 2.5 if _CYRILLIC.search(token) else 4
+        tokens += math.ceil(len(token) / chars_per_token)
+    return tokens
+
+
+@dataclass
+class FactGroup:
+    """Строка блока фактов «title: item, item, ...».
+    Если ranked — элементы ранжируются по близости к запросу и могут быть урезаны."""
+
+    title: str
+    items: list[str]
+    ranked: bool = False
+
+
+@dataclass
+class BuiltPrompt:
+    text: str
+    facts_block: str
+    tokens: int
+    facts_used: int = 0
+    facts_total: int = 0
+    history_used: int = 0
+    history_total: int = 0
+
+
+def _relevance(query_grams: frozenset[str], item: str) -> float:
+    item_grams = trigrams(make_key(item))
+    if not query_grams or not item_grams:
+        return 0.0
+    return len(query_grams & item_grams) / len(item_grams)
+
+
+class PromptBuilder:
+    """Собирает промпт в пределах бюджета токенов.
+
+    Сначала в бюджет укладываются факты: нерангируемые целиком, затем
+    элементы ранжируемых групп в порядке близости к запросу. Остаток
+    отдаётся истории: последние сообщения — полностью, более старые —
+    усечёнными, самые старые отбрасываются первыми.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        history_full_messages: int = 2,
+        history_trim_chars: int = 160,
+    ) -> None:
+        self.budget = budget
+        self.history_full_messages = history_full_messages
+        self.history_trim_chars = history_trim_chars
+
+    def build(
+        self,
+        query: str,
+        state: str,
+        intent: object,
+        history: Iterable[tuple[str, str]],
+        fact_groups: list[FactGroup],
+    ) -> BuiltPrompt:
+        history = list(history)
+        base_tokens = estimate_tokens(
+            PROMPT_TEMPLATE.format(state=state, intent=intent, history="", facts="")
+        )
+        history_lines = self._history_lines(history)
+        # текущее сообщение пользователя (последнее в истории) резервируется всегда
+        reserved = estimate_tokens(history_lines[-1]) if history_lines else 0
+        remaining = self.budget - base_tokens - reserved
+
+        facts_block, facts_used, facts_total, remaining = self._fit_facts(
+            query, fact_groups, remaining
+        )
+
+        kept = history_lines[-1:]
+        remaining += reserved - sum(estimate_tokens(line) for line in kept)
+        for line in reversed(history_lines[:-1]):
+            cost = estimate_tokens(line)
+            if cost > remaining:
+                break
+            kept.insert(0, line)
+            remaining -= cost
+
+        text = PROMPT_TEMPLATE.format(
+            state=state,
+            intent=intent,
+            history="".join(f"{line}\n" for line in kept),
+            facts=facts_block,
+        )
+        built = BuiltPrompt(
+            text=text,
+            facts_block=facts_block,
+            tokens=estimate_tokens(text),
+            facts_used=facts_used,
+            facts_total=facts_total,
+            history_used=len(kept),
+            history_total=len(history_lines),
+        )
+        logger.info(
+            "Промпт: ~%d токенов (бюджет %d), фактов %d/%d, история %d/%d",
+            built.tokens,
+            self.budget,
+            built.facts_used,
+            built.facts_total,
+            built.history_used,
+            built.history_total,
+        )
+        return built
+
+    def _history_lines(self, history: list[tuple[str, str]]) -> list[str]:
+        lines = []
+        full_from = len(history) - self.history_full_messages
+        for i, (role, content) in enumerate(history):
+            if i < full_from and len(content) > self.history_trim_chars:
+                content = content[: self.history_trim_chars].rstrip() + "…"
+            lines.append(f"{role.capitalize()}: {content}")
+        return lines
+
+    def _fit_facts(
+        self, query: str, groups: list[FactGroup], remaining: int
+    ) -> tuple[str, int, int, int]:
+        query_grams = trigrams(make_key(query))
+        selected: list[list[tuple[int, str]]] = [[] for _ in groups]
+
+        # (приоритет, группа, позиция): нерангируемые идут первыми
+        order = []
+        for g, group in enumerate(groups):
+            remaining -= estimate_tokens(f"{group.title}: \n")
+            if group.ranked:
+                # запас на пометку об урезанных элементах
+                remaining -= estimate_tokens(f" (и ещё {len(group.items)})")
+            for i, item in enumerate(group.items):
+                score = _relevance(query_grams, item) if group.ranked else math.inf
+                order.append((score, g, i))
+        order.sort(key=lambda o: (-o[0], o[1], o[2]))
+
+        used = 0
+        for _, g, i in order:
+            item = groups[g].items[i]
+            cost = estimate_tokens(item) + 1
+            if cost > remaining:
+                if not groups[g].ranked:
+                    # обязательные факты не урезаются, даже сверх бюджета
+                    remaining -= cost
+                    selected[g].append((i, item))
+                    used += 1
+                continue
+            remaining -= cost
+            selected[g].append((i, item))
+            used += 1
+
+        lines = []
+        for group, items in zip(groups, selected):
+            values = ", ".join(item for _, item in sorted(items)) or "Нет данных"
+            omitted = len(group.items) - len(items)
+            suffix = f" (и ещё {omitted})" if omitted else ""
+            lines.append(f"{group.title}: {values}{suffix}")
+
+        total = sum(len(group.items) for group in groups)
+        return "\n".join(lines), used, total, remaining
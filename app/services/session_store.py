@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# сколько последних сообщений хранится в истории диалога
+HISTORY_LIMIT = 6
+
+
+class Session:
+    """Состояние диалога с пользователем. История — (role, content) в deque."""
+
+    __slots__ = (
+        "user_id",
+        "state",
+        "club",
+        "time_preference",
+        "greeted",
+        "history",
+        "touched_at",
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        state: str = "NEED_CLUB",
+        club: str | None = None,
+        time_preference: str | None = None,
+        greeted: bool = False,
+        history: Iterable[tuple[str, str]] = (),
+        touched_at: float = 0.0,
+    ) -> None:
+        self.user_id = user_id
+        self.state = state
+        self.club = club
+        self.time_preference = time_preference
+        self.greeted = greeted
+        self.history: deque[tuple[str, str]] = deque(history, maxlen=HISTORY_LIMIT)
+        self.touched_at = touched_at
+
+    def add_message(self, role: str, content: str) -> None:
+        """Добавляет сообщение; самое старое вытесняется автоматически"""
+        self.history.append((role, content))
+
+    def to_json(self) -> str:
+        return json.dumps(
+            [
+                self.state,
+                self.club,
+                self.time_preference,
+                self.greeted,
+                list(self.history),
+            ],
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, user_id: int, data: str, touched_at: float) -> "Session":
+        state, club, time_preference, greeted, history = json.loads(data)
+        return cls(
+            user_id,
+            state,
+            club,
+            time_preference,
+            greeted,
+            (tuple(m) for m in history),
+            touched_at,
+        )
+
+
+@dataclass
+class SessionStoreStats:
+    created: int = 0
+    loaded: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class SessionStore(ABC):
+    """Хранилище сессий пользователей."""
+
+    def __init__(self) -> None:
+        self.stats = SessionStoreStats()
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Session:
+        """Возвращает сессию пользователя, создавая новую при необходимости"""
+
+    @abstractmethod
+    async def save(self, session: Session) -> None:
+        """Сохраняет изменения сессии"""
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+
+class InMemorySessionStore(SessionStore):
+    """LRU-хранилище в памяти с TTL и жёстким лимитом числа сессий."""
+
+    def __init__(
+        self,
+        max_sessions: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._clock = clock
+        self._sessions: OrderedDict[int, Session] = OrderedDict()
+
+    async def get(self, user_id: int) -> Session:
+        now = self._clock()
+        session = self._sessions.get(user_id)
+        if session is not None and now - session.touched_at >= self.ttl:
+            del self._sessions[user_id]
+            self.stats.expirations += 1
+            session = None
+
+        if session is None:
+            session = Session(user_id)
+            self._sessions[user_id] = session
+            self.stats.created += 1
+            self._evict()
+        else:
+            self._sessions.move_to_end(user_id)
+            self.stats.loaded += 1
+
+        session.touched_at = now
+        return session
+
+    async def save(self, session: Session) -> None:
+        session.touched_at = self._clock()
+        self._sessions[session.user_id] = session
+        self._sessions.move_to_end(session.user_id)
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.stats.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Сессии в SQLite: переживают рестарт и доступны нескольким процессам.
+
+    Запросы идут по первичному ключу к локальному файлу в режиме WAL, но
+    при нескольких процессах могут ждать блокировку файла до busy timeout,
+    поэтому выполняются в отдельном потоке, а не в event loop.
+    Просроченные сессии удаляются при открытии и каждые purge_every записей.
+    """
+
+    def __init__(self, path: str, ttl: float, purge_every: int = 1000) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # одно соединение и один поток: запросы к файлу идут по очереди
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sessions"
+        )
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, timeout=5.0, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, touched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_touched_at ON sessions (touched_at)"
+        )
+        self.purge_expired()
+
+    async def get(self, user_id: int) -> Session:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._get, user_id
+        )
+
+    async def save(self, session: Session) -> None:
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._save, session
+        )
+
+    def _get(self, user_id: int) -> Session:
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT data, touched_at FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is not None and now - row[1] < self.ttl:
+            self.stats.loaded += 1
+            return Session.from_json(user_id, row[0], now)
+
+        if row is not None:
+            self.stats.expirations += 1
+        self.stats.created += 1
+        session = Session(user_id, touched_at=now)
+        self._save(session)
+        return session
+
+    def _save(self, session: Session) -> None:
+        session.touched_at = time.time()
+        self._conn.execute(
+            "INSERT INTO sessions (user_id, data, touched_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET "
+            "data = excluded.data, touched_at = excluded.touched_at",
+            (session.user_id, session.to_json(), session.touched_at),
+        )
+        self._writes += 1
+        if self._writes >= self.purge_every:
+            self._writes = 0
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Удаляет просроченные сессии, возвращает их число"""
+        cursor = self._conn.execute(
+            "DELETE FROM sessions WHERE touched_at < ?", (time.time() - self.ttl,)
+        )
+        self.stats.expirations += cursor.rowcount
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store() -> SessionStore:
+    """Создаёт хранилище сессий согласно настройке SESSION_BACKEND"""
+    if settings.SESSION_BACKEND == "sqlite":
+        logger.info("Сессии хранятся в SQLite: %s", settings.SESSION_DB_PATH)
+        return SQLiteSessionStore(settings.SESSION_DB_PATH, settings.SESSION_TTL)
+    return InMemorySessionStore(settings.SESSION_MAX_USERS, settings.SESSION_TTL)
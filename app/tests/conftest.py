@@ -0,0 +1,83 @@
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.clients.google_sheets import get_sheets_client
+from app.clients.models import SheetRows
+from app.config import settings
+from app.services import get_llm_service
+
+# обязательные настройки без настоящих ключей: сеть в тестах не нужна
+for name, value in {
+    "TELEGRAM_BOT_TOKEN": "123456:test",
+    "GOOGLE_SERVICE_ACCOUNT_JSON": "test-service-account.json",
+    "GOOGLE_SHEETS_SPREADSHEET_ID": "test",
+    "DEEPSEEK_API_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+# справочник из одного клуба и одной тренировки
+CATALOG = {
+    "all_departments": SheetRows.from_values(
+        "all_departments",
+        [
+            ["Name", "address", "phone", "district"],
+            [
+                "Chekhov Sport",
+                "г.Ташкент, Мирабадский район, ул. Фидокор, 40/1",
+                "998 90 929-20-00",
+                "Мирабад",
+            ],
+        ],
+    ),
+    "group_classes": SheetRows.from_values(
+        "group_classes", [["Name", "Chekhov Sport"], ["Йога", "Да"]]
+    ),
+}
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Снимок справочника и набор готовых ответов — во временном каталоге:
+    тестовые листы не должны попасть в data/ и подняться при запуске бота.
+    Общие клиенты создаются заново с этими путями, а клиент Google Sheets —
+    без файла сервисного аккаунта, с недоступным локальным адресом API."""
+    monkeypatch.setattr(
+        settings, "SHEETS_SNAPSHOT_PATH", str(tmp_path / "catalog_snapshot.sqlite3")
+    )
+    monkeypatch.setattr(settings, "ANSWER_PACK_PATH", str(tmp_path / "answers.sqlite3"))
+    monkeypatch.setattr(settings, "SHEETS_API_ENDPOINT", "http://127.0.0.1:9")
+    get_sheets_client.cache_clear()
+    get_llm_service.cache_clear()
+    yield
+    get_sheets_client.cache_clear()
+    get_llm_service.cache_clear()
+
+
+@pytest.fixture
+def catalog_sheets() -> dict[str, SheetRows]:
+    return CATALOG
+
+
+@pytest.fixture
+def mock_catalog(isolated_storage, catalog_sheets):
+    """Общий клиент отдаёт catalog_sheets вместо листов Google Sheets"""
+    load = AsyncMock(return_value=catalog_sheets)
+    with patch.object(get_sheets_client(), "load_catalog", new=load):
+        yield load
+
+
+class FakeClock:
+    """Часы, которые идут только вручную: clock.now = ..."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
@@ -0,0 +1,70 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.answer_cache import AnswerCache
+from app.services.answer_service import LLMService
+from app.services.intent_detector import TrainingIntent
+
+
+def test_key_ignores_case_and_punctuation_but_not_facts():
+    key = AnswerCache.make_key(TrainingIntent.CLUBS_BY_CLASS, "Йога", "f1", "Йога?")
+    assert key == AnswerCache.make_key(
+        TrainingIntent.CLUBS_BY_CLASS, "Йога", "f1", "  йога "
+    )
+    assert key != AnswerCache.make_key(
+        TrainingIntent.CLUBS_BY_CLASS, "Йога", "f2", "Йога?"
+    )
+
+
+def test_lru_and_ttl_eviction(clock):
+    cache = AnswerCache(max_size=2, ttl=10, clock=clock)
+    cache.put("a", "A", latency=2.0)
+    cache.put("b", "B", latency=2.0)
+    assert cache.get("a") == "A"
+    cache.put("c", "C", latency=2.0)
+
+    assert cache.get("b") is None
+    assert cache.stats.evictions == 1
+
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.stats.hits == 1
+    assert cache.stats.saved_latency == 2.0
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_skips_llm_unless_it_is_a_follow_up(mock_catalog):
+    service = LLMService()
+    # шаблонный путь отключён, чтобы проверить именно кэш ответов LLM
+    service.templates.min_confidence = {}
+    complete = AsyncMock(return_value="Йога проходит в Chekhov Sport.")
+
+    with patch.object(service.client, "complete", new=complete):
+        first = await service.generate_response(1, "Где проходит йога?")
+        second = await service.generate_response(2, "где проходит йога")
+        # вопрос с сущностью не зависит от истории пользователя 1
+        third = await service.generate_response(1, "Где проходит йога?")
+        # уточнение без сущности понятно только из истории — идём в LLM
+        await service.generate_response(1, "А что ещё есть рядом?")
+
+    assert first == second == third
+    assert complete.await_count == 2
+    assert service.answer_cache.stats.hits == 2
+    assert service.answer_cache.stats.bypassed == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_question_is_sent_without_history(mock_catalog):
+    service = LLMService()
+    service.templates.min_confidence = {}
+    complete = AsyncMock(return_value="Йога проходит в Chekhov Sport.")
+
+    with patch.object(service.client, "complete", new=complete):
+        await service.generate_response(1, "Мой секретный вопрос про абонемент")
+        await service.generate_response(1, "Где проходит йога?")
+
+    # ключ кэша не учитывает историю — её нет и в промпте
+    prompt = complete.await_args.args[0][-1]["content"]
+    assert "секретный" not in prompt
+    assert service.answer_cache.stats.bypassed == 0
@@ -0,0 +1,91 @@
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.clients.catalog import Catalog, Club
+from app.services.answer_pack import AnswerPack, facts_digest, pack_questions
+from app.services.answer_service import LLMService
+from app.services.answer_templates import AnswerFacts
+from app.services.intent_detector import TrainingIntent
+
+
+@pytest.mark.asyncio
+async def test_pack_round_trip_and_stale_facts(tmp_path):
+    path = str(tmp_path / "pack.sqlite3")
+    facts = AnswerFacts(
+        TrainingIntent.CLUBS_BY_CLASS, "Йога", 0.8, clubs=(Club("Chekhov Sport"),)
+    )
+    AnswerPack(path).save(
+        "v1", {("CLUBS_BY_CLASS", "Йога"): (facts_digest(facts), "Готовый ответ")}
+    )
+
+    pack = AnswerPack(path)
+    await pack.refresh()
+    assert pack.get(facts) == "Готовый ответ"
+    assert pack.version == "v1"
+
+    # справочник поменялся, а набор ещё нет — ответ не отдаётся
+    moved = AnswerFacts(
+        TrainingIntent.CLUBS_BY_CLASS, "Йога", clubs=(Club("Chekhov Fit"),)
+    )
+    assert pack.get(moved) is None
+    assert pack.stats.hits == 1
+    assert pack.stats.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_built_pack_answers_first_question_without_llm(
+    mock_catalog, catalog_sheets
+):
+    catalog = Catalog.build(catalog_sheets)
+    assert len(pack_questions(catalog)) == 2
+
+    service = LLMService()
+    complete = AsyncMock(return_value="Йога проходит в Chekhov Sport.")
+
+    with patch.object(service.client, "complete", new=complete):
+        # на эти вопросы отвечает шаблон — набор не собирается и не пишется
+        service._schedule_answer_pack(catalog)
+        await service._build_answer_pack(catalog)
+        assert service._pack_task is None
+        assert complete.await_count == 0
+        assert not os.path.exists(service.answer_pack.path)
+
+        # без шаблонов набор отвечает на вопросы с точным названием
+        service.templates.min_confidence = {}
+        await service._build_answer_pack(catalog)
+        built = complete.await_count
+        # повторная сборка той же версии справочника не нужна
+        await service._build_answer_pack(catalog)
+        answer = await service.generate_response(1, "Где проходит йога?")
+        # сущность угадана неуверенно — готовый ответ про «Йогу» не отдаётся
+        with patch.object(
+            service,
+            "_detect",
+            return_value=(TrainingIntent.CLUBS_BY_CLASS, "Йога", 0.6),
+        ):
+            await service.generate_response(2, "Где проходит йоггинг?")
+
+    assert built == 2
+    assert complete.await_count == 3
+    assert answer == "Йога проходит в Chekhov Sport."
+    assert service.answer_pack.stats.hits == 1
+    assert service.answer_pack.stats.builds == 1
+
+
+@pytest.mark.asyncio
+async def test_pack_build_skipped_while_breaker_is_open(mock_catalog, catalog_sheets):
+    catalog = Catalog.build(catalog_sheets)
+    service = LLMService()
+    service.templates.min_confidence = {}
+    for _ in range(service.breaker.failure_threshold):
+        service.breaker.record_failure()
+    complete = AsyncMock(return_value="Йога проходит в Chekhov Sport.")
+
+    with patch.object(service.client, "complete", new=complete):
+        await service._build_answer_pack(catalog)
+
+    assert complete.await_count == 0
+    assert service.answer_pack.version is None
+    assert service.answer_pack.stats.builds == 0
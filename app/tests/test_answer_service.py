@@ -1,12 +1,17 @@
-import asyncio
+import pytest
 
-from app.services import LLMService  # автоматически мок или реальный сервис
+from app.config import settings
+from app.services import get_llm_service
+from app.services.answer_service_mock import LLMServiceMock
 
 
-async def main():
-    llm_service = LLMService()
-    response = await llm_service.generate_response("Chekhov Sport")
-    print(response)
+@pytest.mark.asyncio
+async def test_mock_service_answers_about_club(mock_catalog, monkeypatch):
+    monkeypatch.setattr(settings, "USE_MOCK_LLM", True)
+    llm_service = get_llm_service()
 
+    response = await llm_service.generate_response(1, "Chekhov Sport")
 
-asyncio.run(main())
+    assert isinstance(llm_service, LLMServiceMock)
+    assert "Chekhov Sport" in response
+    mock_catalog.assert_awaited()
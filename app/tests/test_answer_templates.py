@@ -0,0 +1,46 @@
+from app.clients.catalog import Club
+from app.services.answer_templates import AnswerFacts, TemplateRenderer
+from app.services.intent_detector import TrainingIntent
+
+RULES = {"CLUBS_BY_CLASS": 0.9, "LIST_ALL_CLASSES": 1.0}
+
+
+def test_clear_hit_is_rendered_without_llm():
+    renderer = TemplateRenderer(RULES)
+    facts = AnswerFacts(
+        TrainingIntent.CLUBS_BY_CLASS,
+        "Йога",
+        clubs=(Club("Chekhov Sport", "ул. Фидокор, 40/1", "998 90 929-20-00"),),
+    )
+
+    answer = renderer.render(facts)
+
+    assert "Йога" in answer
+    assert "Chekhov Sport — ул. Фидокор, 40/1, тел. 998 90 929-20-00" in answer
+    assert renderer.stats.rendered["CLUBS_BY_CLASS"] == 1
+
+
+def test_low_confidence_disabled_intent_and_empty_facts_fall_through():
+    renderer = TemplateRenderer(RULES)
+    club = (Club("Chekhov Sport"),)
+
+    assert (
+        renderer.render(
+            AnswerFacts(TrainingIntent.CLUBS_BY_CLASS, "Йога", 0.6, clubs=club)
+        )
+        is None
+    )
+    assert (
+        renderer.render(
+            AnswerFacts(
+                TrainingIntent.CLASSES_BY_CLUB, "Chekhov Sport", classes=("Йога",)
+            )
+        )
+        is None
+    )
+    assert renderer.render(AnswerFacts(TrainingIntent.CLUBS_BY_CLASS, "Йога")) is None
+    assert renderer.render(AnswerFacts(TrainingIntent.UNKNOWN)) is None
+
+    renderer.render(AnswerFacts(TrainingIntent.LIST_ALL_CLASSES, classes=("Йога",)))
+    assert renderer.stats.fallthrough == 4
+    assert renderer.stats.skip_share == 0.2
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.clients.cache import AsyncTTLCache
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_collapse_into_one_fetch():
+    cache = AsyncTTLCache(ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return ["row"]
+
+    results = await asyncio.gather(*(cache.get("sheet", loader) for _ in range(10)))
+
+    assert calls == 1
+    assert all(r == ["row"] for r in results)
+    assert cache.stats.misses == 10
+    assert cache.stats.refreshes == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_while_refreshing(clock):
+    cache = AsyncTTLCache(ttl=10, stale_ttl=100, clock=clock)
+    version = 0
+
+    async def loader():
+        nonlocal version
+        version += 1
+        return version
+
+    assert await cache.get("sheet", loader) == 1
+    assert await cache.get("sheet", loader) == 1
+    assert cache.stats.hits == 1
+
+    clock.now = 20
+    # устаревшее значение отдаётся сразу, обновление идёт в фоне
+    assert await cache.get("sheet", loader) == 1
+    assert cache.stats.stale_hits == 1
+    await asyncio.sleep(0)
+    assert await cache.get("sheet", loader) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_background_refresh_keeps_stale_value(clock):
+    cache = AsyncTTLCache(ttl=10, stale_ttl=100, clock=clock)
+
+    async def ok():
+        return "old"
+
+    async def broken():
+        raise RuntimeError("sheets down")
+
+    await cache.get("sheet", ok)
+    clock.now = 20
+    assert await cache.get("sheet", broken) == "old"
+    await asyncio.sleep(0)
+    assert await cache.get("sheet", broken) == "old"
+    assert cache.stats.errors == 1
@@ -0,0 +1,98 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.clients.catalog import Catalog, Club
+from app.clients.google_sheets import get_sheets_client
+from app.clients.models import SheetRows
+
+DEPARTMENTS = SheetRows.from_values(
+    "all_departments",
+    [
+        ["Name", "address", "phone", "district"],
+        [
+            '"Chekhov Sport"',
+            "ул. Фидокор, 40/1\n",
+            "998 90 929-20-00",
+            "Мирабад + Яккасарай (рядом)",
+        ],
+    ],
+)
+GROUP_CLASSES = SheetRows.from_values(
+    "group_classes",
+    [
+        ["Name", "Time", "Chekhov Sport", "Fitness House"],
+        ["Йога", "08:00 ", "Да", "Да"],
+        ["Бокс", "", "Нет", "Да"],
+    ],
+)
+SHEETS = {"all_departments": DEPARTMENTS, "group_classes": GROUP_CLASSES}
+
+
+def test_catalog_maps_clubs_to_classes():
+    catalog = Catalog.build(SHEETS)
+    assert catalog.classes_by_club["Chekhov Sport"] == ("Йога",)
+    assert catalog.classes_by_club["Fitness House"] == ("Йога", "Бокс")
+    assert catalog.classes[0].time == "08:00"
+
+
+def test_catalog_cleans_contacts_and_joins_them_into_clubs_by_class():
+    catalog = Catalog.build(SHEETS)
+    club = Club(
+        "Chekhov Sport",
+        "ул. Фидокор, 40/1",
+        "998 90 929-20-00",
+        ("Мирабад", "Яккасарай"),
+    )
+    assert catalog.clubs["Chekhov Sport"] == club
+    assert catalog.clubs_by_class["йога"] == (club, Club("Fitness House"))
+    assert catalog.districts == ("Мирабад", "Яккасарай")
+
+
+def test_catalog_cities_come_from_addresses_outside_tashkent():
+    departments = SheetRows.from_values(
+        "all_departments",
+        [
+            ["Name", "address"],
+            ["Chekhov Sport", "г.Ташкент, Мирабадский район, ул. Фидокор, 40/1"],
+            ["Chekhov Samarkand", "г. Самарканд, ул. Регистан, 1"],
+            ["Chekhov Street", "ул. Фидокор, 40/1"],
+        ],
+    )
+    catalog = Catalog.build({"all_departments": departments})
+    assert catalog.cities == ("г. Самарканд",)
+
+
+@pytest.mark.asyncio
+async def test_catalog_is_rebuilt_only_when_sheets_change():
+    client = get_sheets_client()
+    load = AsyncMock(return_value=SHEETS)
+
+    with patch.object(client, "load_catalog", new=load):
+        first = await client.get_catalog()
+        assert await client.get_catalog() is first
+
+        load.return_value = {**SHEETS, "group_classes": SheetRows("group_classes")}
+        assert await client.get_catalog() is not first
+
+
+def test_diff_marks_club_and_its_classes_as_affected():
+    before = Catalog.build(SHEETS)
+    departments = SheetRows.from_values(
+        "all_departments",
+        [
+            ["Name", "address", "phone", "district"],
+            ["Chekhov Sport", "ул. Новая, 1", "998 90 929-20-00", "Мирабад"],
+        ],
+    )
+    after = Catalog.build({**SHEETS, "all_departments": departments})
+
+    changes = after.diff(before)
+
+    assert changes.clubs.changed == {"Chekhov Sport"}
+    assert not changes.classes
+    # адрес клуба есть в ответе «где проходит йога», бокса в клубе нет
+    assert changes.affects("Йога") and changes.affects("chekhov sport")
+    assert not changes.affects("Бокс")
+    # район Яккасарай пропал из перечня
+    assert changes.affects(None)
@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.clients.deepseek import DeepSeekClient
+
+
+@pytest.mark.asyncio
+async def test_in_flight_completions_are_limited():
+    client = DeepSeekClient(api_key="k", base_url="http://llm", max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def create(**kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        message = SimpleNamespace(content=" ответ ")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    with patch.object(client._client.chat.completions, "create", new=create):
+        answers = await asyncio.gather(
+            *(client.complete([{"role": "user", "content": "?"}]) for _ in range(6))
+        )
+
+    assert answers == ["ответ"] * 6
+    assert peak == 2
+    assert client.stats.requests == 6
+    assert client.stats.in_flight == 0
+    assert client.stats.queue_wait > 0
+    await client.aclose()
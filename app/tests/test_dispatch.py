@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.bot.dispatch import UserDispatcher
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_into_one_query():
+    calls = []
+
+    async def handler(user_id, text, context):
+        calls.append((user_id, text, context))
+
+    dispatcher = UserDispatcher(handler, window=0.05)
+    dispatcher.submit(1, "Привет", "m1")
+    dispatcher.submit(1, "где йога?", "m2")
+    await dispatcher.submit(1, "на Чиланзаре", "m3")
+
+    assert calls == [(1, "Привет\nгде йога?\nна Чиланзаре", "m3")]
+    assert dispatcher.stats.coalesced == 2
+    assert len(dispatcher) == 0
+
+
+@pytest.mark.asyncio
+async def test_new_message_cancels_generation_and_is_merged():
+    started = asyncio.Event()
+    calls = []
+    running = 0
+
+    async def handler(user_id, text, context):
+        nonlocal running
+        running += 1
+        assert running == 1
+        try:
+            calls.append(text)
+            started.set()
+            await asyncio.sleep(1)
+        finally:
+            running -= 1
+
+    dispatcher = UserDispatcher(handler, window=0.01)
+    first = dispatcher.submit(1, "йога")
+    await started.wait()
+    second = dispatcher.submit(1, "и пилатес")
+    second.cancel()
+    await asyncio.gather(first, second, return_exceptions=True)
+
+    assert first.cancelled()
+    assert dispatcher.stats.cancelled == 1
+    assert calls == ["йога"]
+
+    started.clear()
+    dispatcher.submit(1, "в Юнусабаде")
+    await started.wait()
+    # текст отменённой генерации не потерян
+    assert calls[-1] == "йога\nи пилатес\nв Юнусабаде"
+
+
+@pytest.mark.asyncio
+async def test_users_are_processed_independently():
+    calls = []
+
+    async def handler(user_id, text, context):
+        calls.append((user_id, text))
+
+    dispatcher = UserDispatcher(handler, window=0.01)
+    await asyncio.gather(dispatcher.submit(1, "йога"), dispatcher.submit(2, "бокс"))
+
+    assert sorted(calls) == [(1, "йога"), (2, "бокс")]
@@ -0,0 +1,55 @@
+from app.services.entity_index import EntityIndex, make_key, trigrams
+from app.services.intent_detector import TrainingIntent
+
+CLUBS = ["Chekhov Sport", "Chekhov Sport Premium", "Fitness House"]
+CLASSES = ["Йога", "Пилатес", "Функциональный тренинг"]
+
+
+def test_cyrillic_and_latin_spellings_share_a_key():
+    assert make_key("Чехов Спорт") == make_key("Chekhov  Sport") == "chekhov sport"
+
+
+def test_transliterated_club_name_is_resolved():
+    index = EntityIndex(CLUBS, CLASSES)
+    candidate = index.best("какие занятия в Чехов Спорт?", threshold=0.5)
+    assert candidate.entity == "Chekhov Sport"
+    assert candidate.intent == TrainingIntent.CLASSES_BY_CLUB
+    assert candidate.score == 1.0
+
+
+def test_typo_is_ranked_first():
+    index = EntityIndex(CLUBS, CLASSES)
+    candidates = index.search("где проходит пилотес")
+    assert candidates[0].entity == "Пилатес"
+    assert 0.5 <= candidates[0].score < 1.0
+
+
+def test_unrelated_text_is_below_threshold():
+    index = EntityIndex(CLUBS, CLASSES)
+    assert index.best("добрый день", threshold=0.5) is None
+
+
+def test_search_scores_only_posting_list_candidates_on_large_catalog():
+    clubs = [f"Клуб {i}" for i in range(5000)]
+    index = EntityIndex(clubs, CLASSES)
+
+    # кандидаты — только названия с общими триграммами, а не весь справочник
+    grams = trigrams(make_key("функциональный трениг"))
+    candidate_ids = set().union(*(index._postings.get(g, ()) for g in grams))
+    assert len(candidate_ids) == 1
+
+    candidates = index.search("функциональный трениг")
+    assert [c.entity for c in candidates] == ["Функциональный тренинг"]
+
+
+def test_intent_filter_applies_before_top_candidates():
+    # клубов с общими триграммами больше, чем кандидатов на точную оценку
+    clubs = [f"Йога клуб {i}" for i in range(50)]
+    index = EntityIndex(clubs, ["Йога"])
+
+    candidate = index.best(
+        "йога клуб", threshold=0.5, intent=TrainingIntent.CLUBS_BY_CLASS
+    )
+
+    assert candidate is not None
+    assert candidate.entity == "Йога"
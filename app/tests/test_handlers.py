@@ -0,0 +1,37 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.bot.handlers import answer_streaming
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_streaming_sends_first_tokens_then_edits_final_text():
+    sent = MagicMock(edit_text=AsyncMock())
+    message = MagicMock(answer=AsyncMock(return_value=sent))
+
+    with patch("app.bot.handlers.settings.STREAM_EDIT_INTERVAL", 60):
+        final = await answer_streaming(
+            message, _chunks("Йога ", "проходит ", "в Chekhov Sport.")
+        )
+
+    assert final == "Йога проходит в Chekhov Sport."
+    message.answer.assert_awaited_once_with("Йога")
+    # промежуточные правки подавлены интервалом, итоговая — одна
+    sent.edit_text.assert_awaited_once_with("Йога проходит в Chekhov Sport.")
+
+
+@pytest.mark.asyncio
+async def test_streaming_single_chunk_is_not_edited():
+    sent = MagicMock(edit_text=AsyncMock())
+    message = MagicMock(answer=AsyncMock(return_value=sent))
+
+    await answer_streaming(message, _chunks("Готово"))
+
+    message.answer.assert_awaited_once_with("Готово")
+    sent.edit_text.assert_not_awaited()
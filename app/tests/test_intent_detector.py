@@ -0,0 +1,83 @@
+from app.services.intent_detector import (
+    TrainingIntent,
+    TrainingIntentDetector,
+    get_intent_detector,
+    normalize_text,
+)
+
+CLUBS = ["Chekhov Sport", "Chekhov Sport Premium"]
+CLASSES = ["Йога", "Аэройога", "Пилатес"]
+
+
+def test_class_mention_detected_case_insensitive():
+    detector = TrainingIntentDetector(CLUBS, CLASSES)
+    result = detector.detect("Где проходит ЙОГА?")
+    assert result.intent == TrainingIntent.CLUBS_BY_CLASS
+    assert result.entity == "Йога"
+
+
+def test_longest_overlapping_match_wins():
+    detector = TrainingIntentDetector(CLUBS, CLASSES)
+
+    assert detector.detect("Где есть аэройога?").entity == "Аэройога"
+    result = detector.detect("какие занятия в chekhov  sport premium")
+    assert result.intent == TrainingIntent.CLASSES_BY_CLUB
+    assert result.entity == "Chekhov Sport Premium"
+
+
+def test_class_has_priority_over_club():
+    detector = TrainingIntentDetector(CLUBS, CLASSES)
+    result = detector.detect("Есть ли пилатес в Chekhov Sport?")
+    assert result.intent == TrainingIntent.CLUBS_BY_CLASS
+    assert result.entity == "Пилатес"
+
+
+def test_keywords_and_unknown():
+    detector = TrainingIntentDetector(CLUBS, CLASSES)
+    assert detector.detect("Какие есть тренировки?").intent == (
+        TrainingIntent.LIST_ALL_CLASSES
+    )
+    assert detector.detect("Привет").intent == TrainingIntent.UNKNOWN
+
+
+def test_keyword_confidence_drops_when_question_asks_more():
+    detector = TrainingIntentDetector(CLUBS, CLASSES)
+    assert detector.detect("Какие у вас есть тренировки?").confidence == 1.0
+
+    narrowed = detector.detect("Какие тренировки проходят утром?")
+    assert narrowed.intent == TrainingIntent.LIST_ALL_CLASSES
+    assert narrowed.confidence < 1.0
+
+
+def test_detector_is_built_once_per_catalog():
+    first = get_intent_detector(tuple(CLUBS), tuple(CLASSES))
+    assert get_intent_detector(tuple(CLUBS), tuple(CLASSES)) is first
+    assert get_intent_detector(tuple(CLUBS), ("Бокс",)) is not first
+
+
+class _CountingList(list):
+    """Список, считающий обращения по индексу: переходы автомата."""
+
+    reads = 0
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return super().__getitem__(index)
+
+
+def test_many_names_single_pass():
+    clubs = [f"Клуб номер {i}" for i in range(5000)]
+    classes = [f"Тренировка {i}" for i in range(5000)]
+    detector = TrainingIntentDetector(clubs, classes)
+    automaton = detector._automaton
+    automaton._goto = _CountingList(automaton._goto)
+    automaton._fail = _CountingList(automaton._fail)
+
+    text = "Что есть в клуб номер 4321?"
+    result = detector.detect(text)
+
+    assert result.entity == "Клуб номер 4321"
+    # число переходов зависит от длины текста, а не от числа названий:
+    # на символ — переход по goto и в сумме не больше одного отката по fail
+    steps = automaton._goto.reads + automaton._fail.reads
+    assert steps <= 3 * len(normalize_text(text))
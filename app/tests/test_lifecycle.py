@@ -0,0 +1,68 @@
+import asyncio
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from app.lifecycle import Lifecycle
+
+
+def test_import_needs_no_credentials(tmp_path):
+    # без обязательных настроек: при импорте они не должны читаться
+    env = dict(os.environ)
+    env.pop("TELEGRAM_BOT_TOKEN", None)
+    env.pop("GOOGLE_SERVICE_ACCOUNT_JSON", None)
+    env["PYTHONPATH"] = os.getcwd()
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.main"],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+class _Concurrency:
+    """Сколько прогревов идёт одновременно и максимум за всё время."""
+
+    running = 0
+    peak = 0
+
+    @classmethod
+    async def track(cls):
+        cls.running += 1
+        cls.peak = max(cls.peak, cls.running)
+        await asyncio.sleep(0.01)
+        cls.running -= 1
+
+
+class _Service:
+    async def warmup(self):
+        await _Concurrency.track()
+
+
+class _LLM:
+    async def warmup(self):
+        await _Concurrency.track()
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_warmup_runs_in_parallel_and_is_reported():
+    lifecycle = Lifecycle()
+    with patch("app.lifecycle.get_llm_service", return_value=_Service()), patch(
+        "app.lifecycle.get_deepseek_client", return_value=_LLM()
+    ), patch("app.lifecycle.settings.USE_MOCK_LLM", False):
+        await lifecycle.start()
+
+    report = lifecycle.report
+    assert set(report.warmup) == {"catalog", "llm"}
+    # оба прогрева начались раньше, чем закончился любой из них
+    assert _Concurrency.peak == 2
+    assert report.import_time > 0
+    await lifecycle.bot.session.close()
@@ -0,0 +1,82 @@
+import contextvars
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from app.logs import JsonFormatter, PreparedQueueHandler, RepeatFilter, SamplingFilter
+from app.metrics import TraceIdFilter, new_trace_id, span, trace_fields
+
+
+def _record(level: int = logging.INFO, msg: str = "msg", exc_info=None):
+    return logging.LogRecord("app", level, "", 0, msg, (), exc_info)
+
+
+def test_json_record_carries_request_fields_and_stages():
+    def handle() -> dict:
+        trace_id = new_trace_id(user_id=7)
+        trace_fields(intent="CLUBS_BY_CLASS", entity="Йога")
+        with span("intent"):
+            pass
+        record = _record()
+        TraceIdFilter().filter(record)
+        data = json.loads(JsonFormatter("worker-0").format(record))
+        assert data["trace_id"] == trace_id
+        return data
+
+    data = contextvars.Context().run(handle)
+
+    assert data["user_id"] == 7
+    assert data["intent"] == "CLUBS_BY_CLASS"
+    assert data["entity"] == "Йога"
+    assert data["process"] == "worker-0"
+    assert "intent" in data["stages"]
+
+
+def test_sampling_keeps_warnings_and_records_outside_requests():
+    sampling = SamplingFilter(0.0)
+
+    def in_request() -> tuple[bool, bool]:
+        new_trace_id()
+        return sampling.filter(_record()), sampling.filter(_record(logging.ERROR))
+
+    assert contextvars.Context().run(in_request) == (False, True)
+    assert contextvars.Context().run(sampling.filter, _record())
+
+
+def test_repeated_errors_are_collapsed(clock):
+    repeats = RepeatFilter(60, clock=clock)
+    storm = [_record(logging.ERROR, "Ошибка чтения Google Sheets") for _ in range(5)]
+
+    assert [repeats.filter(r) for r in storm] == [True, False, False, False, False]
+    assert repeats.filter(_record(logging.ERROR, "Другая ошибка"))
+
+    clock.now = 61
+    record = _record(logging.ERROR, "Ошибка чтения Google Sheets")
+    assert repeats.filter(record)
+    assert record.getMessage().endswith("(повторов пропущено: 4)")
+
+
+def test_queue_handler_writes_from_listener_thread():
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    listener = QueueListener(log_queue, output)
+    logger = logging.getLogger("app.tests.queue")
+    logger.propagate = False
+    logger.addHandler(PreparedQueueHandler(log_queue))
+    listener.start()
+    try:
+        try:
+            raise ValueError("нет листа")
+        except ValueError:
+            logger.exception("Ошибка чтения %s", "group_classes")
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+
+    text = stream.getvalue()
+    assert text.startswith("ERROR Ошибка чтения group_classes")
+    assert "ValueError: нет листа" in text
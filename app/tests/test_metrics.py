@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.metrics import (
+    Counter,
+    Histogram,
+    Registry,
+    TraceIdFilter,
+    metrics_handler,
+    new_trace_id,
+    span,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(
+        Histogram("stage_seconds", "Этапы", ("stage",), buckets=(0.1, 1))
+    )
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, stage="llm")
+
+    text = registry.render()
+
+    assert 'stage_seconds_bucket{stage="llm",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="llm",le="1"} 3' in text
+    assert 'stage_seconds_bucket{stage="llm",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{stage="llm"} 4' in text
+    assert "# TYPE stage_seconds histogram" in text
+
+
+def test_span_and_counters():
+    from app.metrics import STAGE_SECONDS
+
+    before = STAGE_SECONDS.count(stage="test_stage")
+    with span("test_stage"):
+        pass
+    assert STAGE_SECONDS.count(stage="test_stage") == before + 1
+
+    counter = Counter("answers_total", "Ответы", ("source",))
+    counter.inc(source="cache")
+    counter.inc(source="cache")
+    assert counter.value(source="cache") == 2
+
+
+def test_trace_id_is_added_to_log_records():
+    trace_id = new_trace_id()
+    record = logging.LogRecord("app", logging.INFO, "", 0, "msg", (), None)
+    TraceIdFilter().filter(record)
+    assert record.trace_id == trace_id
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    with span("endpoint_test"):
+        pass
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        response = await client.get("/metrics")
+        text = await response.text()
+    finally:
+        await client.close()
+
+    assert response.status == 200
+    assert 'chekhov_stage_seconds_count{stage="endpoint_test"} 1' in text
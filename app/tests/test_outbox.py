@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Chat, Message
+
+from app.bot.outbox import Outbox, Priority, TokenBucket, split_text
+from app.metrics import OUTBOX_SECONDS
+from bench.fakes import FakeTelegramServer
+
+
+def test_split_text_prefers_paragraph_boundaries():
+    text = "а" * 30 + "\n\n" + "б" * 30 + " " + "в" * 50
+
+    chunks = split_text(text, limit=40)
+
+    assert chunks == ["а" * 30, "б" * 30, "в" * 40, "в" * 10]
+
+
+def test_token_bucket_allows_burst_then_rate(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2, clock=clock)
+
+    bucket.take()
+    bucket.take()
+    assert bucket.delay() == pytest.approx(1.0)
+
+    clock.now = 0.5
+    assert bucket.delay() == pytest.approx(0.5)
+    bucket.block(3)
+    assert bucket.delay() == pytest.approx(3.0)
+
+
+@pytest.mark.asyncio
+async def test_long_answer_is_chunked_and_retried_after_429():
+    server = FakeTelegramServer(latency=0, retry_after=1)
+    url = await server.start()
+    bot = Bot("42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+    message = Message.model_validate(
+        {
+            "message_id": 1,
+            "date": 0,
+            "chat": Chat(id=7, type="private"),
+            "text": "?",
+        },
+        context={"bot": bot},
+    )
+    outbox = Outbox(workers=2, global_rate=100, chat_rate=100, chat_burst=10)
+    observed = OUTBOX_SECONDS.count(priority="reply")
+    server.flood = 1
+    try:
+        await outbox.answer(message, "слово " * 1000)
+        await outbox.close()
+    finally:
+        await bot.session.close()
+        await server.close()
+
+    texts = [m.text for m in server.sent if m.method == "sendMessage"]
+    assert all(len(t) <= 4096 for t in texts)
+    assert " ".join(texts) == ("слово " * 1000).strip()
+    # первый запрос получил 429 и был повторён
+    assert server.requests == len(texts) + 1
+    assert outbox.stats.retried == 1
+    assert outbox.stats.queued == 0
+    assert OUTBOX_SECONDS.count(priority="reply") == observed + 2
+
+
+@pytest.mark.asyncio
+async def test_429_pauses_sends_to_every_chat():
+    outbox = Outbox(workers=1, global_rate=100, chat_rate=100, chat_burst=10)
+
+    async def flooded():
+        raise TelegramRetryAfter(
+            method=None, message="Too Many Requests", retry_after=30
+        )
+
+    sending = asyncio.create_task(outbox.send(1, flooded))
+    while not outbox.stats.retried:
+        await asyncio.sleep(0)
+
+    # ждёт не только чат, получивший 429, но и весь бот
+    assert outbox._global.delay() > 29
+    sending.cancel()
+    await outbox.close(timeout=0)
+
+
+@pytest.mark.asyncio
+async def test_replies_overtake_progress_edits_and_edits_are_dropped():
+    order = []
+    outbox = Outbox(workers=1, global_rate=1000, chat_rate=1000, max_pending=1)
+
+    async def call(name: str) -> str:
+        order.append(name)
+        return name
+
+    # единственный воркер занят, пока в очереди копятся запросы
+    gate = asyncio.Event()
+
+    async def blocker() -> None:
+        await gate.wait()
+
+    busy = asyncio.create_task(outbox.send(1, blocker))
+    await asyncio.sleep(0)
+    edit = asyncio.create_task(outbox.send(2, lambda: call("edit"), Priority.PROGRESS))
+    await asyncio.sleep(0)
+    dropped = asyncio.create_task(
+        outbox.send(3, lambda: call("late edit"), Priority.PROGRESS)
+    )
+    reply = asyncio.create_task(outbox.send(4, lambda: call("reply")))
+    await asyncio.sleep(0)
+    gate.set()
+
+    await asyncio.gather(busy, edit, reply)
+    assert await dropped is None
+    assert order == ["reply", "edit"]
+    assert outbox.stats.dropped == 1
+    await outbox.close()
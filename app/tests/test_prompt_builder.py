@@ -0,0 +1,45 @@
+from app.services.intent_detector import TrainingIntent
+from app.services.prompt_builder import FactGroup, PromptBuilder, estimate_tokens
+
+
+def _build(club_count: int, history=(("user", "клуб на Юнусабаде"),)):
+    builder = PromptBuilder(budget=800)
+    clubs = [f"Chekhov Sport {i}" for i in range(club_count)] + ["Юнусабад Fitness"]
+    return builder.build(
+        query="клуб на Юнусабаде",
+        state="NEED_CLUB",
+        intent=TrainingIntent.UNKNOWN,
+        history=history,
+        fact_groups=[
+            FactGroup("Города", ["г. Самарканд", "г. Бухара"]),
+            FactGroup("Все клубы", clubs, ranked=True),
+        ],
+    )
+
+
+def test_prompt_size_does_not_grow_with_catalog():
+    small = _build(10)
+    large = _build(5000)
+
+    assert small.facts_used == small.facts_total
+    assert large.tokens <= 800
+    assert large.facts_used < large.facts_total
+    # самый релевантный клуб попадает в промпт в первую очередь
+    assert "Юнусабад Fitness" in large.facts_block
+    assert "г. Бухара" in large.facts_block
+
+
+def test_old_history_is_trimmed_and_dropped_first():
+    history = [("user", "очень длинное сообщение " * 40)] * 5 + [
+        ("assistant", "ответ"),
+        ("user", "клуб на Юнусабаде"),
+    ]
+    built = _build(5000, history=history)
+
+    assert built.history_used < built.history_total
+    assert "User: клуб на Юнусабаде" in built.text
+    assert built.tokens <= 800
+
+
+def test_estimate_tokens_counts_cyrillic_denser_than_latin():
+    assert estimate_tokens("тренировка") > estimate_tokens("training")
@@ -0,0 +1,191 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.clients.resilience import (
+    BreakerState,
+    CircuitBreaker,
+    HedgeStats,
+    hedged,
+    hedged_stream,
+)
+from app.services.answer_service import LLMService
+
+
+def test_breaker_opens_after_failures_and_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.allow()
+    # пока идёт пробный запрос, остальные не пропускаются
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == BreakerState.CLOSED
+    assert breaker.stats.opened == 1
+    assert breaker.stats.rejected == 2
+
+
+def test_released_or_hung_trial_lets_next_trial_through(clock):
+    breaker = CircuitBreaker(
+        failure_threshold=1, reset_timeout=10, clock=clock, trial_timeout=5
+    )
+    breaker.record_failure()
+
+    clock.now = 10
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # пробный запрос не вернулся за trial_timeout
+    clock.now = 15
+    assert breaker.allow()
+    assert breaker.state == BreakerState.HALF_OPEN
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_when_primary_is_slow():
+    delays = iter([1.0, 0.01])
+    stats = HedgeStats()
+
+    async def call() -> float:
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert await hedged(call, 0.02, stats) == 0.01
+    assert await hedged(lambda: asyncio.sleep(0, "быстро"), 0.02, stats) == "быстро"
+    assert (stats.requests, stats.hedged, stats.wins, stats.win_rate) == (2, 1, 1, 1.0)
+
+
+@pytest.mark.asyncio
+async def test_hedged_stream_reads_the_stream_that_answers_first():
+    delays = iter([1.0, 0.01])
+    started: list[str] = []
+    closed: list[str] = []
+
+    async def stream():
+        name = "дубль" if started else "первый"
+        started.append(name)
+        try:
+            await asyncio.sleep(next(delays))
+            yield name
+            yield "!"
+        finally:
+            closed.append(name)
+
+    stats = HedgeStats()
+    chunks = [c async for c in hedged_stream(stream, 0.02, stats)]
+
+    assert chunks == ["дубль", "!"]
+    assert sorted(closed) == ["дубль", "первый"]
+    assert stats.wins == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_timeout_and_open_breaker_fall_back_to_catalog_data(mock_catalog):
+    service = LLMService()
+    service.templates.min_confidence = {}
+    service.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    async def slow(messages):
+        await asyncio.sleep(1)
+        return "поздно"
+
+    complete = AsyncMock(side_effect=slow)
+    with patch.object(service.client, "complete", new=complete), patch(
+        "app.services.answer_service.settings.REPLY_DEADLINE", 0.05
+    ):
+        first = await service.generate_response(1, "Где проходит йога?")
+        second = await service.generate_response(2, "Где проходит йога?")
+
+    # ответ собран из данных справочника, второй запрос в LLM не уходил
+    assert "ул. Фидокор, 40/1, тел. 998 90 929-20-00" in first
+    assert second == first
+    assert complete.await_count == 1
+    assert service.breaker.state == BreakerState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_does_not_keep_breaker_half_open(mock_catalog):
+    service = LLMService()
+    service.templates.min_confidence = {}
+    service.breaker = CircuitBreaker(
+        failure_threshold=1, reset_timeout=0, trial_timeout=60
+    )
+    service.breaker.record_failure()
+    started = asyncio.Event()
+
+    async def hang(messages):
+        started.set()
+        await asyncio.sleep(10)
+
+    with patch.object(service.client, "complete", new=AsyncMock(side_effect=hang)):
+        task = asyncio.create_task(service.generate_response(1, "Где проходит йога?"))
+        await asyncio.wait_for(started.wait(), 1)
+        # пришло новое сообщение — генерация отменена
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert service.breaker.state == BreakerState.HALF_OPEN
+    assert service.breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_hung_sheets_load_does_not_outlive_reply_deadline(mock_catalog):
+    service = LLMService()
+    service.templates.min_confidence = {}
+    # справочник уже загружался раньше
+    await service._load_catalog()
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    mock_catalog.side_effect = hang
+    complete = AsyncMock(return_value="не должно понадобиться")
+    with patch.object(service.client, "complete", new=complete), patch(
+        "app.services.answer_service.settings.REPLY_DEADLINE", 0.05
+    ):
+        answer = await asyncio.wait_for(
+            service.generate_response(2, "Где проходит йога?"), 1
+        )
+
+    assert "ул. Фидокор, 40/1, тел. 998 90 929-20-00" in answer
+    assert complete.await_count == 0
+    assert service.breaker.state == BreakerState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_deadline_spent_on_sheets_does_not_trip_llm_breaker(
+    mock_catalog, catalog_sheets
+):
+    service = LLMService()
+    service.templates.min_confidence = {}
+    service.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    async def slow_sheets():
+        await asyncio.sleep(0.15)
+        return catalog_sheets
+
+    async def slow(messages):
+        await asyncio.sleep(1)
+        return "поздно"
+
+    mock_catalog.side_effect = slow_sheets
+    with patch.object(
+        service.client, "complete", new=AsyncMock(side_effect=slow)
+    ), patch("app.services.answer_service.settings.REPLY_DEADLINE", 0.2):
+        answer = await service.generate_response(1, "Где проходит йога?")
+
+    # у LLM осталась четверть срока — это не её сбой
+    assert "ул. Фидокор, 40/1" in answer
+    assert service.breaker.state == BreakerState.CLOSED
+    assert service.breaker.allow()
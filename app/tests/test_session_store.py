@@ -0,0 +1,103 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services.session_store import (
+    HISTORY_LIMIT,
+    InMemorySessionStore,
+    Session,
+    SQLiteSessionStore,
+)
+
+
+def test_history_keeps_last_messages():
+    session = Session(1)
+    for i in range(HISTORY_LIMIT + 3):
+        session.add_message("user", str(i))
+
+    assert len(session.history) == HISTORY_LIMIT
+    assert session.history[0] == ("user", "3")
+
+
+@pytest.mark.asyncio
+async def test_memory_store_evicts_least_recently_used():
+    store = InMemorySessionStore(max_sessions=2, ttl=100)
+    await store.get(1)
+    await store.get(2)
+    await store.get(1)
+    await store.get(3)
+
+    assert len(store) == 2
+    assert store.stats.evictions == 1
+    assert (await store.get(1)).user_id == 1
+    assert store.stats.loaded == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_store_expires_idle_sessions(clock):
+    store = InMemorySessionStore(max_sessions=10, ttl=60, clock=clock)
+    (await store.get(1)).add_message("user", "привет")
+
+    clock.now = 61
+    assert not (await store.get(1)).history
+    assert store.stats.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_survives_restart(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SQLiteSessionStore(path, ttl=3600)
+    session = await store.get(42)
+    session.add_message("user", "Где йога?")
+    session.club = "Chekhov Sport"
+    await store.save(session)
+
+    restored = await SQLiteSessionStore(path, ttl=3600).get(42)
+
+    assert list(restored.history) == [("user", "Где йога?")]
+    assert restored.club == "Chekhov Sport"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_purges_expired_sessions_while_running(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), 3600, purge_every=2)
+    store._conn.execute(
+        "INSERT INTO sessions VALUES (1, ?, ?)",
+        (Session(1).to_json(), time.time() - 7200),
+    )
+
+    await store.get(2)
+    assert len(store) == 2
+    await store.get(3)
+
+    assert len(store) == 2
+    assert store.stats.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_waits_for_lock_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SQLiteSessionStore(path, ttl=3600)
+    # соседний процесс держит блокировку записи
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.2, other.execute, ("COMMIT",)).start()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticking = asyncio.create_task(ticker())
+    await store.save(Session(1))
+    ticking.cancel()
+    other.close()
+
+    # пока запись ждала блокировку, цикл событий продолжал работать
+    assert ticks > 5
+    assert len(store) == 1
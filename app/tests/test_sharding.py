@@ -0,0 +1,146 @@
+import asyncio
+import queue
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiogram.types import Update
+
+from app.bot.sharding import (
+    ShardingMiddleware,
+    ShardRouter,
+    consume,
+    shard_for,
+    stop_workers,
+)
+from app.bot.webhook import BUSY_ANSWER
+
+
+def _update(update_id: int, user_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1760000000,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+                "text": f"сообщение {update_id}",
+            },
+        }
+    )
+
+
+def test_shard_is_stable_and_spreads_users():
+    assert shard_for(1001, 4) == shard_for(1001, 4)
+    assert {shard_for(user_id, 4) for user_id in range(100)} == {0, 1, 2, 3}
+    assert shard_for(None, 4) == 0
+
+
+@pytest.mark.asyncio
+async def test_user_updates_go_to_one_worker_in_order():
+    queues = [queue.Queue() for _ in range(3)]
+    router = ShardRouter(queues)
+    for update_id in range(1, 10):
+        await router.route(_update(update_id, user_id=100 + update_id % 2))
+
+    fed = []
+
+    async def feed(data):
+        fed.append(Update.model_validate_json(data))
+
+    shard = queues[shard_for(101, 3)]
+    shard.put(None)
+    await consume(shard, feed, limit=4)
+
+    user_updates = [u.update_id for u in fed if u.message.from_user.id == 101]
+    assert user_updates == [1, 3, 5, 7, 9]
+    assert sum(router.stats.routed.values()) == 9
+
+
+@pytest.mark.asyncio
+async def test_full_worker_queue_rejects_update():
+    router = ShardRouter([queue.Queue(maxsize=1)])
+    await router.route(_update(1, user_id=7))
+
+    with pytest.raises(queue.Full):
+        await router.route(_update(2, user_id=7))
+
+    assert router.stats.routed[0] == 1
+    assert router.stats.rejected[0] == 1
+
+
+@pytest.mark.asyncio
+async def test_busy_reply_goes_through_outbox():
+    router = ShardRouter([queue.Queue(maxsize=1)])
+    await router.route(_update(1, user_id=7))
+    outbox = AsyncMock()
+
+    with patch("app.bot.sharding.get_outbox", return_value=outbox):
+        await ShardingMiddleware(router)(AsyncMock(), _update(2, user_id=7), {})
+
+    message, text = outbox.answer.await_args.args
+    assert message.chat.id == 7
+    assert text == BUSY_ANSWER
+
+
+@pytest.mark.asyncio
+async def test_saturated_worker_stops_reading_and_router_rejects():
+    worker_queue = queue.Queue(maxsize=2)
+    router = ShardRouter([worker_queue])
+    release = asyncio.Event()
+    fed = []
+
+    async def feed(data):
+        fed.append(data)
+        await release.wait()
+
+    worker = asyncio.create_task(consume(worker_queue, feed, limit=1))
+    await router.route(_update(1, user_id=7))
+    while not fed:
+        await asyncio.sleep(0.01)
+
+    # процесс занят первым обновлением и больше не читает очередь
+    await router.route(_update(2, user_id=7))
+    await router.route(_update(3, user_id=7))
+    with pytest.raises(queue.Full):
+        await router.route(_update(4, user_id=7))
+
+    release.set()
+    await asyncio.to_thread(worker_queue.put, None)
+    await worker
+
+    assert len(fed) == 3
+    assert router.stats.rejected[0] == 1
+
+
+class _HungProcess:
+    """Процесс, который не завершается сам."""
+
+    name = "hung"
+
+    def __init__(self) -> None:
+        self.terminated = False
+
+    def join(self, timeout: float) -> None:
+        time.sleep(timeout)
+
+    def is_alive(self) -> bool:
+        return not self.terminated
+
+    def terminate(self) -> None:
+        self.terminated = True
+
+
+def test_stop_workers_shares_one_deadline():
+    queues = [queue.Queue(maxsize=1) for _ in range(3)]
+    queues[0].put("занята")
+    processes = [_HungProcess() for _ in queues]
+
+    started = time.monotonic()
+    stop_workers(queues, processes, timeout=0.2)
+
+    # три зависших процесса ждут общий срок, а не по сроку на каждый
+    assert time.monotonic() - started < 0.5
+    assert all(p.terminated for p in processes)
+    assert queues[1].get_nowait() is None
@@ -1,10 +1,233 @@
+import asyncio
+import dataclasses
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 
-from app.clients.google_sheets import sheets_client
+from app.clients.catalog import CATALOG_SHEETS
+from app.clients.google_sheets import GoogleSheetsClient, get_sheets_client
+from app.clients.models import SheetRows
+from app.clients.snapshot import CatalogSnapshot
+from app.config import settings
+from bench.fakes import FakeSheetsServer
+
+
+@pytest.mark.asyncio
+async def test_find_department_over_http(tmp_path):
+    # настоящий googleapiclient против локального Sheets API из стенда бенчмарка
+    server = FakeSheetsServer(clubs=3, classes=5, latency=0)
+    url = await server.start()
+    try:
+        with patch(
+            "app.clients.google_sheets.settings.SHEETS_SNAPSHOT_PATH",
+            str(tmp_path / "snapshot.sqlite3"),
+        ):
+            client = GoogleSheetsClient("bench", api_endpoint=url)
+        result = await client.find_department("Расскажите про Chekhov Sport 2")
+    finally:
+        await server.close()
+
+    assert result["address"] == "г.Ташкент, ул. Спортивная, 2"
+    assert server.requests == 1
+
+
+class _SlowRequest:
+    """Имитация HttpRequest googleapiclient с блокирующим execute().
+    Считает, сколько execute() выполняется одновременно."""
+
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def __init__(self, values: list[list[str]], delay: float) -> None:
+        self.values = values
+        self.delay = delay
+
+    def execute(self, http=None) -> dict:
+        cls = type(self)
+        with cls.lock:
+            cls.running += 1
+            cls.peak = max(cls.peak, cls.running)
+        time.sleep(self.delay)
+        with cls.lock:
+            cls.running -= 1
+        return {"valueRanges": [{"values": self.values}]}
+
+
+@pytest.mark.asyncio
+async def test_fetch_sheet_does_not_block_event_loop():
+    sheets_client = get_sheets_client()
+    values = [["Name", "address"], ["Chekhov Sport", "г.Ташкент"]]
+    sheet = MagicMock()
+    sheet.values.return_value.batchGet.side_effect = lambda **_: _SlowRequest(
+        values, 0.2
+    )
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    with patch.object(sheets_client, "sheet", sheet):
+        ticking = asyncio.create_task(ticker())
+        results = await asyncio.gather(
+            *(sheets_client._fetch_sheets(("all_departments",)) for _ in range(3))
+        )
+        ticking.cancel()
+
+    assert all(
+        r["all_departments"].rows
+        == ({"Name": "Chekhov Sport", "address": "г.Ташкент"},)
+        for r in results
+    )
+    # запросы выполнялись в потоках одновременно, а цикл событий не стоял
+    assert _SlowRequest.peak == 3
+    assert ticks > 5
+
+
+@pytest.mark.asyncio
+async def test_load_catalog_fetches_all_sheets_in_one_batch_get():
+    sheets_client = get_sheets_client()
+    value_ranges = [
+        {"values": [["Name", "phone"], ["Chekhov Sport", "998 90 929-20-00"]]},
+        {"values": [["Name", "Chekhov Sport"], ["Йога", "Да"]]},
+    ]
+    request = MagicMock()
+    request.execute.return_value = {"valueRanges": value_ranges}
+    sheet = MagicMock()
+    sheet.values.return_value.batchGet.return_value = request
+
+    with patch.object(sheets_client, "sheet", sheet):
+        sheets_client.cache.invalidate()
+        sheets = await sheets_client.load_catalog()
+        sheets_client.cache.invalidate()
+
+    sheet.values.return_value.batchGet.assert_called_once_with(
+        spreadsheetId=sheets_client.spreadsheet_id,
+        ranges=["all_departments", "group_classes"],
+    )
+    assert sheets["all_departments"].rows[0]["phone"] == "998 90 929-20-00"
+    assert sheets["group_classes"].headers == ("Name", "Chekhov Sport")
+
+
+@pytest.mark.asyncio
+async def test_refresh_downloads_sheets_only_when_version_changes(tmp_path):
+    server = FakeSheetsServer(clubs=3, classes=5, latency=0)
+    url = await server.start()
+    try:
+        with patch.multiple(
+            "app.clients.google_sheets.settings",
+            SHEETS_SNAPSHOT_PATH=str(tmp_path / "snapshot.sqlite3"),
+            SHEETS_CACHE_TTL=0,
+            SHEETS_CACHE_STALE_TTL=0,
+        ):
+            client = GoogleSheetsClient("bench", api_endpoint=url)
+        first = await client.get_catalog()
+        client.snapshot.touch(CATALOG_SHEETS, fetched_at=0.0)
+        # версия таблицы та же — листы не скачиваются, справочник тот же,
+        # а снимок отмечается как проверенный
+        assert await client.get_catalog() is first
+        assert server.requests == 1
+        assert all(s.age < 60 for s in client.snapshot.load().values())
+
+        departments = [row[:] for row in server.catalog["all_departments"]]
+        departments[1][2] = "998 90 000-00-01"
+        server.update("all_departments", departments)
+        updated = await client.get_catalog()
+    finally:
+        await server.close()
+
+    assert server.requests == 2
+    assert server.probes == 3
+    assert updated.clubs["Chekhov Sport 1"].phone == "998 90 000-00-01"
+    changes = updated.diff(first)
+    assert changes.clubs.changed == {"Chekhov Sport 1"}
+    assert not changes.lists_changed
 
 
 @pytest.mark.asyncio
-async def test_find_department_live():
-    result = await sheets_client.find_department("Chekhov Sport")
-    print(result)
-    assert result is not None
+async def test_snapshot_is_rewritten_only_when_rows_change(tmp_path):
+    server = FakeSheetsServer(clubs=3, classes=5, latency=0)
+    url = await server.start()
+    try:
+        with patch.multiple(
+            "app.clients.google_sheets.settings",
+            SHEETS_SNAPSHOT_PATH=str(tmp_path / "snapshot.sqlite3"),
+            SHEETS_CACHE_TTL=0,
+            SHEETS_CACHE_STALE_TTL=0,
+        ):
+            client = GoogleSheetsClient("bench", api_endpoint=url)
+        # без проверки версии листы скачиваются при каждом обновлении
+        client._probe_enabled = False
+        snapshot = client.snapshot
+        with patch.object(snapshot, "save", wraps=snapshot.save) as save, patch.object(
+            snapshot, "touch", wraps=snapshot.touch
+        ) as touch:
+            await client.get_catalog()
+            await client.get_catalog()
+            assert (save.call_count, touch.call_count) == (1, 1)
+
+            departments = [row[:] for row in server.catalog["all_departments"]]
+            departments[1][2] = "998 90 000-00-01"
+            server.update("all_departments", departments)
+            await client.get_catalog()
+    finally:
+        await server.close()
+
+    assert server.requests == 3
+    assert save.call_count == 2
+    saved = snapshot.load()["all_departments"]
+    assert saved.rows[0]["phone"] == "998 90 000-00-01"
+
+
+@pytest.mark.asyncio
+async def test_old_snapshot_is_served_without_waiting_for_sheets(catalog_sheets):
+    day_ago = time.time() - 24 * 3600
+    CatalogSnapshot(settings.SHEETS_SNAPSHOT_PATH).save(
+        {
+            n: dataclasses.replace(s, fetched_at=day_ago)
+            for n, s in catalog_sheets.items()
+        }
+    )
+    client = get_sheets_client()
+
+    with patch.object(
+        client, "_refresh_sheets", new=AsyncMock(return_value=catalog_sheets)
+    ):
+        catalog = await client.get_catalog()
+        await asyncio.sleep(0)
+
+    assert "Chekhov Sport" in catalog.clubs
+    # устаревший снимок отдан сразу, обновление ушло в фон
+    assert client.cache.stats.stale_hits == 1
+    assert client.cache.stats.misses == 0
+
+
+@pytest.mark.asyncio
+async def test_edit_of_row_with_duplicate_name_is_not_lost():
+    client = get_sheets_client()
+    client._probe_enabled = False
+    header = ["Name", "address"]
+    before = {
+        "all_departments": SheetRows.from_values(
+            "all_departments", [header, ["", "ул. Первая"], ["", "ул. Вторая"]]
+        )
+    }
+    after = {
+        "all_departments": SheetRows.from_values(
+            "all_departments", [header, ["", "ул. Третья"], ["", "ул. Вторая"]]
+        )
+    }
+    names = ("all_departments",)
+    client.cache.prime(names, before)
+
+    with patch.object(client, "_fetch_sheets", new=AsyncMock(return_value=after)):
+        refreshed = await client._refresh_sheets(names)
+
+    # по колонке Name строки неразличимы, но изменение всё равно замечено
+    assert not after["all_departments"].diff(before["all_departments"])
+    assert refreshed is after
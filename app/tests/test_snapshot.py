@@ -0,0 +1,60 @@
+from app.clients.models import SheetRows
+from app.clients.snapshot import CatalogSnapshot
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = CatalogSnapshot(str(tmp_path / "catalog.sqlite3"))
+    departments = SheetRows(
+        name="all_departments",
+        headers=("Name", "phone"),
+        rows=({"Name": "Chekhov Sport", "phone": "998 90 929-20-00"},),
+        fetched_at=1000.0,
+    )
+
+    snapshot.save({"all_departments": departments})
+
+    assert snapshot.load() == {"all_departments": departments}
+
+
+def test_snapshot_merges_sheets_and_leaves_no_temp_files(tmp_path):
+    snapshot = CatalogSnapshot(str(tmp_path / "catalog.sqlite3"))
+
+    snapshot.save({"all_departments": SheetRows(name="all_departments")})
+    snapshot.save({"group_classes": SheetRows(name="group_classes")})
+
+    assert set(snapshot.load()) == {"all_departments", "group_classes"}
+    assert [p.name for p in tmp_path.iterdir()] == ["catalog.sqlite3"]
+
+
+def test_missing_snapshot_is_empty(tmp_path):
+    assert CatalogSnapshot(str(tmp_path / "nope.sqlite3")).load() == {}
+
+
+def test_corrupt_snapshot_is_replaced_on_save(tmp_path):
+    path = tmp_path / "catalog.sqlite3"
+    path.write_bytes(b"not a database")
+    snapshot = CatalogSnapshot(str(path))
+
+    snapshot.save({"group_classes": SheetRows(name="group_classes")})
+
+    assert set(snapshot.load()) == {"group_classes"}
+
+
+def test_touch_rewrites_snapshot_atomically(tmp_path):
+    snapshot = CatalogSnapshot(str(tmp_path / "catalog.sqlite3"))
+    snapshot.save(
+        {
+            "all_departments": SheetRows(name="all_departments", fetched_at=1.0),
+            "group_classes": SheetRows(name="group_classes", fetched_at=1.0),
+        }
+    )
+    before = (tmp_path / "catalog.sqlite3").stat().st_ino
+
+    snapshot.touch(["group_classes", "missing"], fetched_at=5.0)
+
+    saved = snapshot.load()
+    assert saved["group_classes"].fetched_at == 5.0
+    assert saved["all_departments"].fetched_at == 1.0
+    # файл подменён целиком, а не изменён на месте
+    assert (tmp_path / "catalog.sqlite3").stat().st_ino != before
+    assert [p.name for p in tmp_path.iterdir()] == ["catalog.sqlite3"]
@@ -0,0 +1,109 @@
+import asyncio
+import queue
+
+import pytest
+from aiogram import Bot
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.bot.webhook import BUSY_ANSWER, WebhookServer
+
+
+def _update(update_id: int, text: str = "Где проходит йога?") -> dict:
+    # обновление в том виде, в каком его присылает Telegram
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1760000000,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+async def _client(server: WebhookServer) -> TestClient:
+    client = TestClient(TestServer(server.make_app()))
+    await client.start_server()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_update_is_acknowledged_and_processed():
+    received = []
+    done = asyncio.Event()
+
+    async def sink(update):
+        received.append(update)
+        done.set()
+
+    server = WebhookServer(Bot("42:TEST"), sink, workers=2, queue_size=10)
+    client = await _client(server)
+    try:
+        response = await client.post("/webhook", json=_update(1))
+        assert response.status == 200
+        await asyncio.wait_for(done.wait(), 1)
+    finally:
+        await client.close()
+
+    assert received[0].message.text == "Где проходит йога?"
+    assert server.stats.processed == 1
+
+
+@pytest.mark.asyncio
+async def test_saturated_queue_replies_busy():
+    release = asyncio.Event()
+
+    async def sink(update):
+        await release.wait()
+
+    server = WebhookServer(Bot("42:TEST"), sink, workers=1, queue_size=1)
+    client = await _client(server)
+    try:
+        # первый — в обработке, второй — в очереди, третий — лишний
+        for update_id in (1, 2):
+            await client.post("/webhook", json=_update(update_id))
+            await asyncio.sleep(0)
+        response = await client.post("/webhook", json=_update(3))
+        body = await response.json()
+        release.set()
+    finally:
+        await client.close()
+
+    assert body == {"method": "sendMessage", "chat_id": 42, "text": BUSY_ANSWER}
+    assert server.stats.rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_full_sink_queue_replies_busy_without_own_queue():
+    worker_queue = queue.Queue(maxsize=1)
+
+    async def sink(update):
+        worker_queue.put_nowait(update.update_id)
+
+    server = WebhookServer(Bot("42:TEST"), sink, workers=0, queue_size=1)
+    client = await _client(server)
+    try:
+        first = await (await client.post("/webhook", json=_update(1))).json()
+        second = await (await client.post("/webhook", json=_update(2))).json()
+    finally:
+        await client.close()
+
+    assert first == {}
+    assert second == {"method": "sendMessage", "chat_id": 42, "text": BUSY_ANSWER}
+    assert server.stats.accepted == 1
+    assert server.stats.rejected == 1
+
+
+@pytest.mark.asyncio
+async def test_wrong_secret_is_rejected():
+    server = WebhookServer(
+        Bot("42:TEST"), sink=None, workers=1, queue_size=1, secret_token="s3cret"
+    )
+    client = await _client(server)
+    try:
+        response = await client.post("/webhook", json=_update(1))
+    finally:
+        await client.close()
+
+    assert response.status == 401
@@ -0,0 +1,52 @@
+"""Нагрузочный прогон бота на локальном стенде.
+
+python -m bench --users 100 --messages 5
+python -m bench --compare bench/results/<прошлый прогон>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from dataclasses import fields
+
+from bench.driver import BenchConfig, run_benchmark
+from bench.report import compare, format_summary
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    for f in fields(BenchConfig):
+        flag = "--" + f.name.replace("_", "-")
+        if f.type is bool or f.type == "bool":
+            parser.add_argument(
+                flag, action=argparse.BooleanOptionalAction, default=f.default
+            )
+        else:
+            parser.add_argument(flag, type=type(f.default), default=f.default)
+    parser.add_argument("--output", help="куда сохранить результат (JSON)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    config = BenchConfig(**{f.name: getattr(args, f.name) for f in fields(BenchConfig)})
+    result = asyncio.run(run_benchmark(config))
+
+    output = args.output or os.path.join(
+        "bench", "results", time.strftime("bench-%Y%m%d-%H%M%S.json")
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(format_summary(result))
+    if args.compare:
+        print(compare(args.compare, result))
+    print(f"Результат сохранён в {output}")
+
+
+if __name__ == "__main__":
+    main()
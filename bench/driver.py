@@ -0,0 +1,203 @@
+import asyncio
+import functools
+import os
+import random
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator
+
+from bench.fakes import FakeLLMServer, FakeSheetsServer, FakeTelegramServer
+from bench.report import StageTimings
+
+# вопросы симулируемых пользователей: данные из справочника (шаблоны и кэш)
+# и свободные вопросы, которые всегда уходят в LLM
+QUERIES = [
+    "Где проходит йога?",
+    "Какие тренировки есть в Chekhov Sport 3?",
+    "Какие есть групповые тренировки?",
+    "Где можно заниматься боксом?",
+    "Сколько стоит абонемент на год?",
+    "Есть ли клуб рядом с Юнусабадом?",
+    "А утром там можно заниматься?",
+    "Хочу похудеть, что посоветуете?",
+]
+
+
+@dataclass
+class BenchConfig:
+    users: int = 50
+    messages: int = 5
+    think_time: float = 0.5
+    clubs: int = 20
+    classes: int = 30
+    sheets_latency: float = 0.15
+    llm_first_token_latency: float = 0.5
+    llm_token_delay: float = 0.02
+    llm_tokens: int = 40
+    telegram_latency: float = 0.03
+    stream: bool = True
+    coalesce_window: float = 0.0
+    seed: int = 0
+
+
+def _configure_env(config: BenchConfig, sheets: str, llm: str, data_dir: str) -> None:
+    """Настройки приложения для стенда; должны быть заданы до первого
+    обращения к settings (они читаются один раз на процесс)"""
+    os.environ.update(
+        TELEGRAM_BOT_TOKEN="42:BENCH",
+        GOOGLE_SERVICE_ACCOUNT_JSON="unused",
+        GOOGLE_SHEETS_SPREADSHEET_ID="bench",
+        SHEETS_API_ENDPOINT=sheets,
+        SHEETS_SNAPSHOT_PATH=os.path.join(data_dir, "catalog_snapshot.sqlite3"),
+        ANSWER_PACK_PATH=os.path.join(data_dir, "answer_pack.sqlite3"),
+        DEEPSEEK_API_KEY="bench",
+        DEEPSEEK_BASE_URL=llm,
+        USE_MOCK_LLM="False",
+        SESSION_BACKEND="memory",
+        STREAM_RESPONSES=str(config.stream),
+        COALESCE_WINDOW=str(config.coalesce_window),
+    )
+
+
+def _timed(timings: StageTimings, stage: str, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            timings.add(stage, time.perf_counter() - started)
+
+    return wrapper
+
+
+def _timed_stream(timings: StageTimings, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        first = True
+        async for chunk in func(*args, **kwargs):
+            if first:
+                timings.add("llm_first_token", time.perf_counter() - started)
+                first = False
+            yield chunk
+        timings.add("llm_stream", time.perf_counter() - started)
+
+    return wrapper
+
+
+def _update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+        },
+    }
+
+
+async def run_benchmark(config: BenchConfig) -> dict:
+    """Прогоняет симулируемых пользователей через роутер бота.
+
+    Google Sheets, DeepSeek и Bot API заменены локальными серверами,
+    поэтому измеряется собственная обработка бота поверх заданных задержек.
+    Приложение импортируется внутри, поэтому прогон — один на процесс.
+    """
+    sheets = FakeSheetsServer(config.clubs, config.classes, config.sheets_latency)
+    llm = FakeLLMServer(
+        config.llm_first_token_latency, config.llm_token_delay, config.llm_tokens
+    )
+    telegram = FakeTelegramServer(config.telegram_latency)
+    sheets_url, llm_url, telegram_url = await asyncio.gather(
+        sheets.start(), llm.start(), telegram.start()
+    )
+    # снимок и набор ответов стенда не должны попасть в data/ репозитория
+    data_dir = tempfile.TemporaryDirectory(prefix="bench-")
+    _configure_env(config, sheets_url, llm_url, data_dir.name)
+
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.types import Update
+
+    from app.bot.bot import dp
+    from app.bot.outbox import get_outbox
+    from app.clients.deepseek import get_deepseek_client
+    from app.clients.google_sheets import get_sheets_client
+    from app.services import get_llm_service
+
+    timings = StageTimings()
+    service = get_llm_service()
+    sheets_client = get_sheets_client()
+    deepseek_client = get_deepseek_client()
+    service._prepare = _timed(timings, "prepare", service._prepare)
+    sheets_client._fetch_sheets = _timed(
+        timings, "sheets_fetch", sheets_client._fetch_sheets
+    )
+    deepseek_client.complete = _timed(timings, "llm_complete", deepseek_client.complete)
+    deepseek_client.stream = _timed_stream(timings, deepseek_client.stream)
+
+    bot = Bot(
+        "42:BENCH",
+        session=AiohttpSession(api=TelegramAPIServer.from_base(telegram_url)),
+    )
+    rnd = random.Random(config.seed)
+    update_ids = iter(range(1, 10**9))
+
+    async def user(user_id: int) -> None:
+        await asyncio.sleep(rnd.random() * config.think_time)
+        for _ in range(config.messages):
+            text = rnd.choice(QUERIES)
+            update = Update.model_validate(
+                _update(next(update_ids), user_id, text), context={"bot": bot}
+            )
+            sent_before = len(telegram.sent)
+            started = time.perf_counter()
+            await dp.feed_update(bot, update)
+            finished = time.perf_counter()
+            timings.add("end_to_end", finished - started)
+
+            replies = [
+                m.at
+                for m in telegram.sent[sent_before:]
+                if m.chat_id == user_id and m.method == "sendMessage"
+            ]
+            if replies:
+                timings.add("first_reply", min(replies) - started)
+            await asyncio.sleep(config.think_time)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(user(1000 + i) for i in range(config.users)))
+    finally:
+        duration = time.perf_counter() - started
+        await bot.session.close()
+        await deepseek_client.aclose()
+        await asyncio.gather(sheets.close(), llm.close(), telegram.close())
+        data_dir.cleanup()
+
+    messages = config.users * config.messages
+    return {
+        "config": asdict(config),
+        "messages": messages,
+        "duration_s": duration,
+        "throughput_rps": messages / duration,
+        "stages": timings.summary(),
+        "calls": {
+            "sheets": sheets.requests,
+            "llm": llm.requests,
+            "telegram": telegram.requests,
+        },
+        "answer_cache": {
+            "hit_rate": service.answer_cache.stats.hit_rate,
+            "bypassed": service.answer_cache.stats.bypassed,
+        },
+        "templates": {"skip_share": service.templates.stats.skip_share},
+        "outbox": asdict(get_outbox().stats),
+        "llm_hedge": asdict(service.hedge_stats),
+        "llm_breaker": asdict(service.breaker.stats),
+    }
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs
+
+from aiohttp import web
+
+from app.clients.catalog import DEPARTMENTS_SHEET, GROUP_CLASSES_SHEET
+
+DISTRICTS = ["Юнусабад", "Чиланзар", "Мирабад", "Яккасарай", "Сергели"]
+CLASS_NAMES = ["Йога", "Пилатес", "Бокс", "Стретчинг", "Зумба", "Кроссфит", "Аэройога"]
+
+
+class LocalServer(ABC):
+    """aiohttp-приложение на свободном порту 127.0.0.1."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    @abstractmethod
+    def make_app(self) -> web.Application:
+        """Приложение с маршрутами заменителя"""
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def make_catalog(clubs: int, classes: int, seed: int = 0) -> dict[str, list[list[str]]]:
+    """Справочник в формате values листов: клубы и матрица «тренировка × клуб»"""
+    rnd = random.Random(seed)
+    club_names = [f"Chekhov Sport {i}" for i in range(1, clubs + 1)]
+    class_names = [
+        CLASS_NAMES[i] if i < len(CLASS_NAMES) else f"Тренировка {i}"
+        for i in range(classes)
+    ]
+    departments = [["Name", "address", "phone", "district"]] + [
+        [
+            name,
+            f"г.Ташкент, ул. Спортивная, {i}",
+            f"998 90 {i:03d}-00-00",
+            rnd.choice(DISTRICTS),
+        ]
+        for i, name in enumerate(club_names, start=1)
+    ]
+    group_classes = [["Name", *club_names]] + [
+        [name, *("Да" if rnd.random() < 0.5 else "Нет" for _ in club_names)]
+        for name in class_names
+    ]
+    return {DEPARTMENTS_SHEET: departments, GROUP_CLASSES_SHEET: group_classes}
+
+
+class FakeSheetsServer(LocalServer):
+    """Google Sheets API v4 (values.batchGet) со сгенерированным справочником
+    и версия файла из Drive API v3 (files.get), которая растёт при update()."""
+
+    def __init__(self, clubs: int = 20, classes: int = 30, latency: float = 0.15):
+        super().__init__()
+        self.latency = latency
+        self.catalog = make_catalog(clubs, classes)
+        self.version = 1
+        self.probes = 0
+
+    def update(self, sheet: str, values: list[list[str]]) -> None:
+        self.catalog[sheet] = values
+        self.version += 1
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(
+            "/v4/spreadsheets/{spreadsheet_id}/values:batchGet", self.batch_get
+        )
+        app.router.add_get("/files/{file_id}", self.file_version)
+        return app
+
+    async def file_version(self, request: web.Request) -> web.Response:
+        self.probes += 1
+        return web.json_response({"version": str(self.version)})
+
+    async def batch_get(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        ranges = parse_qs(request.query_string).get("ranges", [])
+        return web.json_response(
+            {
+                "spreadsheetId": request.match_info["spreadsheet_id"],
+                "valueRanges": [
+                    {"range": name, "values": self.catalog.get(name, [])}
+                    for name in ranges
+                ],
+            }
+        )
+
+
+class FakeLLMServer(LocalServer):
+    """OpenAI-совместимый /chat/completions с задержкой до первого токена
+    и между токенами; поддерживает stream=True (SSE)."""
+
+    def __init__(
+        self,
+        first_token_latency: float = 0.5,
+        token_delay: float = 0.02,
+        tokens: int = 40,
+    ):
+        super().__init__()
+        self.first_token_latency = first_token_latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/chat/completions", self.completions)
+        return app
+
+    def _words(self) -> list[str]:
+        return [f"слово{i} " for i in range(self.tokens)]
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        await asyncio.sleep(self.first_token_latency)
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.token_delay * self.tokens)
+            return web.json_response(
+                self._completion(
+                    {
+                        "message": {
+                            "role": "assistant",
+                            "content": "".join(self._words()),
+                        }
+                    }
+                )
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in self._words():
+            chunk = self._completion(
+                {"delta": {"content": word}}, "chat.completion.chunk"
+            )
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(self.token_delay)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    @staticmethod
+    def _completion(choice: dict, obj: str = "chat.completion") -> dict:
+        return {
+            "id": "bench",
+            "object": obj,
+            "created": int(time.time()),
+            "model": "deepseek-chat",
+            "choices": [{"index": 0, "finish_reason": None, **choice}],
+        }
+
+
+@dataclass
+class SentMessage:
+    chat_id: int
+    method: str
+    text: str
+    at: float = field(default_factory=time.perf_counter)
+
+
+class FakeTelegramServer(LocalServer):
+    """Bot API: принимает sendMessage/editMessageText и запоминает их.
+    Следующие `flood` запросов получают 429 с retry_after."""
+
+    def __init__(self, latency: float = 0.03, retry_after: int = 1) -> None:
+        super().__init__()
+        self.latency = latency
+        self.retry_after = retry_after
+        self.flood = 0
+        self.sent: list[SentMessage] = []
+        self._message_id = 0
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.call)
+        return app
+
+    async def call(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        method = request.match_info["method"]
+        data = dict(await request.post())
+        await asyncio.sleep(self.latency)
+        if self.flood > 0:
+            self.flood -= 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after "
+                    f"{self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+
+        chat_id = int(data.get("chat_id", 0))
+        text = data.get("text", "")
+        self.sent.append(SentMessage(chat_id, method, text))
+        if method not in ("sendMessage", "editMessageText"):
+            return web.json_response({"ok": True, "result": True})
+
+        if method == "sendMessage":
+            self._message_id += 1
+        message_id = int(data.get("message_id", self._message_id))
+        return web.json_response(
+            {
+                "ok": True,
+                "result": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": text,
+                },
+            }
+        )
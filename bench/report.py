@@ -0,0 +1,71 @@
+import json
+import math
+from collections import defaultdict
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class StageTimings:
+    """Длительности по этапам обработки, в секундах."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.samples[stage].append(seconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {
+            stage: {
+                "count": len(values),
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+            for stage, values in sorted(self.samples.items())
+        }
+
+
+def format_summary(result: dict) -> str:
+    lines = [
+        f"Сообщений: {result['messages']}, за {result['duration_s']:.1f} c, "
+        f"{result['throughput_rps']:.1f} сообщ./с",
+        f"{'этап':<20}{'n':>7}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}",
+    ]
+    for stage, s in result["stages"].items():
+        lines.append(
+            f"{stage:<20}{s['count']:>7}{s['p50_ms']:>10.1f}"
+            f"{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(baseline_path: str, result: dict) -> str:
+    """Сравнение p95 по этапам и пропускной способности с прошлым прогоном"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def delta(old: float, new: float) -> str:
+        return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+    lines = [
+        f"throughput: {baseline['throughput_rps']:.1f} -> "
+        f"{result['throughput_rps']:.1f} ({delta(baseline['throughput_rps'], result['throughput_rps'])})"
+    ]
+    for stage, s in result["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old is None:
+            continue
+        lines.append(
+            f"{stage} p95: {old['p95_ms']:.1f} -> {s['p95_ms']:.1f} мс "
+            f"({delta(old['p95_ms'], s['p95_ms'])})"
+        )
+    return "\n".join(lines)